@@ -0,0 +1,598 @@
+#! /usr/bin/env python3
+
+# Author's Notes ######################################################################################################
+'''
+Program: bench_pa4
+Language: Python 3
+Author: Cameron Howard
+
+Benchmarks for the pa4 database program. Run from the Version 4 directory:
+
+	python3 bench_pa4.py join [--rows N] [--full]
+	python3 bench_pa4.py parse [--statements N]
+	python3 bench_pa4.py filter [--rows N]
+	python3 bench_pa4.py index [--rows N] [--lookups N]
+	python3 bench_pa4.py zones [--rows N]
+	python3 bench_pa4.py bloom [--rows N]
+	python3 bench_pa4.py commit [--rows N] [--commits N]
+	python3 bench_pa4.py group [--rows N] [--commits N] [--sessions N]
+	python3 bench_pa4.py locks [--rows N] [--commits N] [--sessions N]
+	python3 bench_pa4.py mvcc [--rows N] [--commits N] [--sessions N]
+
+join:	hash join against the nested loop join on two N row tables (default 10000 x 10000). The nested loop
+		is timed on a sample of the outer table and extrapolated unless --full is given.
+parse:	tokenizer and parser throughput over an N statement script (default 100000).
+filter:	a where clause on a float column over an N row table of each engine (default 1000000), checked a
+		batch at a time with numpy and a row at a time without it.
+index:	point lookups on the key of an N row table of each engine (default 1000000) by a full scan, through
+		a b+tree index and through a hash index, averaged over --lookups queries (default 1000, a few for
+		the scans).
+zones:	a time range query on the last 1% of an N row text and paged table (default 1000000) with rows in
+		time order, reading the blocks their zones allow against reading every block.
+bloom:	a join of 100 keys against an N row paged table (default 1000000) holding them in a few blocks, as a
+		plain hash join, with the keys pushed into the scan and with a bloom index on the column as well.
+commit:	transactions updating one row of an N row table of each engine (default 100000), averaged over
+		--commits transactions (default 100). each commit syncs the write-ahead log once.
+group:	--sessions processes (default 8) each committing --commits transactions (default 100) to its own N
+		row paged table (default 1000) of one database, with every commit syncing the log itself, sharing
+		syncs as they come and sharing them over a group_commit_window of 2 ms.
+locks:	--sessions processes (default 8) each running --commits transactions (default 100) that update two
+		random rows of one shared N row paged table (default 1000), locking the whole table against
+		locking the rows. a transaction waits for a lock another holds, one aborted by a deadlock or
+		lock_timeout is counted along with the lock waits.
+mvcc:	--sessions processes (default 8), half of them running --commits selects (default 100) of a whole N row
+		table of each engine (default 1000) while the other half update groups of ten of its rows until the
+		selects are done. a select that finds a group's rows disagreeing is counted as torn, along with its
+		time and the statements the writers got through.
+'''
+
+# Imports #############################################################################################################
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pa4
+
+
+# Function Declarations ###############################################################################################
+# Remove Root Function
+# drops the bench database of a temporary directory, which lets the vacuum thread of this process go of
+# it, then removes the directory
+def remove_root(root):
+	if os.path.isdir(os.path.join(root, "bench")):
+		pa4.connect(root).execute("DROP DATABASE bench;")
+
+	shutil.rmtree(root)
+
+
+# Build Rows Function
+# makes rows shaped like split table lines, the first column is the join key
+def build_rows(count, key_range, label):
+	return [[str(random.randrange(key_range)), label + str(i)] for i in range(count)]
+
+
+# Join Benchmark Function
+def bench_join(args):
+	random.seed(457)
+	rows_one = build_rows(args.rows, args.rows, "a")
+	rows_two = build_rows(args.rows, args.rows, "b")
+
+	# hash join over the whole input
+	start = time.perf_counter()
+	hash_count = sum(1 for _ in pa4.hash_join(rows_one, rows_two, 0, 0, "int", False))
+	hash_time = time.perf_counter() - start
+
+	# nested loop over a sample of the outer table unless asked for the full run
+	sample = rows_one if args.full else rows_one[:args.sample]
+	start = time.perf_counter()
+	loop_count = sum(1 for _ in pa4.nested_loop_join(sample, rows_two, 0, 0, "int", "=", False))
+	loop_time = (time.perf_counter() - start) * len(rows_one) / len(sample)
+
+	# report results
+	print("join", args.rows, "x", args.rows)
+	print("  hash join:   %10.3f s  (%d rows)" % (hash_time, hash_count))
+	print("  nested loop: %10.3f s  (%s)" % (loop_time,
+		  "%d rows" % loop_count if args.full else "extrapolated from %d outer rows" % len(sample)))
+	print("  speedup:     %10.1fx" % (loop_time / hash_time))
+
+
+# Build Script Function
+# makes a script cycling through every statement pa4 supports
+def build_script(count):
+	templates = [	"CREATE DATABASE db_%d;",
+					"USE db_%d;",
+					"CREATE TABLE tbl_%d (a1 int, a2 varchar(20), a3 float);",
+					"INSERT INTO tbl_%d values(%d, 'name', 1.5);",
+					"UPDATE tbl_%d SET a2 = 'other' WHERE a1 = %d;",
+					"DELETE FROM tbl_%d WHERE a3 > %d;",
+					"SELECT * FROM tbl_%d;",
+					"SELECT a1, a2 FROM tbl_%d WHERE a1 >= %d;",
+					"SELECT * FROM tbl_%d E inner join Sales S on E.a1 = S.id%d;",
+					"SELECT * FROM tbl_%d E left outer join Sales S on E.a1 = S.id%d;",
+					"begin transaction;",
+					"commit;",
+					"DROP TABLE tbl_%d;"	]
+	script = list()
+
+	for i in range(count):
+		template = templates[i % len(templates)]
+		script.append(template % ((i, i)[:template.count("%d")]))
+
+	return script
+
+
+# Parse Benchmark Function
+def bench_parse(args):
+	script = build_script(args.statements)
+
+	# tokenizer alone
+	start = time.perf_counter()
+	for statement in script:
+		pa4.tokenize(statement)
+	tokenize_time = time.perf_counter() - start
+
+	# tokenizer and parser
+	start = time.perf_counter()
+	for statement in script:
+		pa4.parse(statement)
+	parse_time = time.perf_counter() - start
+
+	# report results
+	print("parse", len(script), "statements")
+	print("  tokenize:    %10.3f s  (%d statements/s)" % (tokenize_time, len(script) / tokenize_time))
+	print("  parse:       %10.3f s  (%d statements/s)" % (parse_time, len(script) / parse_time))
+
+
+# Filter Benchmark Function
+def bench_filter(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+	numpy = pa4.numpy
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		# the same rows go into a table of each engine
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|item%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		print("filter", args.rows, "rows, WHERE price > 100")
+		for engine in sorted(pa4.table_engines):
+			conn.execute("CREATE TABLE t_%s (id int, name varchar(20), price float) ENGINE=%s;" % (engine, engine))
+			conn.execute("COPY t_%s FROM 'rows.txt';" % engine)
+
+			# time the query with and without numpy
+			times = list()
+			for module in (numpy, None):
+				pa4.numpy = module
+				start = time.perf_counter()
+				count = sum(1 for _ in conn.execute("SELECT id FROM t_%s WHERE price > 100;" % engine).rows)
+				times.append(time.perf_counter() - start)
+
+			pa4.numpy = numpy
+			if numpy is None:
+				print("  %-9s %10.3f s  (%d rows, numpy is not installed)" % (engine + ":", times[1], count))
+
+			else:
+				print("  %-9s %10.3f s  batched  %10.3f s  row by row  (%d rows)" % (engine + ":", times[0],
+					  times[1], count))
+
+	finally:
+		pa4.numpy = numpy
+		remove_root(root)
+
+
+# Index Benchmark Function
+def bench_index(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		# the same rows go into a table of each engine
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|item%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		print("index", args.rows, "rows, SELECT * WHERE id = k")
+		for engine in sorted(pa4.table_engines):
+			conn.execute("CREATE TABLE t_%s (id int, name varchar(20), price float) ENGINE=%s;" % (engine, engine))
+			conn.execute("COPY t_%s FROM 'rows.txt';" % engine)
+			query = "SELECT * FROM t_%s WHERE id = ?;" % engine
+
+			# a few lookups by full scan
+			keys = [random.randrange(args.rows) for i in range(3)]
+			start = time.perf_counter()
+			for key in keys:
+				list(conn.execute(query, (key,)).rows)
+			scan_time = (time.perf_counter() - start) / len(keys)
+
+			# build each kind of index in turn and time many lookups through it
+			for method in ("btree", "hash"):
+				start = time.perf_counter()
+				conn.execute("CREATE INDEX i_%s ON t_%s (id) USING %s;" % (engine, engine, method))
+				build_time = time.perf_counter() - start
+
+				keys = [random.randrange(args.rows) for i in range(args.lookups)]
+				start = time.perf_counter()
+				for key in keys:
+					list(conn.execute(query, (key,)).rows)
+				index_time = (time.perf_counter() - start) / len(keys)
+				conn.execute("DROP INDEX i_%s;" % engine)
+
+				print("  %-9s scan %10.3f ms  %-5s %8.3f ms  (%.0fx, index built in %.2f s)" % (engine + ":",
+					  scan_time * 1000, method, index_time * 1000, scan_time / index_time, build_time))
+
+	finally:
+		remove_root(root)
+
+
+# Zone Map Benchmark Function
+def bench_zones(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		# an event log, the timestamps only grow
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			ts = 1700000000
+			for i in range(args.rows):
+				ts += random.randrange(10)
+				f.write("%d|event%d|%.2f\n" % (ts, i, random.uniform(0, 200)))
+
+		print("zones", args.rows, "rows, SELECT * WHERE ts > last 1%")
+		for engine in ("text", "paged"):
+			table = "events_" + engine
+			conn.execute("CREATE TABLE %s (ts int, name varchar(20), price float) ENGINE=%s;" % (table, engine))
+			conn.execute("COPY %s FROM 'rows.txt';" % table)
+			query = "SELECT * FROM %s WHERE ts > %d;" % (table, ts - (ts - 1700000000) // 100)
+
+			# with the zones, then without them as a table made before zones
+			times = list()
+			for zones in (True, False):
+				if not zones:
+					os.remove(os.path.join(root, "bench", table + pa4.zone_suffix))
+
+				start = time.perf_counter()
+				count = sum(1 for _ in conn.execute(query).rows)
+				times.append(time.perf_counter() - start)
+
+			print("  " + engine)
+			print("    zones:       %10.3f s  (%d rows)" % (times[0], count))
+			print("    every block: %10.3f s" % times[1])
+			print("    speedup:     %10.1fx" % (times[1] / times[0]))
+
+	finally:
+		remove_root(root)
+
+
+# Bloom Benchmark Function
+def bench_bloom(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+	reduce_probe = pa4.reduce_probe
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		# ids are given out in order, the keys looked for are recent ones
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|order%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		conn.execute("CREATE TABLE orders (id int, name varchar(20), price float) ENGINE=paged;")
+		conn.execute("COPY orders FROM 'rows.txt';")
+		conn.execute("CREATE TABLE picks (id int, note varchar(20));")
+		conn.execute("INSERT INTO picks VALUES " + ", ".join(["(%d, 'pick')" % (args.rows - 1 - i * 7)
+															  for i in range(100)]) + ";")
+		query = "SELECT * FROM picks P inner join orders O on P.id = O.id;"
+
+		# the join as it was, then with the keys pushed down, then with a bloom index too
+		times = list()
+		for name in ("hash", "semi", "bloom"):
+			pa4.reduce_probe = reduce_probe if name != "hash" else lambda probe, index, keys, cast: probe
+			if name == "bloom":
+				conn.execute("CREATE INDEX orders_id_bloom ON orders (id) USING BLOOM;")
+
+			start = time.perf_counter()
+			count = sum(1 for _ in conn.execute(query).rows)
+			times.append(time.perf_counter() - start)
+
+		print("bloom", args.rows, "rows joined to 100 keys")
+		print("  hash join:   %10.3f s  (%d rows)" % (times[0], count))
+		print("  semi-join:   %10.3f s  (%.1fx)" % (times[1], times[0] / times[1]))
+		print("  bloom index: %10.3f s  (%.1fx)" % (times[2], times[0] / times[2]))
+
+	finally:
+		pa4.reduce_probe = reduce_probe
+		remove_root(root)
+
+
+# Commit Benchmark Function
+def bench_commit(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		# the same rows go into a table of each engine
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|item%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		print("commit", args.rows, "rows, BEGIN; UPDATE ... WHERE id = k; COMMIT")
+		for engine in sorted(pa4.table_engines):
+			conn.execute("CREATE TABLE t_%s (id int, name varchar(20), price float) ENGINE=%s;" % (engine, engine))
+			conn.execute("COPY t_%s FROM 'rows.txt';" % engine)
+
+			start = time.perf_counter()
+			for i in range(args.commits):
+				conn.execute("begin transaction;")
+				conn.execute("UPDATE t_%s SET price = %.2f WHERE id = %d;" % (engine, random.uniform(0, 200),
+							 random.randrange(args.rows)))
+				conn.execute("commit;")
+			commit_time = (time.perf_counter() - start) / args.commits
+
+			print("  %-9s %10.3f ms per transaction" % (engine + ":", commit_time * 1000))
+
+	finally:
+		remove_root(root)
+
+
+# Group Commit Session Function (Helper of Group Commit Benchmark)
+# one process committing transactions to its own table, returns its commits and syncs of the log
+def group_session(root, table, rows, commits, shared, window):
+	if not shared:
+		pa4.fcntl = None
+	pa4.group_commit_window = window
+
+	conn = pa4.connect(root)
+	conn.execute("USE bench;")
+	for i in range(commits):
+		conn.execute("begin transaction;")
+		conn.execute("UPDATE %s SET price = %.2f WHERE id = %d;" % (table, random.uniform(0, 200), random.randrange(rows)))
+		conn.execute("commit;")
+
+	return pa4.wal_stats["commits"], pa4.wal_stats["syncs"]
+
+
+# Group Commit Benchmark Function
+def bench_group(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|item%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		tables = ["t_%d" % i for i in range(args.sessions)]
+		for table in tables:
+			conn.execute("CREATE TABLE %s (id int, name varchar(20), price float) ENGINE=paged;" % table)
+			conn.execute("COPY %s FROM 'rows.txt';" % table)
+
+		print("group", args.sessions, "sessions x", args.commits, "transactions, BEGIN; UPDATE ... WHERE id = k; COMMIT")
+		for label, shared, window in (("alone", False, 0), ("shared", True, 0), ("window", True, 0.002)):
+			with ProcessPoolExecutor(args.sessions) as pool:
+				start = time.perf_counter()
+				done = list(pool.map(group_session, [root] * args.sessions, tables, [args.rows] * args.sessions,
+									 [args.commits] * args.sessions, [shared] * args.sessions, [window] * args.sessions))
+				group_time = time.perf_counter() - start
+
+			commits = sum([commit_count for commit_count, sync_count in done])
+			syncs = sum([sync_count for commit_count, sync_count in done])
+			print("  %-9s %10.0f commits/s %8.2f commits per sync" % (label + ":", commits / group_time, commits / syncs))
+
+	finally:
+		remove_root(root)
+
+
+# Lock Session Function (Helper of Lock Benchmark)
+# one process running transactions on random rows of the shared table, returns its commits, its aborts
+# and the lock manager's counters
+def lock_session(root, seed, rows, commits, row_locks):
+	random.seed(seed)
+	pa4.PagedTable.row_locks = row_locks
+
+	conn = pa4.connect(root)
+	conn.execute("USE bench;")
+	done = 0
+	for i in range(commits):
+		conn.execute("begin transaction;")
+		try:
+			for k in range(2):
+				conn.execute("UPDATE t SET price = %.2f WHERE id = %d;" % (random.uniform(0, 200), random.randrange(rows)))
+			conn.execute("commit;")
+			done += 1
+
+		except pa4.DatabaseError:
+			conn.rollback()
+
+	return done, commits - done, pa4.lock_manager.stats()
+
+
+# Lock Benchmark Function
+def bench_locks(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|item%d|%.2f\n" % (i, i, random.uniform(0, 200)))
+
+		conn.execute("CREATE TABLE t (id int, name varchar(20), price float) ENGINE=paged;")
+		conn.execute("COPY t FROM 'rows.txt';")
+		conn.execute("CREATE INDEX t_id ON t (id) USING HASH;")
+
+		print("locks", args.sessions, "sessions x", args.commits, "transactions, BEGIN; UPDATE x 2; COMMIT")
+		for label, row_locks in (("table", False), ("rows", True)):
+			with ProcessPoolExecutor(args.sessions) as pool:
+				start = time.perf_counter()
+				done = list(pool.map(lock_session, [root] * args.sessions, range(args.sessions), [args.rows] * args.sessions,
+									 [args.commits] * args.sessions, [row_locks] * args.sessions))
+				lock_time = time.perf_counter() - start
+
+			commits = sum([commit_count for commit_count, abort_count, stats in done])
+			aborts = sum([abort_count for commit_count, abort_count, stats in done])
+			waits = sum([stats["waits"] for commit_count, abort_count, stats in done])
+			wait_time = sum([stats["wait_time"] for commit_count, abort_count, stats in done])
+			deadlocks = sum([stats["deadlocks"] for commit_count, abort_count, stats in done])
+			timeouts = sum([stats["timeouts"] for commit_count, abort_count, stats in done])
+			print("  %-9s %10.0f commits/s %8.1f%% aborted %6d waits %8.2f ms per wait %6d deadlocks %4d timeouts" %
+				  (label + ":", commits / lock_time, 100.0 * aborts / (commits + aborts), waits,
+				   1000.0 * wait_time / max(waits, 1), deadlocks, timeouts))
+
+	finally:
+		remove_root(root)
+
+
+# MVCC Writer Function (Helper of MVCC Benchmark)
+# one process setting every row of a random group to a new value until the readers are done, returns
+# the statements it ran
+def mvcc_writer(root, seed, rows):
+	random.seed(seed)
+
+	conn = pa4.connect(root)
+	conn.execute("USE bench;")
+	done = 0
+	while not os.path.exists(os.path.join(root, "done")):
+		conn.execute("UPDATE t SET v = %d WHERE g = %d;" % (random.randrange(1000000), random.randrange(rows // 10)))
+		done += 1
+
+	return done
+
+
+# MVCC Reader Function (Helper of MVCC Benchmark)
+# one process reading the whole table, returns the time of each select and how many of them saw a group
+# with more than one value
+def mvcc_reader(root, commits):
+	conn = pa4.connect(root)
+	conn.execute("USE bench;")
+	times = []
+	torn = 0
+	for i in range(commits):
+		start = time.perf_counter()
+		groups = {}
+		for g, v in conn.execute("SELECT g, v FROM t;").rows:
+			groups.setdefault(g, set()).add(v)
+		times.append(time.perf_counter() - start)
+
+		if any([len(values) > 1 for values in groups.values()]):
+			torn += 1
+
+	return times, torn
+
+
+# MVCC Benchmark Function
+def bench_mvcc(args):
+	random.seed(457)
+	root = tempfile.mkdtemp()
+	readers = max(args.sessions // 2, 1)
+	writers = max(args.sessions - readers, 1)
+
+	try:
+		conn = pa4.connect(root)
+		conn.execute("CREATE DATABASE bench;")
+		conn.execute("USE bench;")
+
+		source = os.path.join(root, "rows.txt")
+		with open(source, "w") as f:
+			for i in range(args.rows):
+				f.write("%d|%d|%d\n" % (i, i // 10, 0))
+
+		print("mvcc", readers, "readers x", args.commits, "SELECT g, v FROM t;", writers,
+			  "writers of UPDATE t SET v = x WHERE g = k")
+		for engine in ("text", "paged", "columnar"):
+			conn.execute("CREATE TABLE t (id int, g int, v int) ENGINE=%s;" % engine)
+			conn.execute("COPY t FROM 'rows.txt';")
+
+			with ProcessPoolExecutor(readers + writers) as pool:
+				start = time.perf_counter()
+				written = [pool.submit(mvcc_writer, root, seed, args.rows) for seed in range(writers)]
+				read = [pool.submit(mvcc_reader, root, args.commits) for i in range(readers)]
+				done = [future.result() for future in read]
+				open(os.path.join(root, "done"), "w").close()
+				statements = sum([future.result() for future in written])
+				mvcc_time = time.perf_counter() - start
+
+			times = sorted([t for select_times, torn in done for t in select_times])
+			torn = sum([torn for select_times, torn in done])
+			print("  %-9s %8.2f ms p50 %8.2f ms p99 %6d torn %10.0f writes/s" %
+				  (engine + ":", 1000.0 * times[len(times) // 2], 1000.0 * times[int(len(times) * 0.99)], torn,
+				   statements / mvcc_time))
+
+			os.remove(os.path.join(root, "done"))
+			conn.execute("DROP TABLE t;")
+
+	finally:
+		remove_root(root)
+
+
+# Main Program ########################################################################################################
+benchmarks = {	"join" : bench_join,
+				"parse" : bench_parse,
+				"filter" : bench_filter,
+				"index" : bench_index,
+				"zones" : bench_zones,
+				"bloom" : bench_bloom,
+				"commit" : bench_commit,
+				"group" : bench_group,
+				"locks" : bench_locks,
+				"mvcc" : bench_mvcc	}
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="pa4 benchmarks")
+	parser.add_argument("benchmark", choices=sorted(benchmarks))
+	parser.add_argument("--rows", type=int, default=None)
+	parser.add_argument("--sample", type=int, default=200)
+	parser.add_argument("--full", action="store_true")
+	parser.add_argument("--statements", type=int, default=100000)
+	parser.add_argument("--lookups", type=int, default=1000)
+	parser.add_argument("--commits", type=int, default=100)
+	parser.add_argument("--sessions", type=int, default=8)
+	args = parser.parse_args()
+
+	# the rows a benchmark uses when --rows is not given, a million unless it is listed
+	if args.rows is None:
+		args.rows = {"join" : 10000,	# joins are quadratic without a hash table
+					 "commit" : 100000,
+					 "group" : 1000,
+					 "locks" : 1000,
+					 "mvcc" : 1000}.get(args.benchmark, 1000000)
+
+	benchmarks[args.benchmark](args)
@@ -0,0 +1,1377 @@
+#! /usr/bin/env python3
+
+# Author's Notes ######################################################################################################
+'''
+Program: check_pa4
+Language: Python 3
+Author: Cameron Howard
+
+Scripted checks of the pa4 database program. Run from the Version 4 directory:
+
+	python3 check_pa4.py [check ...]
+
+Every check runs when none are named. Each prints ok or what it found wrong, and the program exits with
+status 1 if any failed. The checks running several processes against one table need fcntl.
+
+parse:	a script holding semicolons and comment markers in strings and comments is cut into the same
+		statements however it arrives, they parse as expected and bad statements fail to parse. batch mode
+		prints what each statement returned up to .EXIT.
+dbapi:	cursors of each engine insert and update with executemany, fetch a select's rows in pieces as python
+		values with their description, and raise db-api errors for missing or bad parameters and for a
+		stored value its column can not take.
+insert:	inserts of one and many rows, and batches holding a bad row or a value holding a | or a line break
+		that insert none of their rows, give the same rows on every engine with no index and with each index
+		method as on a text table without one. a paged table fails a value too long for a page.
+copy:	csv and | separated files copied into every engine with no index and with each index method give the
+		same rows as on a text table without one. a file with a bad row or a byte that is not utf-8 in a late
+		chunk, checked here or by workers, leaves none of its rows in the table or its indexes.
+index:	selects with each comparison on int, float and varchar columns, updates, deletes and a transaction
+		changing rows and their keys give the same rows on every engine with a b+tree, hash or bloom index on
+		each column as on a text table without one. a value a column can not hold, compared to or set by
+		an update, is a DataError.
+unique:	inserts, updates, upserts and a transaction on a table with a primary key and a unique column give
+		the same rows and the same failures on every engine, with no other index and with each method on
+		another column, as on a text table. a key given twice or an empty primary key fails.
+zones:	range selects over rows in key order, with updates, inserts, deletes and a transaction moving values
+		out of the range of their block, give the same rows on every engine with no index and with each
+		method as on a text table without one. paged tables read fewer pages for a narrow range, text
+		tables fewer bytes.
+joins:	comma, inner and left outer joins by equality, range and not equal, of a small and a much larger
+		table of every engine with no index and with each index method, give the same rows as text tables
+		without one, with the default join memory and with too little to hash either table. empty keys
+		join nothing and sort last, as do the rows an outer join pads, and changes to the larger table
+		reach its index and blooms.
+pool:	with a buffer pool of four pages, tables of every engine with no index and with each index method
+		change and give the same rows as a text table without one while pages are evicted. pages of a
+		paged table and its index held here are dropped once another process changes them.
+nulls:	where clauses comparing int and float columns that hold empty values, on each engine, checked with
+		numpy when it is installed and without it. an empty value passes no comparison.
+recovery:	a process committing a transaction to a table of each engine is killed before its log entry is
+		synced, after it is synced but before the table is written, and after the table is written but
+		before the entry is marked applied. the next connection to use the database sees the commit
+		whole or not at all, through its indexes as well. a process using the database while another is
+		between syncing its commit and writing it leaves that commit alone.
+group:	six processes commit transactions to tables of each engine in one database at once, sharing syncs of
+		its log and trying a checkpoint after every commit. every commit must reach its table and the log
+		must end up empty.
+slots:	a transaction writing two tables of each engine whose names share a commit slot commits, and a
+		commit of another process to both is read here afterwards.
+conflict:	a connection holds a row of a table of each engine in a transaction. another process changing a
+		different row commits at once when the engine locks rows, one changing the same row times out.
+		updates, deletes and upserts outside of a transaction wait for the row the same way, a delete
+		from a table whose rows move waits for any. a select run by the holder does not let go of its
+		locks. two transactions, of one process or of two, giving different rows the same primary key can
+		not both commit.
+deadlock:	two transactions lock a row of a table of each engine and then wait for the row the other holds,
+		from two processes and from two threads of one. the younger is aborted as the deadlock's victim
+		and the older commits. on a locked table the younger waits for the older instead.
+snapshot:	a select of a table of each engine reads every row as it was when the select began while the rows
+		are changed under it by execute, executemany and a transaction. then two processes keep setting
+		groups of rows to one value while selects of the whole table must never find a group split.
+'''
+
+# Imports #############################################################################################################
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from itertools import islice
+
+import pa4
+
+
+# Function Declarations ###############################################################################################
+# Check Failed Class
+# raised by a check when the database does something other than expected
+class CheckFailed(Exception):
+	pass
+
+
+# Expect Function
+# fails the running check unless got is want, lists of rows are told apart by the first few rows only one
+# of them holds
+def expect(got, want, what):
+	if got == want:
+		return
+
+	if isinstance(got, list) and isinstance(want, list) and all([isinstance(row, tuple) for row in got + want]):
+		raise CheckFailed("%s: %d rows, missing %r, not expected %r" % (what, len(got),
+						  [row for row in want if row not in got][:3], [row for row in got if row not in want][:3]))
+
+	raise CheckFailed("%s: expected %r, got %r" % (what, want, got))
+
+
+# Rows Function
+# the rows of a select as a sorted list of tuples of their text values
+def rows(conn, sql):
+	return sorted([tuple(row) for row in conn.execute(sql).rows])
+
+
+# New Database Function
+# a connection using a new database in a temporary directory, the directory is returned with it
+def new_database(name="check"):
+	root = tempfile.mkdtemp()
+	conn = pa4.connect(root)
+	conn.execute("CREATE DATABASE %s;" % name)
+	conn.execute("USE %s;" % name)
+	return root, conn
+
+
+# Run Child Function
+# runs python code in a new process that imports pa4 from where this program found it, returns its exit
+# status. the arguments are in sys.argv[1:]
+def run_child(code, *args):
+	code = "import sys\nsys.path.insert(0, %r)\n%s" % (os.path.dirname(os.path.abspath(pa4.__file__)), code)
+	return subprocess.run([sys.executable, "-c", code] + [str(arg) for arg in args]).returncode
+
+
+# Remove Root Function
+# drops the check database of a temporary directory, which lets the vacuum thread of this process go of
+# it, then removes the directory
+def remove_root(root):
+	if os.path.isdir(os.path.join(root, "check")):
+		pa4.connect(root).execute("DROP DATABASE check;")
+
+	shutil.rmtree(root)
+
+
+# Nulls Check Function
+def check_nulls():
+	root, conn = new_database()
+	numpy = pa4.numpy
+
+	try:
+		# where clauses are checked as numpy arrays and a value at a time
+		for module in set([numpy, None]):
+			pa4.numpy = module
+			checked = "numpy" if module else "values"
+
+			for engine in sorted(pa4.table_engines):
+				table = "t_%s_%s" % (engine, checked)
+				what = "%s %s " % (engine, checked)
+				conn.execute("CREATE TABLE %s (id int, name varchar(10), price float) ENGINE=%s;" % (table, engine))
+				conn.execute("INSERT INTO %s VALUES (1, 'a', 1.5), (2, 'b', ''), ('', 'c', 3.5);" % table)
+
+				for sql, want in (("SELECT name FROM %s WHERE price > 1;", [("a",), ("c",)]),
+								  ("SELECT name FROM %s WHERE price != 1.5;", [("c",)]),
+								  ("SELECT name FROM %s WHERE id < 5;", [("a",), ("b",)]),
+								  ("SELECT name FROM %s WHERE id = 2;", [("b",)])):
+					expect(rows(conn, sql % table), want, what + sql % table)
+
+				conn.execute("UPDATE %s SET name = 'x' WHERE price > 1;" % table)
+				conn.execute("DELETE FROM %s WHERE id >= 2;" % table)
+				expect(rows(conn, "SELECT * FROM %s;" % table), [("", "x", "3.5"), ("1", "x", "1.5")],
+					   what + "after update and delete")
+
+	finally:
+		pa4.numpy = numpy
+		conn.close()
+		remove_root(root)
+
+
+# Parse Script
+# statements of the parse check, with semicolons and comment markers inside strings and comments
+parse_script = """CREATE DATABASE check;
+USE check;
+-- a comment; holding a semicolon and a ' quote
+CREATE TABLE t (id int, name varchar(20), price float) ENGINE=paged;
+INSERT INTO t VALUES (1, 'a;b', 1.5), (2, '-- not a comment', ''); -- a comment after it
+SELECT name
+	-- a comment; inside a statement
+	FROM t WHERE name = 'a;b';
+SELEC * FROM t;
+SELECT * FROM nothing;
+select * from t where id > 1;
+.EXIT
+SELECT * FROM t;
+"""
+
+# the statements the splitter cuts parse_script into and what batch mode prints for them
+parse_statements = ["CREATE DATABASE check;", "USE check;",
+					"CREATE TABLE t (id int, name varchar(20), price float) ENGINE=paged;",
+					"INSERT INTO t VALUES (1, 'a;b', 1.5), (2, '-- not a comment', '');",
+					"SELECT name\n\t-- a comment; inside a statement\n\tFROM t WHERE name = 'a;b';",
+					"SELEC * FROM t;", "SELECT * FROM nothing;", "select * from t where id > 1;", ".EXIT\n",
+					"SELECT * FROM t;"]
+parse_output = """Database check created.
+Using database check.
+Table t created.
+2 new records inserted.
+name varchar(20)
+a;b
+!Failed to execute command. Check spelling and syntax.
+!Failed to query table nothing because it does not exist.
+id int|name varchar(20)|price float
+2|-- not a comment|
+All done.
+"""
+
+
+# Parse Check Function
+def check_parse():
+	# the splitter finds the same statements however the script is cut into chunks
+	for size in range(1, len(parse_script) + 1):
+		splitter = pa4.StatementSplitter()
+		found = list()
+		for start in range(0, len(parse_script), size):
+			found.extend(splitter.feed(parse_script[start:start + size]))
+
+		expect(found, parse_statements, "statements split from chunks of %d characters" % size)
+		expect(splitter.close(), "", "text left after chunks of %d characters" % size)
+
+	for chunk_size in (None, 5, 4096):
+		expect(list(pa4.read_statements(io.StringIO(parse_script), chunk_size)), parse_statements,
+			   "statements read in chunks of %s characters" % chunk_size)
+
+	expect(list(pa4.read_statements(io.StringIO("SELECT * FROM t;\nSELECT * -- no end"))),
+		   ["SELECT * FROM t;", "SELECT * -- no end"], "unterminated statement at the end")
+
+	# the parser drops comments and keeps semicolons and dashes inside strings
+	expect(pa4.parse(parse_statements[4]), pa4.Select(["name"], [pa4.TableRef("t", None)], None,
+													  pa4.Condition("name", "=", "a;b"), None), "parsed select")
+	expect(pa4.parse(parse_statements[3]).rows, [["1", "a;b", "1.5"], ["2", "-- not a comment", ""]],
+		   "parsed insert rows")
+	expect(pa4.parse("select a.x, y from t1 a left outer join t2 b on a.x <= b.y order by y desc;"),
+		   pa4.Select(["a.x", "y"], [pa4.TableRef("t1", "a"), pa4.TableRef("t2", "b")], "left outer",
+					  pa4.Condition("a.x", "<=", "b.y"), ("y", True)), "parsed join")
+
+	for sql in ("SELEC * FROM t;", "SELECT * FROM t WHERE;", "SELECT * FROM t; SELECT", "INSERT INTO t VALUES (1;",
+				"CREATE TABLE t (id int) ENGINE;", "SELECT * FROM t WHERE name = 'a;"):
+		try:
+			pa4.parse(sql)
+
+		except pa4.ParseError:
+			continue
+
+		raise CheckFailed("no parse error for " + repr(sql))
+
+	# batch mode prints what each statement returned, up to .EXIT
+	root = tempfile.mkdtemp()
+	try:
+		with open(os.path.join(root, "script.sql"), "w") as f:
+			f.write(parse_script)
+
+		done = subprocess.run([sys.executable, os.path.abspath(pa4.__file__), "-f", "script.sql"], cwd=root,
+							  stdout=subprocess.PIPE, universal_newlines=True)
+		expect(done.stdout, parse_output, "batch mode output")
+
+	finally:
+		remove_root(root)
+
+
+# Raises Function
+# the db-api exception class a call raises, None when it returns
+def raises(call, *args):
+	try:
+		call(*args)
+
+	except pa4.Error as e:
+		return type(e)
+
+	return None
+
+
+# DB-API Check Function
+def check_dbapi():
+	root, conn = new_database()
+
+	try:
+		for engine in sorted(pa4.table_engines):
+			table = "t_" + engine
+			conn.execute("CREATE TABLE %s (id int, name varchar(20), price float) ENGINE=%s;" % (table, engine))
+			cursor = conn.cursor()
+
+			# executemany inserts every row, none and a value with a semicolon among them
+			cursor.executemany("INSERT INTO %s VALUES (?, ?, ?)" % table,
+							   [(i, "n;%d" % (i % 7), i / 4) for i in range(500)] + [(500, None, None)])
+			expect(cursor.rowcount, 501, engine + " executemany insert rowcount")
+
+			cursor.executemany("UPDATE %s SET price = ? WHERE id = ?" % table, [(1.25, 3), (2.5, 4), (9.0, 999)])
+			expect(cursor.rowcount, 2, engine + " executemany update rowcount")
+
+			# rows fetched in pieces come back as python values
+			cursor.execute("SELECT id, name, price FROM %s WHERE name = ?" % table, ("n;3",))
+			expect([column[:2] for column in cursor.description], [("id", "int"), ("name", "varchar(20)"),
+																	("price", "float")], engine + " description")
+			expect([column[1] == kind for column, kind in zip(cursor.description, (pa4.NUMBER, pa4.STRING, pa4.NUMBER))],
+				   [True] * 3, engine + " description type codes")
+
+			fetched = [cursor.fetchone()] + cursor.fetchmany(5)
+			cursor.arraysize = 10
+			fetched += cursor.fetchmany() + cursor.fetchall()
+			expect(cursor.fetchone(), None, engine + " fetchone after the last row")
+			expect(sorted(fetched), [(i, "n;3", 1.25 if i == 3 else i / 4) for i in range(500) if i % 7 == 3],
+				   engine + " fetched rows")
+
+			cursor.execute("SELECT * FROM %s WHERE id = ?" % table, [500])
+			expect(cursor.fetchall(), [(500, "", None)], engine + " row of none values")
+
+			cursor.execute("DELETE FROM %s WHERE id >= ?" % table, (250,))
+			expect(cursor.rowcount, 251, engine + " delete rowcount")
+			expect(len(list(conn.cursor().execute("SELECT * FROM %s" % table))), 250, engine + " rows after delete")
+
+			# errors are db-api exceptions
+			expect(raises(cursor.fetchall), pa4.ProgrammingError, engine + " fetch after a delete")
+			expect(raises(cursor.execute, "SELECT * FROM %s WHERE id = ?" % table), pa4.ProgrammingError,
+				   engine + " missing parameter")
+			expect(raises(cursor.execute, "INSERT INTO %s VALUES (?, ?, ?)" % table, (1, "a|b", 1)), pa4.DataError,
+				   engine + " parameter holding the separator")
+			expect(raises(cursor.execute, "SELEC * FROM %s" % table), pa4.ParseError, engine + " syntax error")
+
+			# a text table file changed outside the program can hold a value its column can not take, it is
+			# compared one value at a time with numpy and without
+			if engine == "text":
+				with open(os.path.join(root, "check", table), "a") as f:
+					f.write("x|bad|1.5\n")
+
+				numpy = pa4.numpy
+				for pa4.numpy in (None, numpy):
+					expect(raises(rows, conn, "SELECT * FROM %s WHERE id > 0;" % table), pa4.DataError,
+						   engine + " stored value that is not an int, %s numpy" % ("with" if pa4.numpy else "without"))
+
+			cursor.close()
+			expect(raises(cursor.execute, "SELECT * FROM %s" % table), pa4.InterfaceError,
+				   engine + " closed cursor")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Table Setups Function
+# (engine, index method) of a table of each engine with no index and with each method, the text table
+# without an index first, the others are compared with it
+def table_setups():
+	setups = [(engine, method) for engine in sorted(pa4.table_engines) for method in [None] + sorted(pa4.index_methods)]
+	setups.remove(("text", None))
+	return [("text", None)] + setups
+
+
+# Script Outcomes Function
+# what each statement of a script did on a table: the rows of a select as python values, which a paged
+# table stores a float in binary does not change, sorted unless it orders them. the message or error of
+# any other statement, with the table's name as {t}
+def script_outcomes(conn, script, table):
+	done = list()
+
+	for sql in pa4.StatementSplitter().feed(script.replace("{t}", table)):
+		try:
+			result = conn.execute(sql)
+			if result.columns is None:
+				done.append(result.message.replace(table, "{t}"))
+
+			elif " ORDER BY " in sql.upper():
+				done.append(list(result))
+
+			else:
+				done.append(sorted(result, key=repr))
+
+		except pa4.DatabaseError as e:
+			done.append((type(e).__name__, str(e).replace(table, "{t}")))
+
+	return done
+
+
+# Compare Setups Function
+# makes a table of columns for each of table_setups, with an index of the setup's method on each of the
+# indexed columns, runs the script on each and compares what it did with the text table without an index
+def compare_setups(conn, columns, indexed, script):
+	want = None
+
+	for engine, method in table_setups():
+		table = "t_%s_%s" % (engine, method or "none")
+		conn.execute("CREATE TABLE %s (%s) ENGINE=%s;" % (table, columns, engine))
+		for column in indexed if method else ():
+			conn.execute("CREATE INDEX %s_%s ON %s (%s) USING %s;" % (table, column, table, column, method))
+
+		done = script_outcomes(conn, script, table)
+		if want is None:
+			want = done
+			continue
+
+		for sql, got, wanted in zip(pa4.StatementSplitter().feed(script), done, want):
+			expect(got, wanted, "%s %s %s" % (engine, method or "without an index", " ".join(sql.split())))
+
+	return want
+
+
+# Insert Script
+# inserts of one and many rows on a table of every setup, a batch with a bad row inserts none of its rows
+insert_script = """INSERT INTO {t} VALUES (1, 'a;b', 1.5), (2, '-- not a comment', ''), ('', 'c', 3.5);
+INSERT INTO {t} VALUES (3, 'd', 1.0), (4, 'e', 'x'); -- a float column does not take x
+INSERT INTO {t} VALUES (5, 'f', 1.0), (6, 'g');
+INSERT INTO {t} VALUES (7.5, 'h', 1.0);
+INSERT INTO {t} VALUES (8, 'i', -0.5);
+SELECT * FROM {t};
+SELECT name FROM {t} WHERE id = 3;
+SELECT name FROM {t} WHERE id = 6;
+SELECT id FROM {t} WHERE price = 1.0;
+SELECT id FROM {t} WHERE name = 'a;b';
+INSERT INTO {t} VALUES %s;
+SELECT id, name FROM {t} WHERE price >= 100;
+SELECT * FROM {t} WHERE id = 250;
+SELECT * FROM {t} WHERE name = 'n42';
+INSERT INTO {t} VALUES (400, 'ok', 1.0), (401, 'a|b', 1.0);
+INSERT INTO {t} VALUES (402, 'line
+break', 1.0);
+SELECT * FROM {t} WHERE id >= 400;
+""" % ", ".join(["(%d, 'n%d', %d.25)" % (i, i % 50, i) for i in range(10, 400)])
+
+
+# Insert Check Function
+def check_insert():
+	root, conn = new_database()
+
+	try:
+		done = compare_setups(conn, "id int, name varchar(20), price float", ["id", "name", "price"], insert_script)
+
+		# the text table without an index did what it should, the bad batches failing with a DataError
+		expect([outcome[0] if isinstance(outcome, tuple) else outcome for outcome in done[:6]],
+			   ["3 new records inserted.", "DataError", "DataError", "DataError", "1 new record inserted.",
+				sorted([(None, "c", 3.5), (1, "a;b", 1.5), (2, "-- not a comment", None), (8, "i", -0.5)], key=repr)],
+			   "text inserts")
+		expect([outcome[0] for outcome in done[-3:-1]] + done[-1:], ["DataError", "DataError", []],
+			   "text inserts of a value holding a | or a line break")
+
+		# a value longer than a paged table can give the length of
+		conn.execute("CREATE TABLE t_long (id int, name varchar(20)) ENGINE=paged;")
+		conn.execute("INSERT INTO t_long VALUES (1, 'a');")
+		for sql in ("INSERT INTO t_long VALUES (2, '%s');", "UPDATE t_long SET name = '%s' WHERE id = 1;"):
+			expect(raises(conn.execute, sql % ("x" * 70000)), pa4.DataError, "paged " + sql.split()[0] + " of a long value")
+
+		expect(rows(conn, "SELECT * FROM t_long;"), [("1", "a")], "paged rows after long values")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Copy Script
+# copies into a table of every setup from the files copy_files writes, a file failing in a late chunk leaves
+# none of its rows in the table or its indexes
+copy_script = """COPY {t} FROM 'rows.csv' FORMAT csv HEADER;
+COPY {t} FROM 'rows.txt';
+COPY {t} FROM 'bad.csv' FORMAT csv WORKERS 2;
+COPY {t} FROM 'bad.txt';
+COPY {t} FROM 'separator.csv' FORMAT csv;
+COPY {t} FROM 'missing.txt';
+COPY {t} FROM 'latin.txt';
+SELECT * FROM {t} WHERE id < 10;
+SELECT * FROM {t} WHERE name = 'empty';
+SELECT name FROM {t} WHERE id = 1000;
+SELECT name FROM {t} WHERE id = 2000;
+SELECT id FROM {t} WHERE name = 'a;b';
+SELECT id FROM {t} WHERE price > 500;
+INSERT INTO {t} VALUES (3000, 'after', 1.0);
+SELECT * FROM {t} WHERE id >= 3000;
+SELECT id FROM {t} WHERE name = 'l2600';
+"""
+
+
+# Copy Files Function (Helper of Copy Check)
+# writes the files copy_script copies from into a directory
+def copy_files(root):
+	files = {"rows.csv" : 'id,name,price\n1,"a;b",1.5\n2,"x, y",\n,empty,3.5\n\n3,-- not a comment,-2\n',
+			 "rows.txt" : "4|a;b|4.5\n5||\n%s" % "".join(["%d|n%d|%d.5\n" % (i, i % 9, i) for i in range(100, 600)]),
+			 "bad.csv" : "".join(["%d,b%d,1.5\n" % (i, i) for i in range(1000, 1400)]) + "1400,bad,x\n",
+			 "bad.txt" : "".join(["%d|c%d|2.5\n" % (i, i) for i in range(2000, 2400)]) + "2400|bad\n",
+			 "separator.csv" : '7,"a|b",1.5\n'}
+
+	for name, text in files.items():
+		with open(os.path.join(root, name), "w") as f:
+			f.write(text)
+
+	# a byte that is not utf-8 on line 401
+	with open(os.path.join(root, "latin.txt"), "wb") as f:
+		f.write("".join(["%d|l%d|3.5\n" % (i, i) for i in range(2500, 2900)]).encode() + b"2900|caf\xe9|1.0\n")
+
+
+# Copy Check Function
+def check_copy():
+	root, conn = new_database()
+	chunk_rows, chunk_bytes = pa4.copy_chunk_rows, pa4.copy_chunk_bytes
+
+	try:
+		# the bad files fail after several chunks are loaded
+		pa4.copy_chunk_rows = 50
+		pa4.copy_chunk_bytes = 512
+		copy_files(root)
+
+		done = compare_setups(conn, "id int, name varchar(20), price float", ["id", "name", "price"], copy_script)
+		expect([outcome[0] if isinstance(outcome, tuple) else outcome for outcome in done[:11]],
+			   ["4 new records copied.", "502 new records copied.", "DataError", "DataError", "DataError",
+				"DatabaseError", "DataError", [(1, "a;b", 1.5), (2, "x, y", None), (3, "-- not a comment", -2.0),
+											  (4, "a;b", 4.5), (5, "", None)], [(None, "empty", 3.5)], [], []],
+			   "text copies")
+		expect("line 401 of latin.txt" in done[6][1], True, "line of a byte that is not utf-8 in " + done[6][1])
+		expect(done[-1], [], "rows of a file that is not utf-8")
+
+	finally:
+		pa4.copy_chunk_rows, pa4.copy_chunk_bytes = chunk_rows, chunk_bytes
+		conn.close()
+		remove_root(root)
+
+
+# Index Script
+# selects with each comparison on int, float and varchar columns of a table of every setup, with updates,
+# deletes and a transaction changing the rows and their keys between them. the table is large enough for
+# indexes to split their nodes and buckets, and one update changes enough rows to rebuild them
+index_script = """INSERT INTO {t} VALUES %s;
+INSERT INTO {t} VALUES ('', 'a;b', ''), (3001, '', 1.5), (3002, '-- not a comment', -3.5);
+SELECT * FROM {t} WHERE id = 17;
+SELECT id FROM {t} WHERE id < 20;
+SELECT id FROM {t} WHERE id <= 20;
+SELECT id FROM {t} WHERE id > 2990;
+SELECT id FROM {t} WHERE id >= 2990 ORDER BY id DESC;
+SELECT id FROM {t} WHERE id != 5;
+SELECT id FROM {t} WHERE price = 50.25;
+SELECT id FROM {t} WHERE price < 0;
+SELECT id, price FROM {t} WHERE price >= 99.25;
+SELECT id FROM {t} WHERE name = 'a;b';
+SELECT id FROM {t} WHERE name = 'k;3';
+SELECT id FROM {t} WHERE name = '';
+SELECT id FROM {t} WHERE name > 'n8';
+SELECT * FROM {t} WHERE id = 99999;
+SELECT * FROM {t} WHERE id = 'abc';
+UPDATE {t} SET id = 10017 WHERE id = 17;
+UPDATE {t} SET name = 'moved;' WHERE price < 10;
+UPDATE {t} SET price = 1000.5 WHERE id >= 1000;
+UPDATE {t} SET name = 'none' WHERE name = 'nothing';
+DELETE FROM {t} WHERE name = 'n5';
+DELETE FROM {t} WHERE id < 3;
+DELETE FROM {t} WHERE price = 'abc';
+SELECT * FROM {t} WHERE id = 17;
+SELECT * FROM {t} WHERE id = 10017;
+SELECT id FROM {t} WHERE id <= 20;
+SELECT id FROM {t} WHERE price = 1000.5;
+SELECT id FROM {t} WHERE price < 1000;
+SELECT id FROM {t} WHERE name = 'moved;';
+SELECT id FROM {t} WHERE name = 'n5';
+BEGIN TRANSACTION;
+UPDATE {t} SET price = 7.75 WHERE id = 10017;
+UPDATE {t} SET id = 20 WHERE id = 3002;
+UPDATE {t} SET name = 'in a transaction' WHERE id = 20;
+SELECT * FROM {t} WHERE id = 20;
+COMMIT;
+SELECT id, price FROM {t} WHERE id = 10017;
+SELECT * FROM {t} WHERE id = 20;
+SELECT id FROM {t} WHERE name = 'in a transaction';
+SELECT * FROM {t};
+UPDATE {t} SET id = 'zz' WHERE id = 10017;
+UPDATE {t} SET name = 'a|b' WHERE id = 10017;
+BEGIN TRANSACTION;
+UPDATE {t} SET price = 'x' WHERE id = 20;
+UPDATE {t} SET name = 'line
+break' WHERE id = 20;
+COMMIT;
+SELECT * FROM {t} WHERE id >= 10017;
+SELECT id FROM {t} WHERE id > 2900 ORDER BY id DESC;
+""" % ", ".join(["(%d, '%s%d', %d.25)" % (i, "k;" if i % 5 == 0 else "n", i % 37, i % 100) for i in range(3000)])
+
+
+# Index Check Function
+def check_index():
+	root, conn = new_database()
+
+	try:
+		done = compare_setups(conn, "id int, name varchar(20), price float", ["id", "name", "price"], index_script)
+		expect([len(outcome) for outcome in done[2:6]], [1, 20, 21, 11], "text selects")
+		expect([done[16][0], done[23][0]], ["DataError", "DataError"], "text comparisons to 'abc'")
+		expect([outcome[0] for outcome in done[-8:-6] + done[-5:-3]], ["DataError"] * 4,
+			   "text updates to a value the column can not hold")
+		expect(done[-2], [(10017, "n17", 7.75)], "rows after the failed updates")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Unique Script
+# inserts, updates, upserts and a transaction on a table of every setup with a primary key and a unique
+# column, those that would give a key twice or leave the primary key empty fail
+unique_script = """INSERT INTO {t} VALUES (1, 'a;b', 1.5), (2, 'b', 2.5), (3, '', 3.5);
+INSERT INTO {t} VALUES (1, 'x', 0);
+INSERT INTO {t} VALUES (4, 'c', 1), (4, 'd', 1);
+INSERT INTO {t} VALUES (5, 'a;b', 1);
+INSERT INTO {t} VALUES ('', 'e', 1);
+INSERT INTO {t} VALUES (6, '', 1);
+UPDATE {t} SET id = 2 WHERE id = 1;
+UPDATE {t} SET name = 'z' WHERE id > 0;
+UPDATE {t} SET id = '' WHERE id = 1;
+UPDATE {t} SET name = 'a;b' WHERE id = 1;
+UPDATE {t} SET id = 10 WHERE name = 'a;b';
+INSERT INTO {t} VALUES (2, 'new', 9.5) ON CONFLICT DO UPDATE SET price = EXCLUDED.price;
+INSERT INTO {t} VALUES (2, 'x', 1), (7, 'g', 7.5) ON CONFLICT DO NOTHING;
+INSERT INTO {t} VALUES (8, 'b', 8.5) ON CONFLICT (name) DO UPDATE SET price = EXCLUDED.price, id = 80;
+INSERT INTO {t} VALUES (9, 'h', 1) ON CONFLICT (price) DO NOTHING;
+INSERT INTO {t} VALUES (11, 'q', 1), (11, 'r', 2) ON CONFLICT DO UPDATE SET name = EXCLUDED.name;
+INSERT INTO {t} VALUES (12, 'b', 1) ON CONFLICT DO UPDATE SET price = 0;
+INSERT INTO {t} VALUES (7, 'g2', 1) ON CONFLICT DO UPDATE SET name = 'b';
+BEGIN TRANSACTION;
+UPDATE {t} SET id = 100 WHERE id = 3;
+UPDATE {t} SET id = 100 WHERE id = 7;
+UPDATE {t} SET name = 'in a transaction' WHERE id = 100;
+COMMIT;
+SELECT * FROM {t};
+SELECT * FROM {t} WHERE id = 80;
+SELECT * FROM {t} WHERE name = 'r';
+SELECT id FROM {t} WHERE id > 5;
+CREATE UNIQUE INDEX {t}_price_unique ON {t} (price);
+UPDATE {t} SET price = 1.5 WHERE id = 7;
+CREATE UNIQUE INDEX {t}_price_unique ON {t} (price);
+INSERT INTO {t} VALUES (13, 'j', 1.5);
+INSERT INTO {t} VALUES (13, 'j', 1.5) ON CONFLICT (price) DO UPDATE SET name = EXCLUDED.name;
+SELECT * FROM {t} WHERE price = 1.5;
+"""
+
+
+# Unique Check Function
+def check_unique():
+	root, conn = new_database()
+
+	try:
+		done = compare_setups(conn, "id int PRIMARY KEY, name varchar(20) UNIQUE, price float", ["price"],
+							  unique_script)
+		expect([outcome[0] if isinstance(outcome, tuple) else outcome for outcome in done[:7]],
+			   ["3 new records inserted.", "IntegrityError", "IntegrityError", "IntegrityError", "IntegrityError",
+				"IntegrityError", "IntegrityError"], "text inserts and updates")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Zones Script
+# range queries over a table of every setup with rows in key order, enough for a paged table to have many
+# zone map blocks, and changes that take values out of the range their block held
+zones_script = """INSERT INTO {t} VALUES %s;
+SELECT id FROM {t} WHERE id >= 19990;
+SELECT id FROM {t} WHERE id < 5;
+SELECT id FROM {t} WHERE price = 5000.5;
+SELECT id FROM {t} WHERE id != 7;
+UPDATE {t} SET price = 99999.5 WHERE id = 3;
+UPDATE {t} SET id = 50000 WHERE id = 4;
+SELECT id, price FROM {t} WHERE price > 99999;
+SELECT id FROM {t} WHERE id > 40000;
+INSERT INTO {t} VALUES (-5, 'below', -1.5), ('', 'empty', '');
+SELECT * FROM {t} WHERE id < 0;
+SELECT * FROM {t} WHERE price <= -1;
+DELETE FROM {t} WHERE id < 100;
+SELECT id FROM {t} WHERE id <= 100;
+UPDATE {t} SET id = 7 WHERE id = 50000;
+SELECT id FROM {t} WHERE id = 7;
+BEGIN TRANSACTION;
+UPDATE {t} SET price = 123456.5 WHERE id = 9000;
+COMMIT;
+SELECT id FROM {t} WHERE price > 100000;
+SELECT id FROM {t} WHERE price >= 9999.5;
+""" % ", ".join(["(%d, 'e%d', %d.5)" % (i, i, i // 2) for i in range(20000)])
+
+
+# Pages Read Function (Helper of Zones Check)
+# the pages a select reads from the buffer pool
+def pages_read(conn, sql):
+	before = pa4.buffer_pool.stats()
+	rows(conn, sql)
+	after = pa4.buffer_pool.stats()
+	return after["hits"] + after["misses"] - before["hits"] - before["misses"]
+
+
+# Text Bytes Read Function (Helper of Zones Check)
+# the bytes of a text table a select comparing a column with a value reads, None when it reads them all
+def text_bytes_read(root, name, column, op, value):
+	table = pa4.TextTable(os.path.join(root, "check", name))
+	key_filter = pa4.compile_filter(pa4.Condition(column, op, value), table.dtypes[table.headers.index(column)])
+
+	with open(table.path, "rb") as f:
+		ranges = table.zone_ranges(f, table.headers.index(column), key_filter)
+
+	return None if ranges is None else sum([stop - start for start, stop in ranges])
+
+
+# Zones Check Function
+def check_zones():
+	root, conn = new_database()
+
+	try:
+		done = compare_setups(conn, "id int, name varchar(20), price float", ["id", "price"], zones_script)
+		expect([len(outcome) for outcome in done[1:5]], [10, 5, 2, 19999], "text range selects")
+
+		# a narrow range reads the pages of the blocks that can hold it
+		every = pages_read(conn, "SELECT id FROM t_paged_none;")
+		expect(pages_read(conn, "SELECT id FROM t_paged_none WHERE id >= 19990;") * 2 < every, True,
+			   "pages read for a narrow range of %d pages" % every)
+
+		# and the bytes of a text table, after the rewrites and appends of the script
+		size = os.path.getsize(os.path.join(root, "check", "t_text_none"))
+		expect(text_bytes_read(root, "t_text_none", "id", ">=", "19990") * 2 < size, True,
+			   "bytes read for a narrow range of %d bytes" % size)
+		expect(text_bytes_read(root, "t_text_none", "price", ">", "200000"), 0, "bytes read for a range past every zone")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Joins Script
+# comma, inner and left outer joins of a small table {s} with a much larger table {t} of every setup, by
+# equality, range and not equal, with empty keys and keys only one side holds. a table sixteen times
+# smaller than the other is joined through the index of the larger one when it has one
+joins_script = """INSERT INTO {s} VALUES (5, 'n5', 5.5), (5, 'twice', 5.5), (40, 'n40', 40.5), (11999, 'last', 11999.5),
+	(-1, 'none', -1.5), ('', 'empty', ''), (7, '', 7.5), (3000, 'n0', 3000.5);
+INSERT INTO {t} VALUES ('', 'blank', ''), %s;
+SELECT * FROM {s} INNER JOIN {t} ON {s}.id = {t}.id;
+SELECT x.name, y.name FROM {s} x INNER JOIN {t} y ON x.id = y.id;
+SELECT * FROM {s} x LEFT OUTER JOIN {t} y ON x.id = y.id;
+SELECT x.id, y.price FROM {s} x, {t} y WHERE x.price = y.price;
+SELECT x.id, y.id FROM {s} x INNER JOIN {t} y ON x.name = y.name;
+SELECT y.id, x.name FROM {t} y INNER JOIN {s} x ON y.id = x.id;
+SELECT y.id, x.id FROM {t} y LEFT OUTER JOIN {s} x ON y.id = x.id;
+SELECT y.id FROM {s} x INNER JOIN {t} y ON x.id = y.id ORDER BY y.id DESC;
+SELECT x.id, y.id FROM {s} x INNER JOIN {t} y ON x.id >= y.id;
+SELECT x.id, y.id FROM {s} x LEFT OUTER JOIN {t} y ON x.price > y.price;
+SELECT x.id, y.id FROM {s} x INNER JOIN {s} y ON x.id != y.id;
+SELECT x.id, y.id FROM {t} x INNER JOIN {t} y ON x.id = y.id;
+SELECT * FROM {s} x INNER JOIN {t} y ON x.id = y.name;
+UPDATE {t} SET id = 99999 WHERE id = 40;
+DELETE FROM {t} WHERE id = 5;
+INSERT INTO {t} VALUES (-1, 'new', -1.5);
+SELECT x.id, y.id, y.name FROM {s} x INNER JOIN {t} y ON x.id = y.id;
+SELECT x.id, y.id FROM {s} x LEFT OUTER JOIN {t} y ON x.id = y.id;
+SELECT id, name FROM {s} ORDER BY id;
+SELECT id, name FROM {s} ORDER BY id DESC;
+SELECT y.id FROM {s} x LEFT OUTER JOIN {t} y ON x.id = y.id ORDER BY y.id;
+SELECT y.name FROM {s} x LEFT OUTER JOIN {t} y ON x.id = y.id ORDER BY y.name DESC;
+SELECT x.name, y.price FROM {s} x LEFT OUTER JOIN {t} y ON x.id = y.id ORDER BY x.name;
+""" % ", ".join(["(%d, 'n%d', %d.5)" % (i, i % 100, i) for i in range(12000)])
+
+
+# Joins Check Function
+def check_joins():
+	root, conn = new_database()
+	budget = pa4.join_memory_budget
+	want = None
+
+	try:
+		# every setup joins as it is and again with too little memory to hash either table
+		for engine, method in table_setups():
+			for pa4.join_memory_budget in (budget, 4096):
+				suffix = "%s_%s_%d" % (engine, method or "none", pa4.join_memory_budget)
+				small = "s_" + suffix
+				table = "t_" + suffix
+				for name in (small, table):
+					conn.execute("CREATE TABLE %s (id int, name varchar(20), price float) ENGINE=%s;" % (name, engine))
+					for column in ("id", "price") if method else ():
+						conn.execute("CREATE INDEX %s_%s ON %s (%s) USING %s;" % (name, column, name, column, method))
+
+				done = script_outcomes(conn, joins_script.replace("{s}", small), table)
+				if want is None:
+					want = done
+					continue
+
+				for sql, got, wanted in zip(pa4.StatementSplitter().feed(joins_script), done, want):
+					expect(got, wanted, "%s %s in %d bytes %s" % (engine, method or "without an index",
+						   pa4.join_memory_budget, " ".join(sql.split())))
+
+		expect([len(outcome) for outcome in want[2:7]], [6, 6, 8, 6, 360], "text joins")
+		expect(want[14][0], "DatabaseError", "join of an int and a varchar column")
+		expect([want[20][-1], want[21][0]], [(None, "empty")] * 2, "empty id sorted last, first descending")
+		expect([want[22][-1], want[23][0]], [(None,)] * 2, "unmatched rows sorted last, first descending")
+
+	finally:
+		pa4.join_memory_budget = budget
+		conn.close()
+		remove_root(root)
+
+
+# Pool Script
+# statements changing paged tables held in a buffer pool of a few pages, and a text table the same way
+pool_script = """INSERT INTO {t} VALUES %s;
+UPDATE {t} SET name = 'a longer name that moves the row' WHERE id < 300;
+UPDATE {t} SET price = 0.5 WHERE price > 2000;
+DELETE FROM {t} WHERE name = 'n7';
+SELECT * FROM {t};
+SELECT * FROM {t} WHERE id = 1500;
+SELECT id FROM {t} WHERE price < 1;
+""" % ", ".join(["(%d, 'n%d', %d.5)" % (i, i % 13, i) for i in range(3000)])
+
+# Statements Child
+# runs the statements given after the root on the database check, outside of a transaction
+statements_child = '''
+import pa4
+
+conn = pa4.connect(sys.argv[1])
+conn.execute("USE check;")
+for sql in sys.argv[2:]:
+	conn.execute(sql)
+'''
+
+
+# Pool Check Function
+def check_pool():
+	root, conn = new_database()
+	capacity = pa4.buffer_pool.capacity
+
+	try:
+		# tables of many more pages than the pool holds give the rows a text table does
+		pa4.buffer_pool.capacity = 4 * pa4.page_size
+		evictions = pa4.buffer_pool.stats()["evictions"]
+		compare_setups(conn, "id int, name varchar(40), price float", ["id"], pool_script)
+		expect(pa4.buffer_pool.stats()["evictions"] > evictions, True, "pages evicted")
+		expect(len(pa4.buffer_pool.pages) <= 4, True, "pages held after the statements")
+
+		# pages held here are dropped once another process changes their table or its index
+		for method in ("none", "btree"):
+			table = "t_paged_" + method
+			before = rows(conn, "SELECT * FROM %s;" % table)
+			rows(conn, "SELECT * FROM %s WHERE id = 1500;" % table)
+			expect(run_child(statements_child, root, "UPDATE %s SET id = -1 WHERE id = 1500;" % table,
+							 "INSERT INTO %s VALUES (5000, 'new', 1.5);" % table), 0, table + " changed by another process")
+
+			want = sorted([("-1",) + row[1:] if row[0] == "1500" else row for row in before] + [("5000", "new", "1.5")])
+			expect(rows(conn, "SELECT * FROM %s;" % table), want, table + " rows after another process")
+			expect(rows(conn, "SELECT id FROM %s WHERE id = 1500;" % table), [], table + " old key after another process")
+			expect(rows(conn, "SELECT id FROM %s WHERE id = -1;" % table), [("-1",)], table + " new key after another process")
+
+		# a table dropped and made again under its name does not read the pages of the old one
+		conn.execute("DROP TABLE t_paged_none;")
+		conn.execute("CREATE TABLE t_paged_none (id int, name varchar(40), price float) ENGINE=paged;")
+		conn.execute("INSERT INTO t_paged_none VALUES (1, 'again', 2.5);")
+		expect(rows(conn, "SELECT * FROM t_paged_none;"), [("1", "again", "2.5")], "table made again")
+
+	finally:
+		pa4.buffer_pool.capacity = capacity
+		conn.close()
+		remove_root(root)
+
+
+# Crash Child
+# makes the table t_<engine> of a new database check, then commits a transaction to it and exits with
+# status 3 at the given point of the commit: before anything is logged, once the log is synced or once the
+# table is written. paused holds the commit for a second once the log is synced and then finishes it
+crash_child = '''
+import os
+import time
+import pa4
+
+root, engine, where = sys.argv[1:]
+table = "t_" + engine
+
+conn = pa4.connect(root)
+conn.execute("CREATE DATABASE check;")
+conn.execute("USE check;")
+conn.execute("CREATE TABLE %s (id int PRIMARY KEY, name varchar(10), price float) ENGINE=%s;" % (table, engine))
+conn.execute("CREATE INDEX %s_name ON %s (name) USING HASH;" % (table, table))
+conn.execute("INSERT INTO %s VALUES %s;" % (table, ", ".join(["(%d, 'n%d', 1.5)" % (i, i % 3) for i in range(40)])))
+
+if where == "unlogged":
+	append = pa4.WriteAheadLog.append
+	pa4.WriteAheadLog.append = lambda self, entries, sync=False: os._exit(3) if sync else append(self, entries, sync)
+
+elif where == "logged":
+	pa4.table_engines[engine].install = lambda self: os._exit(3)
+
+elif where == "paused":
+	install = pa4.table_engines[engine].install
+	pa4.table_engines[engine].install = lambda self: (time.sleep(1), install(self))[1]
+
+else:
+	append = pa4.WriteAheadLog.append
+	pa4.WriteAheadLog.append = lambda self, entries, sync=False: (os._exit(3) if "applied" in entries[0] else
+																  append(self, entries, sync))
+
+conn.execute("begin transaction;")
+conn.execute("UPDATE %s SET name = 'moved', price = 4.25 WHERE id < 10;" % table)
+conn.execute("UPDATE %s SET price = 6.5 WHERE id = 30;" % table)
+conn.execute("commit;")
+'''
+
+
+# Recovery Check Function
+def check_recovery():
+	before = [(str(i), "n%d" % (i % 3), "1.5") for i in range(40)]
+	after = [(key, "moved", "4.25") if int(key) < 10 else (key, name, "6.5" if key == "30" else price)
+			 for key, name, price in before]
+
+	for where in ("unlogged", "logged", "installed"):
+		want = sorted(before if where == "unlogged" else after)
+
+		for engine in sorted(pa4.table_engines):
+			root = tempfile.mkdtemp()
+			table = "t_" + engine
+			what = engine + " recovered after a crash " + where
+
+			try:
+				expect(run_child(crash_child, root, engine, where), 3, engine + " crash " + where)
+
+				# this process has not used the database, its first connection to do so recovers it
+				conn = pa4.connect(root)
+				conn.execute("USE check;")
+				expect(rows(conn, "SELECT * FROM %s;" % table), want, what)
+				expect(rows(conn, "SELECT id FROM %s WHERE name = 'moved';" % table),
+					   sorted([(key,) for key, name, price in want if name == "moved"]), what + ", by its index")
+				expect(rows(conn, "SELECT price FROM %s WHERE id = 30;" % table),
+					   [(price,) for key, name, price in want if key == "30"], what + ", by its key")
+				conn.close()
+
+			finally:
+				remove_root(root)
+
+	# a process using the database while another is between syncing its commit and writing it leaves the
+	# commit to that process
+	for engine in sorted(pa4.table_engines):
+		root = tempfile.mkdtemp()
+		table = "t_" + engine
+		log = pa4.WriteAheadLog(os.path.join(root, "check"))
+
+		try:
+			with ThreadPoolExecutor(1) as pool:
+				paused = pool.submit(run_child, crash_child, root, engine, "paused")
+				while not any(["tables" in entry for entry in log.entries()]) and not paused.done():
+					time.sleep(0.01)
+
+				expect(run_child("import pa4\npa4.connect(sys.argv[1]).execute('USE check;')", root), 0,
+					   engine + " database used during a commit")
+				expect(paused.result(), 0, engine + " commit during recovery")
+
+			conn = pa4.connect(root)
+			conn.execute("USE check;")
+			expect(rows(conn, "SELECT * FROM %s;" % table), sorted(after), engine + " commit finished by its process")
+			conn.close()
+
+		finally:
+			remove_root(root)
+
+
+# Group Session Function (Helper of Group Check)
+# one process setting every row of its table to each of a run of values in a transaction, returns the
+# commits it logged and the syncs it made. the process may be forked from one that already counted some
+def group_session(root, table, commits):
+	pa4.wal_checkpoint_size = 1
+	start = dict(pa4.wal_stats)
+
+	conn = pa4.connect(root)
+	conn.execute("USE check;")
+	for i in range(commits):
+		conn.execute("begin transaction;")
+		conn.execute("UPDATE %s SET v = %d WHERE id >= 0;" % (table, i))
+		conn.execute("commit;")
+
+	conn.close()
+	return pa4.wal_stats["commits"] - start["commits"], pa4.wal_stats["syncs"] - start["syncs"]
+
+
+# Group Check Function
+def check_group():
+	root, conn = new_database()
+	tables = ["t_%s_%d" % (engine, i) for engine in sorted(pa4.table_engines) for i in range(2)]
+	commits = 30
+
+	try:
+		for table in tables:
+			conn.execute("CREATE TABLE %s (id int, v int) ENGINE=%s;" % (table, table.split("_")[1]))
+			conn.execute("INSERT INTO %s VALUES %s;" % (table, ", ".join(["(%d, 0)" % i for i in range(20)])))
+
+		with ProcessPoolExecutor(len(tables)) as pool:
+			done = list(pool.map(group_session, [root] * len(tables), tables, [commits] * len(tables)))
+
+		expect(sum([commit_count for commit_count, sync_count in done]), commits * len(tables), "commits logged")
+		for table in tables:
+			expect(rows(conn, "SELECT v FROM %s;" % table), [(str(commits - 1),)] * 20, table + " after the commits")
+
+		expect(os.path.getsize(os.path.join(root, "check", "#wal")), 0, "bytes of the log after the last checkpoint")
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Colliding Names Function (Helper of Slots Check)
+# two table names starting with prefix whose commit slots in the #locks file are the same
+def colliding_names(prefix):
+	seen = dict()
+	for i in range(pa4.lock_slots * 4):
+		name = prefix + str(i)
+		slot = zlib.crc32(name.encode()) % pa4.lock_slots
+		if slot in seen:
+			return seen[slot], name
+
+		seen[slot] = name
+
+
+# Slots Check Function
+def check_slots():
+	root, conn = new_database()
+
+	try:
+		for engine in sorted(pa4.table_engines):
+			tables = colliding_names("t_%s_" % engine)
+			for table in tables:
+				conn.execute("CREATE TABLE %s (id int, v int) ENGINE=%s;" % (table, engine))
+				conn.execute("INSERT INTO %s VALUES (1, 0), (2, 0);" % table)
+
+			# one transaction writes both tables, the thread is left behind if the commit never ends
+			def commit_both():
+				conn.execute("begin transaction;")
+				for table in tables:
+					conn.execute("UPDATE %s SET v = 1 WHERE id = 1;" % table)
+				conn.execute("commit;")
+
+			thread = threading.Thread(target=commit_both, daemon=True)
+			thread.start()
+			thread.join(10)
+			expect(thread.is_alive(), False, engine + " commit to " + " and ".join(tables) + " hung")
+
+			# another process commits to both through the slot, the pages held here are dropped
+			expect(run_transaction(root, *["UPDATE %s SET v = 2 WHERE id = 2;" % table for table in tables]), 0,
+				   engine + " transaction of another process")
+			for table in tables:
+				expect(rows(conn, "SELECT * FROM %s;" % table), [("1", "1"), ("2", "2")], engine + " rows of " + table)
+
+	finally:
+		conn.close()
+		remove_root(root)
+
+
+# Transaction Child
+# runs the statements given after the root and lock_timeout as a transaction on the database check and
+# commits it. exits with status 0 once committed, 4 after timing out on a lock, 5 as the victim of a
+# deadlock and 6 on any other error. statements given as SLEEP seconds wait that long
+transaction_child = '''
+import time
+import pa4
+
+root, timeout = sys.argv[1:3]
+pa4.lock_timeout = float(timeout)
+
+conn = pa4.connect(root)
+conn.execute("USE check;")
+conn.execute("begin transaction;")
+try:
+	for sql in sys.argv[3:]:
+		if sql.startswith("SLEEP "):
+			time.sleep(float(sql[6:]))
+
+		else:
+			conn.execute(sql)
+
+	conn.execute("commit;")
+
+except pa4.DatabaseError as e:
+	sys.exit(4 if str(e).endswith("is locked!") else 5 if "deadlock" in str(e) else 6)
+'''
+
+
+# Run Transaction Function (Helper of Conflict and Deadlock Checks)
+# runs statements as one transaction in a new process with a short lock_timeout, returns its exit status
+def run_transaction(root, *statements):
+	return run_child(transaction_child, root, 0.5, *statements)
+
+
+# Statement Child
+# runs the statement given after the root and lock_timeout on the database check outside of a transaction,
+# with the exit statuses of the transaction child
+statement_child = '''
+import pa4
+
+root, timeout, sql = sys.argv[1:]
+pa4.lock_timeout = float(timeout)
+
+conn = pa4.connect(root)
+conn.execute("USE check;")
+try:
+	conn.execute(sql)
+
+except pa4.DatabaseError as e:
+	sys.exit(4 if str(e).endswith("is locked!") else 5 if "deadlock" in str(e) else 6)
+'''
+
+
+# Run Statement Function (Helper of Conflict Check)
+# runs a statement outside of a transaction in a new process, returns its exit status
+def run_statement(root, sql, timeout=0.5):
+	return run_child(statement_child, root, timeout, sql)
+
+
+# Outcome Function
+# what a statement run on a connection did, its message or error
+def outcome(conn, sql):
+	try:
+		return conn.execute(sql).message
+
+	except pa4.DatabaseError:
+		return "error"
+
+
+# Conflict Check Function
+def check_conflict():
+	for engine in sorted(pa4.table_engines):
+		root, conn = new_database()
+		other = pa4.connect(root)
+		other.execute("USE check;")
+		row_locks = pa4.table_engines[engine].row_locks
+
+		try:
+			conn.execute("CREATE TABLE t (id int PRIMARY KEY, v int) ENGINE=%s;" % engine)
+			conn.execute("INSERT INTO t VALUES (1, 0), (2, 0), (3, 0), (4, 0);")
+
+			# another process waits for the row this transaction holds, and for any row of a locked table
+			conn.execute("begin transaction;")
+			conn.execute("UPDATE t SET v = 1 WHERE id = 1;")
+			expect(run_transaction(root, "UPDATE t SET v = 2 WHERE id = 2;"), 0 if row_locks else 4,
+				   engine + " transaction on another row")
+			expect(run_transaction(root, "UPDATE t SET v = 3 WHERE id = 1;"), 4, engine + " transaction on the same row")
+
+			# statements outside of a transaction wait for the row as well, a delete moving the rows after the
+			# ones it takes out waits for any row
+			for sql in ("UPDATE t SET v = 3 WHERE id = 1;", "DELETE FROM t WHERE id = 1;",
+						"INSERT INTO t VALUES (1, 3) ON CONFLICT DO UPDATE SET v = EXCLUDED.v;"):
+				expect(run_statement(root, sql), 4, engine + " " + sql)
+
+			expect(run_statement(root, "INSERT INTO t VALUES (2, 2) ON CONFLICT DO UPDATE SET v = EXCLUDED.v;"),
+				   0 if row_locks else 4, engine + " upsert of another row")
+			expect(run_statement(root, "DELETE FROM t WHERE id = 7;"), 4 if pa4.table_engines[engine].delete_moves else 0,
+				   engine + " delete of no row")
+
+			# a select in the transaction reads the committed row without letting go of the locks
+			expect(rows(conn, "SELECT * FROM t WHERE id = 1;"), [("1", "0")], engine + " select in the transaction")
+			expect(run_transaction(root, "UPDATE t SET v = 3 WHERE id = 1;"), 4,
+				   engine + " transaction on the same row after a select")
+			expect(conn.execute("commit;").message, "Transaction committed.", engine + " holder commits")
+			expect(rows(conn, "SELECT * FROM t WHERE id <= 2;"), [("1", "1"), ("2", "2" if row_locks else "0")],
+				   engine + " rows after the holder commits")
+
+			# the lock goes with the commit
+			expect(run_transaction(root, "UPDATE t SET v = 3 WHERE id = 1;"), 0, engine + " transaction after the commit")
+
+			# two transactions of this process give different rows the same key, the second commit fails. a
+			# locked table fails the second transaction at once, it would wait on its own process
+			conn.execute("begin transaction;")
+			other.execute("begin transaction;")
+			conn.execute("UPDATE t SET id = 5 WHERE id = 1;")
+			expect(outcome(other, "UPDATE t SET id = 5 WHERE id = 2;"), "1 record modified." if row_locks else "error",
+				   engine + " second key update")
+			expect(outcome(conn, "commit;"), "Transaction committed.", engine + " first key commit")
+			expect(outcome(other, "commit;"), "error", engine + " second key commit")
+
+			# another process committing the key first fails this one
+			conn.execute("begin transaction;")
+			conn.execute("UPDATE t SET id = 6 WHERE id = 3;")
+			expect(run_transaction(root, "UPDATE t SET id = 6 WHERE id = 4;"), 0 if row_locks else 4,
+				   engine + " key given by another process")
+			expect(outcome(conn, "commit;"), "error" if row_locks else "Transaction committed.",
+				   engine + " key committed by another process first")
+
+			for key in ("5", "6"):
+				expect(len(rows(conn, "SELECT * FROM t WHERE id = %s;" % key)), 1, engine + " rows holding key " + key)
+				expect(len([row for row in rows(conn, "SELECT * FROM t;") if row[0] == key]), 1,
+					   engine + " rows of the table holding key " + key)
+
+			# a delete waiting for a row goes ahead once the transaction holding it commits
+			conn.execute("begin transaction;")
+			conn.execute("UPDATE t SET v = 8 WHERE id = 5;")
+			with ThreadPoolExecutor(1) as pool:
+				deleted = pool.submit(run_statement, root, "DELETE FROM t WHERE id = 5;", 5)
+				time.sleep(0.5)
+				expect(outcome(conn, "commit;"), "Transaction committed.", engine + " commit under a waiting delete")
+				expect(deleted.result(), 0, engine + " delete after the commit")
+
+			expect(rows(conn, "SELECT * FROM t WHERE id = 5;"), [], engine + " rows after the delete")
+
+		finally:
+			conn.close()
+			other.close()
+			remove_root(root)
+
+
+# Deadlock Thread Function (Helper of Deadlock Check)
+# one transaction setting two rows in turn after waiting delay seconds, with a pause between them so the
+# other transaction can take the second row first. returns whether it committed
+def deadlock_thread(root, delay, first, second, value):
+	conn = pa4.connect(root)
+	conn.execute("USE check;")
+	time.sleep(delay)
+
+	try:
+		conn.execute("begin transaction;")
+		conn.execute("UPDATE t SET v = %d WHERE id = %d;" % (value, first))
+		time.sleep(0.5)
+		conn.execute("UPDATE t SET v = %d WHERE id = %d;" % (value, second))
+		conn.execute("commit;")
+		return True
+
+	except pa4.DatabaseError:
+		return False
+
+	finally:
+		conn.rollback()
+		conn.close()
+
+
+# Deadlock Check Function
+def check_deadlock():
+	for engine in sorted(pa4.table_engines):
+		for where in ("processes", "threads"):
+			root, conn = new_database()
+			row_locks = pa4.table_engines[engine].row_locks
+			what = "%s deadlock between %s" % (engine, where)
+
+			try:
+				conn.execute("CREATE TABLE t (id int, v int) ENGINE=%s;" % engine)
+				conn.execute("INSERT INTO t VALUES (1, 0), (2, 0), (3, 0);")
+
+				# the second transaction starts later, so it is the younger
+				with ThreadPoolExecutor(2) as pool:
+					if where == "processes":
+						older = pool.submit(run_child, transaction_child, root, 5, "UPDATE t SET v = 1 WHERE id = 1;",
+											"SLEEP 0.5", "UPDATE t SET v = 1 WHERE id = 2;")
+						time.sleep(0.2)
+						younger = pool.submit(run_child, transaction_child, root, 5, "UPDATE t SET v = 2 WHERE id = 2;",
+											  "SLEEP 0.5", "UPDATE t SET v = 2 WHERE id = 1;")
+						done = [older.result() == 0, younger.result() == 0]
+
+					else:
+						done = list(pool.map(deadlock_thread, [root] * 2, [0, 0.2], [1, 2], [2, 1], [1, 2]))
+
+				expect(done, [True, not row_locks], what + ", committed")
+				expect(rows(conn, "SELECT v FROM t WHERE id <= 2;"), [("1",) if row_locks else ("2",)] * 2,
+					   what + ", rows after")
+
+			finally:
+				conn.close()
+				remove_root(root)
+
+
+# Snapshot Writer Function (Helper of Snapshot Check)
+# one process setting every row of a random group to one value for the given seconds, a group at a time
+# in a statement or two groups in a transaction. returns the statements it ran
+def snapshot_writer(root, table, seed, seconds):
+	random = __import__("random").Random(seed)
+	conn = pa4.connect(root)
+	conn.execute("USE check;")
+
+	done = 0
+	end = time.time() + seconds
+	while time.time() < end:
+		# a statement or transaction waiting on another process may time out or be a deadlock's victim
+		if random.random() < 0.5:
+			try:
+				conn.execute("UPDATE %s SET v = %d WHERE g = %d;" % (table, random.randrange(1000000),
+																	  random.randrange(20)))
+
+			except pa4.OperationalError:
+				pass
+
+		else:
+			try:
+				conn.execute("begin transaction;")
+				for g in random.sample(range(20), 2):
+					conn.execute("UPDATE %s SET v = %d WHERE g = %d;" % (table, random.randrange(1000000), g))
+
+				conn.execute("commit;")
+
+			except pa4.DatabaseError:
+				conn.rollback()
+
+		done += 1
+
+	conn.close()
+	return done
+
+
+# Snapshot Check Function
+def check_snapshot():
+	root, conn = new_database()
+	other = pa4.connect(root)
+	other.execute("USE check;")
+
+	try:
+		for engine in sorted(pa4.table_engines):
+			table = "t_" + engine
+			conn.execute("CREATE TABLE %s (id int, g int, v int) ENGINE=%s;" % (table, engine))
+			conn.execute("INSERT INTO %s VALUES %s;" % (table, ", ".join(["(%d, %d, 0)" % (i, i % 20)
+																		  for i in range(4000)])))
+			before = rows(conn, "SELECT * FROM %s;" % table)
+
+			# the rest of a select started before the changes does not see them
+			result = conn.execute("SELECT * FROM %s;" % table)
+			first = [tuple(row) for row in islice(result.rows, 10)]
+			other.cursor().executemany("INSERT INTO %s VALUES (?, ?, ?)" % table,
+									   [(i, i % 20, 1) for i in range(4000, 4100)])
+			other.execute("INSERT INTO %s VALUES (5000, 0, 1), (5001, 1, 1);" % table)
+			other.execute("UPDATE %s SET v = 2 WHERE g = 3;" % table)
+			other.execute("DELETE FROM %s WHERE g = 4;" % table)
+			other.execute("begin transaction;")
+			other.execute("UPDATE %s SET v = 3 WHERE g = 5;" % table)
+			other.execute("commit;")
+			expect(sorted(first + [tuple(row) for row in result.rows]), before, engine + " select during changes")
+			expect(len(rows(conn, "SELECT * FROM %s;" % table)), len([i for i in range(4100) if i % 20 != 4]) + 2,
+				   engine + " rows after changes")
+
+			# selects of the table while two processes change it find every group whole
+			conn.execute("UPDATE %s SET v = 0 WHERE id >= 0;" % table)
+			with ProcessPoolExecutor(2) as pool:
+				writers = [pool.submit(snapshot_writer, root, table, seed, 2.0) for seed in range(2)]
+				selects = 0
+				while not all([writer.done() for writer in writers]):
+					groups = dict()
+					for g, v in conn.execute("SELECT g, v FROM %s;" % table).rows:
+						groups.setdefault(g, set()).add(v)
+
+					expect([g for g, values in groups.items() if len(values) > 1], [],
+						   engine + " groups split in select %d" % selects)
+					selects += 1
+
+				expect(all([writer.result() > 0 for writer in writers]), True, engine + " writers ran")
+
+	finally:
+		conn.close()
+		other.close()
+		remove_root(root)
+
+
+# Main Program ########################################################################################################
+checks = {	"parse" : check_parse,
+			"dbapi" : check_dbapi,
+			"insert" : check_insert,
+			"copy" : check_copy,
+			"index" : check_index,
+			"unique" : check_unique,
+			"zones" : check_zones,
+			"joins" : check_joins,
+			"pool" : check_pool,
+			"nulls" : check_nulls,
+			"recovery" : check_recovery,
+			"group" : check_group,
+			"slots" : check_slots,
+			"conflict" : check_conflict,
+			"deadlock" : check_deadlock,
+			"snapshot" : check_snapshot	}
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="pa4 checks")
+	parser.add_argument("check", nargs="*", help="any of " + ", ".join(sorted(checks)))
+	args = parser.parse_args()
+
+	for name in args.check:
+		if name not in checks:
+			parser.error("no check named " + name)
+
+	failed = 0
+	for name in args.check or sorted(checks):
+		try:
+			checks[name]()
+			print("%-9s ok" % (name + ":"))
+
+		except (CheckFailed, pa4.DatabaseError) as e:
+			print("%-9s FAILED %s" % (name + ":", e))
+			failed += 1
+
+	sys.exit(1 if failed else 0)
@@ -12,6 +12,70 @@ This program is a database creation program that simulates some SQL commands.
 Updates from pa3:
 - Added functionality of begin transaction and commit for multiple process running.
 - Update function modified to handle transaction capabilities.
+- Equality joins build a hash table on the smaller table.
+- Range joins, joins too big for memory and joins of sorted tables use a sort-merge join.
+- An empty int or float value joins no row and sorts after every other value, before them with DESC. So
+  does the missing value an outer join pads an unmatched row with, of a column of any type.
+- Where clauses are compiled once per statement instead of evaluated with fresh lookups per row.
+- Regex dispatch replaced by a tokenizer and recursive descent parser, commands take statement nodes.
+- Statements are cut from the input by one incremental splitter that reads stdin in chunks when piped.
+- Batch mode (pa4.py -f script.sql) and a buffered writer that is flushed at statement boundaries.
+- Importable: connect() returns a Connection that keeps the USE and transaction state, resolves tables
+  against its root directory and returns results instead of printing. The REPL prints the results.
+- DB-API 2.0 interface: cursors with ? parameters, executemany and streamed fetchmany.
+- INSERT takes several value lists, checked against the column types and appended in one write.
+- COPY table FROM 'file' [FORMAT csv|pipe] [HEADER] [WORKERS n] bulk loads a file in checked chunks.
+- Tables sit behind a storage engine. CREATE TABLE ... ENGINE=paged keeps typed binary rows in 8 KiB
+  slotted pages so updates and deletes only write the pages they change, text stays the default.
+- Paged tables are read through a process wide LRU buffer pool of buffer_pool_size bytes. Changed pages
+  are written back when a statement or transaction commits, buffer_pool.stats() has the hit counters.
+- ENGINE=columnar keeps each column in a file of its own, selects read only the columns they use.
+- Where clauses are checked a batch of rows at a time, as numpy array comparisons for int and float
+  columns when numpy is installed.
+- Selects are planned into Scan, Filter, Project, Join and Sort operators that stream their rows,
+  filters are pushed into the scan. SELECT ... ORDER BY column [ASC|DESC] sorts through the Sort operator.
+- CREATE INDEX name ON table (column) builds a B+tree of the column's values and where their rows are,
+  kept in pages through the buffer pool. Inserts, updates and deletes keep it current, and where clauses
+  with =, <, <=, > or >= on the column read only the rows it finds. DROP INDEX name removes one.
+- CREATE INDEX name ON table (column) USING HASH builds a linear hash index instead, it answers = and a
+  join on the column probes it for each row of a much smaller first table instead of reading the table.
+- Columns marked PRIMARY KEY or UNIQUE in CREATE TABLE get an index (table_pkey, table_column_key) that
+  inserts and updates check before writing, a primary key can not be empty. CREATE UNIQUE INDEX adds one
+  to an existing table. INSERT ... ON CONFLICT [(column)] DO UPDATE SET column = value | EXCLUDED.column
+  or DO NOTHING changes the row already holding the key instead of failing.
+- Paged tables keep a zone map in table#zones, the smallest and largest value of each int and float column
+  for every few pages. Inserts and updates widen it, and selects, updates and deletes comparing such a
+  column to a value skip the pages whose zone can not pass. Text tables keep zones for every
+  zone_pages * page_size bytes of their file, widened before rows are appended and written again beside a
+  rewritten file, so selects read only the byte ranges of the blocks that can pass and updates and deletes
+  no block can match leave the file alone.
+- CREATE INDEX name ON table (column) USING BLOOM keeps a bloom filter of the column, one per block of a
+  paged table and one for any other table. Selects, updates and deletes with = on the column skip the
+  blocks or the whole table it rules out. Equality joins pass the keys of the table read first down to the
+  scan of the other, which drops rows that can not match before decoding them and checks its blooms.
+- Transactions keep the rows their updates change in memory instead of copying the table into its lock
+  file. COMMIT appends those rows to the database's write-ahead log (#wal) with one fsync and then writes
+  only them to the table. A checkpoint syncs the tables and empties the log once it passes
+  wal_checkpoint_size, and the first connection to USE a database redoes any commit a crash cut short.
+  Recovery holds the commit slots of the tables it redoes and leaves commits of running processes alone.
+- Commits to a database that come in together share one sync of its log. A commit that finds others
+  waiting on a sync holds off group_commit_window seconds, then syncs the log for all of them unless one
+  of them already has. Without fcntl every commit syncs the log itself.
+- Transactions lock what they change in place of the table's _lock file: a shared lock on a paged or
+  columnar table and an exclusive lock on each row they change, or an exclusive lock on a text table or
+  past lock_escalation_rows rows. Locks are fcntl byte range locks on the database's #locks file, so
+  transactions of any process changing different rows of a table run together. Commits to a table take
+  turns through a slot of the same file that counts them, telling the buffer pool when to drop its pages.
+  Updates, deletes and upserts outside of a transaction lock what they change the same way while they run.
+- A transaction that needs a lock another holds waits for it up to lock_timeout seconds instead of
+  aborting at once. Waiters follow the waits-for graph, between connections of a process and through
+  wait records in #locks between processes, and abort the youngest transaction of a deadlock, which lets
+  go of its locks. lock_manager.stats() counts the waits, their time, timeouts and deadlocks.
+- Selects read a snapshot of the database instead of waiting on writers or reading their half written
+  pages. Every statement or commit that writes takes a number off a clock in #locks and keeps what it
+  replaces in a log of #versions: the pages it changes as they were, a file's size before it appends and
+  a link to each file it replaces. A snapshot puts back what the commits it can not see replaced, and a
+  vacuum thread removes the logs no registered snapshot still needs. version_store.stats() counts them.
 
 Notes:
 - Currently no overflow check on multi-line functions for if there is no semicolon
@@ -20,7 +84,6 @@ Notes:
 
 For future versions:
 - List comprehesions should replace several loops
-- Possibly replace global file name with a list in commit that gets the names of files and looks for lock
 - New functions need to be implemented to replace repetetive code
 - Varchar is not dealt with, only casted to string
 - regex on select with parameters changed to accomodate joins. May have introduced a bug for regular select.
@@ -39,986 +102,7023 @@ import re
 from shutil import rmtree
 import operator
 import time
+import heapq
+import tempfile
+from itertools import islice, accumulate
+from collections import namedtuple, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import argparse
+import datetime
+import struct
+import math
+from bisect import bisect_left, bisect_right
+import zlib
+import json
+import threading
+import io
+import codecs
+
+# numpy is optional, where clauses and join keys pushed into a scan of int and float columns are checked a batch at
+# a time with it
+try:
+	import numpy
+
+except ImportError:
+	numpy = None
+
+# fcntl is optional, without it commits do not share syncs of the write-ahead log and each syncs its own
+try:
+	import fcntl
+
+except ImportError:
+	fcntl = None
 
 # Globals #############################################################################################################
 # regular expressions
-create_db_p = re.compile(r"CREATE\s+DATABASE\s+(\w+);\s*", re.I)
-drop_db_p = re.compile(r"DROP\s+DATABASE\s+(\w+);\s*", re.I)
-use_p = re.compile(r"USE\s+(\w+);\s*", re.I)
-create_tbl_p = re.compile(r"CREATE\s+TABLE\s+(\w+)\s*\((.*)\);\s*", re.I)
-drop_tbl_p = re.compile(r"DROP\s+TABLE\s+(\w+);\s*", re.I)
-insert_p = re.compile(r"INSERT\s+INTO\s+(\w+)\s+values\((.*)\);\s*", re.I)
-begin_trans_p = re.compile(r"BEGIN\s+TRANSACTION;\s*", re.I)
-commit_p = re.compile(r"COMMIT;\s*", re.I)
-update_p = re.compile("UPDATE\s+.*", re.I|re.S)
-delete_p = re.compile("DELETE\s.*", re.I|re.S)
-select_p = re.compile("SELECT\s+.*", re.I|re.S)
-alter_p = re.compile(r"ALTER\s+TABLE\s+(\w+)\s+(\w+)\s+(.*);\s*", re.I)
+token_p = re.compile(r"""
+	\s+ | --[^\n]* |
+	(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)) |
+	(?P<string>'[^']*') |
+	(?P<name>\w+) |
+	(?P<op><=|>=|!=|=|<|>) |
+	(?P<param>\?) |
+	(?P<punct>[(),;*.])
+	""", re.X)
+keyword_p = re.compile(r"\s*(\w+)")
+boundary_p = re.compile(r"[;']|--")
+nonspace_p = re.compile(r"\S")
 exit_p = re.compile(r"\.EXIT\s*", re.I)
-whitespace_p = re.compile(r"\s*")
+char_p = re.compile(r"(?:var)?char\((\d+)\)", re.I)
+
+# statement nodes built by the parser
+CreateDatabase = namedtuple("CreateDatabase", "name")
+DropDatabase = namedtuple("DropDatabase", "name")
+UseDatabase = namedtuple("UseDatabase", "name")
+CreateTable = namedtuple("CreateTable", "name columns engine constraints")
+DropTable = namedtuple("DropTable", "name")
+CreateIndex = namedtuple("CreateIndex", "name table column method constraint")
+DropIndex = namedtuple("DropIndex", "name")
+AlterTable = namedtuple("AlterTable", "name action column dtype")
+Insert = namedtuple("Insert", "table rows conflict")
+OnConflict = namedtuple("OnConflict", "column assignments")
+Excluded = namedtuple("Excluded", "column")
+Copy = namedtuple("Copy", "table path format header workers")
+BeginTransaction = namedtuple("BeginTransaction", "")
+Commit = namedtuple("Commit", "")
+Update = namedtuple("Update", "table assignments where")
+Delete = namedtuple("Delete", "table where")
+Select = namedtuple("Select", "columns tables join where order")
+TableRef = namedtuple("TableRef", "name alias")
+Condition = namedtuple("Condition", "column op value")
+Param = namedtuple("Param", "index")
+
+# db-api module globals
+apilevel = "2.0"
+threadsafety = 1
+paramstyle = "qmark"
+
+# copy reads | separated files this many bytes and csv files this many rows at a time, and writes
+# through a buffer of copy_buffer_size bytes
+copy_chunk_bytes = 4 * 1024 * 1024
+copy_chunk_rows = 50000
+copy_buffer_size = 16 * 1024 * 1024
+
+# parsed statements a connection keeps for reuse
+statement_cache_size = 256
+
+# paged tables are files of page_size byte pages, the first holds paged_magic and the table header
+page_size = 8192
+paged_magic = b"PA4PAGED"
+
+# columnar tables keep columnar_magic and the header in the table file and each column in a file of its own
+columnar_magic = b"PA4COLMN"
+
+# binary layouts of paged tables. a page starts with its slot count and the offset its records start at,
+# each slot is the offset and length of a record, zero length for a deleted one. varchars and the table
+# header are stored after their length
+page_header = struct.Struct("<HH")
+slot_entry = struct.Struct("<HH")
+length_s = struct.Struct("<H")
+
+# indexes are files of page_size byte pages held in the buffer pool. the first page holds the magic number
+# of the index method and the column it indexes with its type. a node starts with whether it is a leaf, its
+# entry count and the page of the next leaf, then its keys as 8 byte numbers or as one length prefixed run
+# of nul terminated varchars, the locators and an inner node's children
+btree_magic = b"PA4BTREE"
+hash_magic = b"PA4HASHX"
+bloom_magic = b"PA4BLOOM"
+node_header = struct.Struct("<BHI")
+
+# longest varchar value in bytes an index takes, so a full node always splits into two that fit
+index_key_size = page_size // 8
+
+# an index is rebuilt instead of changed an entry at a time when a statement changes more than this many
+# entries and more than an eighth of it
+index_bulk_rows = 1000
+
+# entries per bucket a hash index holds on average before it splits a bucket
+hash_bucket_rows = 256
+
+# a join probes an index on the second table instead of reading it when the first table is at least this
+# many times smaller
+index_join_ratio = 16
+
+# bloom indexes set bloom_hashes bits per key. a paged table has a bloom of bloom_block_bytes per block of
+# zone_pages pages, other tables one bloom of at least bloom_bits_per_key bits per row. a join checks the
+# blooms of the table it reads for at most bloom_probe_keys keys of the other table
+bloom_hashes = 3
+bloom_block_bytes = page_size // 2
+bloom_bits_per_key = 10
+bloom_probe_keys = 1024
+
+# paged tables keep the smallest and largest value of each int and float column for every block of
+# zone_pages pages in a file named table#zones next to them, text tables for every zone_pages * page_size
+# bytes of their file
+zone_suffix = "#zones"
+zone_pages = 8
+
+# the write-ahead log of a database is the file #wal in its directory, an entry is its length and crc32
+# followed by its json. a checkpoint syncs the tables and empties the log once it holds wal_checkpoint_size
+# bytes. a commit writes a table's new files next to them under staged_suffix until it is logged
+wal_name = "#wal"
+wal_header = struct.Struct("<II")
+wal_checkpoint_size = 4 * 1024 * 1024
+staged_suffix = "#new"
+
+# commits share syncs of the log through the file #wal#sync, locked by every writer of the log, which holds
+# the offset the log is synced up to and the count of commits waiting on a sync. a commit that finds others
+# waiting holds off group_commit_window seconds so their entries are written and one sync covers them all
+wal_sync_suffix = "#sync"
+wal_sync = struct.Struct("<QI")
+group_commit_window = 0.002
+
+# commits logged and syncs of the log made for them by this process
+wal_stats = {"commits" : 0, "syncs" : 0}
+
+# transactions lock the rows they change through the file #locks in the database directory. each table has
+# a lock_slot at the front of it, locked while a commit writes the table and holding its count of commits.
+# a lock on a table or a row is the byte at lock_key_base plus a hash of the two. a transaction changing
+# more than lock_escalation_rows rows of a table locks the whole table instead
+lock_name = "#locks"
+lock_slot = struct.Struct("<Q")
+lock_slots = 1 << 16
+lock_key_base = 1 << 40
+lock_escalation_rows = 10000
+
+# a transaction waits up to lock_timeout seconds for a lock another holds, looking again after
+# lock_poll_interval seconds at first and twice as long each time up to lock_poll_max. a process waiting
+# for a lock writes a lock_wait record after the commit slots, its id, the process it waits for and when
+# its transaction began, so waiters in any process find a deadlock and the youngest transaction in it
+# aborts. the process holding a lock is asked for with fcntl's F_GETLK in the layout of flock_layout
+lock_timeout = 5.0
+lock_poll_interval = 0.001
+lock_poll_max = 0.05
+lock_wait = struct.Struct("<qqq")
+lock_wait_slots = 1024
+flock_layout = struct.Struct("hhqqi")
+
+# selects read a snapshot of the database instead of locking. every commit writing a database takes the
+# next number of the version_clock after the wait records of #locks and writes a version log in the
+# directory #versions, holding a version_entry for what it writes over: the image of a page before its
+# first change, the size of a file before it first changes and a link to a file it replaces. a snapshot
+# registers the oldest commit it may read through in a version_reader slot of its process, and a vacuum
+# thread removes the logs no snapshot can need every vacuum_interval seconds
+versions_name = "#versions"
+version_clock = struct.Struct("<Q")
+version_reader = struct.Struct("<qQ")
+version_reader_slots = 1024
+version_entry = struct.Struct("<cHQ")
+vacuum_interval = 1.0
+
+# rows a where clause is checked against at a time
+batch_size = 4096
+
+# bytes of paged table pages kept in memory by the buffer pool
+buffer_pool_size = 64 * 1024 * 1024
+
+# bytes of table data a join or sort may hold in memory before sorting spills runs to disk
+join_memory_budget = 64 * 1024 * 1024
 
-# flags
-use_flag = False
-transaction_flag = False
-abort_flag = False
+# dictionaries
+ops = { "!=" : operator.ne,
+		"=" : operator.eq,
+		"<" : operator.lt,
+		"<=" : operator.le,
+		">" : operator.gt,
+		">=" : operator.ge 	}
+
+# whether a block whose values run from low to high can hold a value passing a comparison
+zone_tests = {	"!=" : lambda low, high, value: not low == high == value,
+				"=" : lambda low, high, value: low <= value <= high,
+				"<" : lambda low, high, value: low < value,
+				"<=" : lambda low, high, value: low <= value,
+				">" : lambda low, high, value: high > value,
+				">=" : lambda low, high, value: high >= value	}
+
+casts = { 	"varchar(10)" : str,
+			"wavrchar(20)" : str,
+			"int" : int,
+			"float" : float	}
+
+
+# Exceptions ##########################################################################################################
+# the db-api exception hierarchy, commands raise DatabaseError or one of its subclasses with the message
+# the REPL prints
+class Warning(Exception):
+	pass
+
+
+class Error(Exception):
+	pass
+
+
+class InterfaceError(Error):
+	pass
+
+
+class DatabaseError(Error):
+	pass
+
+
+class DataError(DatabaseError):
+	pass
+
+
+class OperationalError(DatabaseError):
+	pass
+
+
+class IntegrityError(DatabaseError):
+	pass
+
+
+class InternalError(DatabaseError):
+	pass
+
+
+class ProgrammingError(DatabaseError):
+	pass
+
+
+class NotSupportedError(DatabaseError):
+	pass
+
+
+# Parse Error Exception
+class ParseError(ProgrammingError):
+	pass
+
+
+# Parser ##############################################################################################################
+
+
+# Tokenize Function
+# splits a statement into (kind, text) tokens in one pass, dropping whitespace and comments
+def tokenize(text):
+	tokens = list()
+	position = 0
+	end = len(text)
+
+	while position < end:
+		m = token_p.match(text, position)
+		if m is None:
+			raise ParseError("unexpected character " + repr(text[position]))
+
+		kind = m.lastgroup
+		if kind is not None:
+			tokens.append((kind, m.group(kind)))
+
+		position = m.end()
+
+	return tokens
+
+
+# Parser Class
+# recursive descent over the tokens of one statement
+class Parser:
+	def __init__(self, text):
+		self.tokens = tokenize(text)
+		self.position = 0
+		self.params = 0
+
+	# look at the next token without consuming it
+	def peek(self):
+		if self.position < len(self.tokens):
+			return self.tokens[self.position]
+
+		return (None, None)
+
+	# consume the next token
+	def next(self):
+		token = self.peek()
+		if token[0] is None:
+			raise ParseError("unexpected end of statement")
+
+		self.position += 1
+		return token
+
+	# consume the next token if it is the given keyword
+	def accept_keyword(self, word):
+		kind, text = self.peek()
+		if kind == "name" and text.upper() == word:
+			self.position += 1
+			return True
+
+		return False
+
+	# consume the given keywords or fail
+	def keyword(self, *words):
+		for word in words:
+			if not self.accept_keyword(word):
+				raise ParseError("expected " + word)
+
+	# consume the next token if it is the given punctuation
+	def accept_punct(self, char):
+		if self.peek() == ("punct", char):
+			self.position += 1
+			return True
+
+		return False
+
+	# consume the given punctuation or fail
+	def punct(self, char):
+		if not self.accept_punct(char):
+			raise ParseError("expected " + char)
+
+	# consume an identifier
+	def name(self):
+		kind, text = self.next()
+		if kind != "name":
+			raise ParseError("expected a name")
+
+		return text
+
+	# consume a column name, optionally qualified by a table alias
+	def column(self):
+		column = self.name()
+		if self.accept_punct("."):
+			column += "." + self.name()
+
+		return column
+
+	# consume a comparison operator
+	def op(self):
+		kind, text = self.next()
+		if kind != "op":
+			raise ParseError("expected an operator")
+
+		return text
+
+	# consume a literal value or a column reference, quotes are removed from strings
+	def value(self):
+		kind, text = self.peek()
+		if kind == "number":
+			self.position += 1
+			return text
+
+		if kind == "string":
+			self.position += 1
+			return text[1:-1]
+
+		# placeholders are numbered in the order they appear
+		if kind == "param":
+			self.position += 1
+			self.params += 1
+			return Param(self.params - 1)
+
+		return self.column()
+
+	# consume a data type such as int or varchar(20)
+	def dtype(self):
+		dtype = self.name()
+		if self.accept_punct("("):
+			kind, size = self.next()
+			if kind != "number":
+				raise ParseError("expected a size")
+
+			self.punct(")")
+			dtype += "(" + size + ")"
+
+		return dtype
+
+	# consume a comparison such as a.x = b.y or price > 100
+	def condition(self):
+		return Condition(self.column(), self.op(), self.value())
+
+	# consume the closing semicolon and make sure nothing follows it
+	def end(self):
+		self.punct(";")
+		if self.peek()[0] is not None:
+			raise ParseError("unexpected text after ;")
+
+
+# Parse Create Function
+def parse_create(parser):
+	parser.keyword("CREATE")
+
+	if parser.accept_keyword("DATABASE"):
+		return CreateDatabase(parser.name())
+
+	if parser.accept_keyword("INDEX"):
+		return parse_create_index(parser)
+
+	if parser.accept_keyword("UNIQUE"):
+		parser.keyword("INDEX")
+		return parse_create_index(parser, "unique")
+
+	parser.keyword("TABLE")
+	name = parser.name()
+	columns = list()
+	constraints = list()
+
+	# parse the column definitions, a column marked both ways is the primary key
+	parser.punct("(")
+	while True:
+		column = parser.name()
+		columns.append((column, parser.dtype()))
+		constraint = None
+
+		while True:
+			if parser.accept_keyword("PRIMARY"):
+				parser.keyword("KEY")
+				constraint = "primary"
+
+			elif parser.accept_keyword("UNIQUE"):
+				constraint = constraint or "unique"
+
+			else:
+				break
+
+		if constraint is not None:
+			constraints.append((column, constraint))
+
+		if not parser.accept_punct(","):
+			break
+
+	parser.punct(")")
+
+	# parse the storage engine, text when none is given
+	engine = None
+	if parser.accept_keyword("ENGINE"):
+		if parser.peek() == ("op", "="):
+			parser.next()
+
+		engine = parser.name().lower()
+
+	return CreateTable(name, columns, engine, constraints)
+
+
+# Parse Create Index Function (Helper of Parse Create)
+# CREATE [UNIQUE] INDEX name ON table (column), the method is given by USING before or after the column
+def parse_create_index(parser, constraint=None):
+	name = parser.name()
+	parser.keyword("ON")
+	table = parser.name()
+	method = "btree"
+
+	if parser.accept_keyword("USING"):
+		method = parser.name().lower()
+
+	parser.punct("(")
+	column = parser.name()
+	parser.punct(")")
+
+	if parser.accept_keyword("USING"):
+		method = parser.name().lower()
+
+	return CreateIndex(name, table, column, method, constraint)
+
+
+# Parse Drop Function
+def parse_drop(parser):
+	parser.keyword("DROP")
+
+	if parser.accept_keyword("DATABASE"):
+		return DropDatabase(parser.name())
+
+	if parser.accept_keyword("INDEX"):
+		return DropIndex(parser.name())
+
+	parser.keyword("TABLE")
+	return DropTable(parser.name())
+
+
+# Parse Use Function
+def parse_use(parser):
+	parser.keyword("USE")
+	return UseDatabase(parser.name())
+
+
+# Parse Alter Function
+def parse_alter(parser):
+	parser.keyword("ALTER", "TABLE")
+	name = parser.name()
+	action = parser.name().upper()
+	return AlterTable(name, action, parser.name(), parser.dtype())
+
+
+# Parse Insert Function
+def parse_insert(parser):
+	parser.keyword("INSERT", "INTO")
+	table = parser.name()
+	rows = list()
+
+	# parse one or more value lists
+	parser.keyword("VALUES")
+	while True:
+		values = list()
+		parser.punct("(")
+		while True:
+			values.append(parser.value())
+			if not parser.accept_punct(","):
+				break
+
+		parser.punct(")")
+		rows.append(values)
+
+		if not parser.accept_punct(","):
+			break
+
+	# parse ON CONFLICT [(column)] DO NOTHING or DO UPDATE SET, without a column the primary key is meant
+	conflict = None
+	if parser.accept_keyword("ON"):
+		parser.keyword("CONFLICT")
+		column = None
+
+		if parser.accept_punct("("):
+			column = parser.name()
+			parser.punct(")")
+
+		parser.keyword("DO")
+		if parser.accept_keyword("NOTHING"):
+			conflict = OnConflict(column, None)
+
+		else:
+			parser.keyword("UPDATE", "SET")
+			conflict = OnConflict(column, parse_conflict_assignments(parser))
+
+	return Insert(table, rows, conflict)
+
+
+# Parse Conflict Assignments Function (Helper of Parse Insert)
+# the column = value pairs of DO UPDATE SET, a value is a literal or EXCLUDED.column for the value the
+# row being inserted gave that column
+def parse_conflict_assignments(parser):
+	assignments = list()
+
+	while True:
+		column = parser.name()
+		if parser.op() != "=":
+			raise ParseError("expected =")
+
+		if parser.peek()[0] == "name":
+			qualifier, name = parser.column().partition(".")[::2]
+			if qualifier.upper() != "EXCLUDED" or not name:
+				raise ParseError("expected EXCLUDED.column")
+
+			assignments.append((column, Excluded(name)))
+
+		else:
+			assignments.append((column, parser.value()))
+
+		if not parser.accept_punct(","):
+			break
+
+	return assignments
+
+
+# Parse Copy Function
+def parse_copy(parser):
+	parser.keyword("COPY")
+	table = parser.name()
+
+	# the file name is a string literal
+	parser.keyword("FROM")
+	kind, text = parser.next()
+	if kind != "string":
+		raise ParseError("expected a file name")
+
+	path = text[1:-1]
+	fmt = "pipe"
+	header = False
+	workers = 0
+
+	# parse the options in any order
+	while True:
+		if parser.accept_keyword("FORMAT"):
+			fmt = parser.name().lower()
+			if fmt not in ("csv", "pipe"):
+				raise ParseError("unknown format")
+
+		elif parser.accept_keyword("HEADER"):
+			header = True
+
+		elif parser.accept_keyword("WORKERS"):
+			kind, text = parser.next()
+			if kind != "number" or not text.isdigit():
+				raise ParseError("expected a worker count")
+
+			workers = int(text)
+
+		else:
+			break
+
+	return Copy(table, path, fmt, header, workers)
+
+
+# Parse Begin Function
+def parse_begin(parser):
+	parser.keyword("BEGIN", "TRANSACTION")
+	return BeginTransaction()
+
+
+# Parse Commit Function
+def parse_commit(parser):
+	parser.keyword("COMMIT")
+	return Commit()
+
+
+# Parse Update Function
+def parse_update(parser):
+	parser.keyword("UPDATE")
+	table = parser.name()
+	assignments = list()
+
+	# parse the assignments
+	parser.keyword("SET")
+	while True:
+		column = parser.name()
+		if parser.op() != "=":
+			raise ParseError("expected =")
+
+		assignments.append((column, parser.value()))
+		if not parser.accept_punct(","):
+			break
+
+	parser.keyword("WHERE")
+	return Update(table, assignments, parser.condition())
+
+
+# Parse Delete Function
+def parse_delete(parser):
+	parser.keyword("DELETE", "FROM")
+	table = parser.name()
+	parser.keyword("WHERE")
+	return Delete(table, parser.condition())
+
+
+# Parse Select Function
+def parse_select(parser):
+	parser.keyword("SELECT")
+
+	# parse the projection, None selects every column
+	if parser.accept_punct("*"):
+		columns = None
+
+	else:
+		columns = list()
+		while True:
+			columns.append(parser.column())
+			if not parser.accept_punct(","):
+				break
+
+	# parse the first table
+	parser.keyword("FROM")
+	tables = [parse_table_ref(parser)]
+	join = None
+
+	# parse a comma, inner or left outer join
+	if parser.accept_punct(","):
+		join = ","
+		tables.append(parse_table_ref(parser))
+
+	elif parser.accept_keyword("INNER"):
+		join = "inner"
+		parser.keyword("JOIN")
+		tables.append(parse_table_ref(parser))
+		parser.keyword("ON")
+
+	elif parser.accept_keyword("LEFT"):
+		join = "left outer"
+		parser.keyword("OUTER", "JOIN")
+		tables.append(parse_table_ref(parser))
+		parser.keyword("ON")
+
+	# parse the condition, joins always have one
+	where = None
+	if join in ("inner", "left outer") or parser.accept_keyword("WHERE"):
+		where = parser.condition()
+
+	elif join is not None:
+		raise ParseError("expected a join condition")
+
+	# parse the sort order as (column, descending)
+	order = None
+	if parser.accept_keyword("ORDER"):
+		parser.keyword("BY")
+		order = (parser.column(), parser.accept_keyword("DESC"))
+		if not order[1]:
+			parser.accept_keyword("ASC")
+
+	return Select(columns, tables, join, where, order)
+
+
+# Parse Table Reference Function (Helper of Parse Select)
+def parse_table_ref(parser):
+	name = parser.name()
+	alias = None
+
+	# an alias is any name that is not the next keyword
+	kind, text = parser.peek()
+	if kind == "name" and text.upper() not in ("WHERE", "INNER", "LEFT", "ON", "ORDER"):
+		alias = parser.name()
+
+	return TableRef(name, alias)
+
+
+# Statement Splitter Class
+# cuts a stream of text into statements as it arrives. each chunk is scanned once for a semicolon
+# outside of string literals and comments, the unfinished tail is kept until the next chunk. dot
+# commands such as .EXIT run to the end of their line
+class StatementSplitter:
+	def __init__(self):
+		self.pieces = list()
+		self.state = None
+		self.blank = True
+
+	# scan a chunk and return the statements it completes
+	def feed(self, chunk):
+		statements = list()
+		start = 0
+		position = 0
+		end = len(chunk)
+
+		while position < end:
+			# the last chunk ended on a dash, see if it started a comment
+			if self.state == "dash":
+				self.state = None
+				if chunk[position] == "-":
+					self.state = "comment"
+					position += 1
+
+				elif self.blank:
+					# the statement started with the kept dash
+					start = position
+					self.blank = False
+
+			# inside a string literal, skip to the closing quote
+			elif self.state == "quote":
+				position = chunk.find("'", position)
+				if position < 0:
+					break
+
+				self.state = None
+				position += 1
+
+			# inside a comment, skip to the end of the line
+			elif self.state == "comment":
+				position = chunk.find("\n", position)
+				if position < 0:
+					break
+
+				self.state = None
+				position += 1
+
+			# a dot command ends with its line
+			elif self.state == "dot":
+				position = chunk.find("\n", position)
+				if position < 0:
+					break
+
+				position += 1
+				statements.append(self.take(chunk, start, position))
+				start = position
+
+			# between statements, skip whitespace and comments to find where the next one starts
+			elif self.blank:
+				m = nonspace_p.search(chunk, position)
+				if m is None:
+					break
+
+				position = m.start()
+				if chunk.startswith("--", position):
+					self.state = "comment"
+					position += 2
+
+				# a dash at the end of the chunk may be half of a comment marker
+				elif chunk[position] == "-" and position == end - 1:
+					self.pieces = ["-"]
+					self.state = "dash"
+					position = end
+					start = end
+
+				else:
+					# drop the whitespace and comments before the statement
+					self.pieces = list()
+					start = position
+					self.blank = False
+
+					if chunk[position] == ".":
+						self.state = "dot"
+
+			# inside a statement, look for the semicolon, a quote or a comment
+			else:
+				m = boundary_p.search(chunk, position)
+				if m is None:
+					# a dash at the end of the chunk may be half of a comment marker
+					if chunk.endswith("-"):
+						self.state = "dash"
+
+					break
+
+				position = m.end()
+				if m.group() == ";":
+					statements.append(self.take(chunk, start, position))
+					start = position
+
+				elif m.group() == "'":
+					self.state = "quote"
+
+				else:
+					self.state = "comment"
+
+		# keep the unfinished tail for the next chunk
+		if start < end and not self.blank:
+			self.pieces.append(chunk[start:])
+
+		elif self.blank and self.state != "dash":
+			self.pieces = list()
+
+		return statements
+
+	# join the kept pieces with the end of the current statement and start a new one
+	def take(self, chunk, start, stop):
+		self.pieces.append(chunk[start:stop])
+		statement = "".join(self.pieces)
+		self.pieces = list()
+		self.state = None
+		self.blank = True
+		return statement
+
+	# return whatever unterminated statement is left at the end of input
+	def close(self):
+		statement = "".join(self.pieces)
+		self.pieces = list()
+		self.state = None
+		self.blank = True
+		return statement
+
+
+# Read Statements Function
+# yields the statements in a file, reading it a line at a time or in chunks of the given size. a partial
+# read takes whatever bytes a pipe has ready, up to the chunk size, instead of waiting for a full chunk
+def read_statements(f, chunk_size=None, partial=False):
+	splitter = StatementSplitter()
+	decoder = codecs.getincrementaldecoder(f.encoding)(f.errors) if partial else None
+
+	while True:
+		if decoder is not None:
+			data = f.buffer.read1(chunk_size)
+			chunk = decoder.decode(data, not data)
+			if not data and not chunk:
+				break
+
+		else:
+			chunk = f.readline() if chunk_size is None else f.read(chunk_size)
+			if not chunk:
+				break
+
+		for statement in splitter.feed(chunk):
+			yield statement
+
+	# report an unterminated statement so it can fail instead of vanishing
+	statement = splitter.close()
+	if statement.strip():
+		yield statement
+
+
+# Parse Function
+# parses one statement terminated by a semicolon, dispatching on its first keyword
+def parse(text):
+	parser = Parser(text)
+	kind, text = parser.peek()
+
+	if kind != "name" or text.upper() not in statements:
+		raise ParseError("unknown command")
+
+	stmt = statements[text.upper()](parser)
+	parser.end()
+	return stmt
+
+
+# Engine ##############################################################################################################
+# Result Class
+# what a command returns. commands that change something set message, queries set columns as
+# (name, type) pairs and rows as an iterator of the values as stored in the table. iterating a result
+# yields its rows as tuples of python values
+class Result:
+	def __init__(self, message=None, columns=None, rows=None, rowcount=-1):
+		self.message = message
+		self.columns = columns
+		self.rows = rows if rows is not None else iter(())
+		self.rowcount = rowcount
+
+	def __iter__(self):
+		converters = [get_cast(dtype) or str for name, dtype in self.columns or ()]
+
+		for row in self.rows:
+			yield tuple([convert_value(cast_func, value) for cast_func, value in zip(converters, row)])
+
+
+# Convert Value Function (Helper of Result)
+# casts a stored value, empty and missing values come back as None
+def convert_value(cast_func, value):
+	if value is None:
+		return None
+
+	try:
+		return cast_func(value)
+
+	except ValueError:
+		return None
+
+
+# Get Cast Function
+# returns the python type of a column data type or None for an unknown one, any varchar(n) is a string
+def get_cast(dtype):
+	cast_func = casts.get(dtype)
+	if cast_func is None and char_p.fullmatch(dtype):
+		return str
+
+	return cast_func
+
+
+# Get Key Cast Function (Helper of Join Rows and Sorted Input)
+# the cast of a join or sort key. the None an outer join pads a row with is missing, and so is an empty int
+# or float value, both are cast to None
+def get_key_cast(dtype):
+	cast_func = get_cast(dtype)
+	if cast_func is str:
+		return lambda value: value
+
+	return lambda value: None if value is None or value == "" else cast_func(value)
+
+
+# Database Class
+# a database directory, table names are resolved inside it
+class Database:
+	def __init__(self, path):
+		self.path = path
+		self.name = os.path.basename(path)
+
+	# path of a table file
+	def table_path(self, tbl_name):
+		return os.path.join(self.path, tbl_name)
+
+	# path of the file of an index of any table, None when there is no such index
+	def find_index(self, idx_name):
+		suffix = "@" + idx_name
+		for name in os.listdir(self.path):
+			if name.endswith(suffix):
+				return os.path.join(self.path, name)
+
+		return None
+
+
+# Connection Class
+# one session against a root directory holding databases. keeps the database chosen by USE and the
+# transaction state, so several connections can be open in one process
+class Connection:
+	def __init__(self, root="."):
+		self.root = os.path.abspath(root)
+		self.database = None
+		self.transaction_flag = False
+		self.abort_flag = False
+		self.transaction_start = 0
+		self.statement_cache = dict()
+
+		# the rows the open transaction changed, by table path and locator
+		self.changes = dict()
+
+	# run one statement, given as text or as a parsed statement node, and return its result. ? in the
+	# text are replaced by params in order
+	def execute(self, sql, params=None):
+		if isinstance(sql, str):
+			stmt = self.prepare(sql)
+
+			if "?" in sql:
+				stmt = bind_params(stmt, params or ())
+
+		else:
+			stmt = sql
+
+		return self.run_statement(stmt, commands[type(stmt)], self, stmt)
+
+	# call the function carrying out a statement with the given arguments. a statement writing a table takes
+	# its commit slot and is one commit of the database, so a snapshot sees all of it or none of it. one that
+	# finds rows it changes locked lets go of the slot, waits for them and runs again. outside of a
+	# transaction the statement lets go of its locks once it is done, it is younger than any transaction
+	def run_statement(self, stmt, command, *args):
+		path = self.written_table(stmt)
+		if path is None:
+			return command(*args)
+
+		if not self.transaction_flag:
+			self.transaction_start = time.time_ns()
+
+		try:
+			while True:
+				lock_manager.begin_commit(path)
+				try:
+					version_store.begin(self.database.path)
+					try:
+						return command(*args)
+
+					finally:
+						version_store.end(self.database.path)
+
+				except LockWait as e:
+					blocked = e
+
+				finally:
+					lock_manager.end_commit(path)
+
+				lock_manager.acquire(self, blocked.path, blocked.keys, blocked.exclusive)
+
+		finally:
+			if not self.transaction_flag:
+				self.end_transaction()
+
+	# path of the table a statement writes as it runs, None for a statement writing none or a table that is
+	# not there. an update in a transaction writes at the commit
+	def written_table(self, stmt):
+		if type(stmt) not in (Insert, Copy, Update, Delete) or self.database is None:
+			return None
+
+		if type(stmt) is Update and self.transaction_flag:
+			return None
+
+		path = self.database.table_path(stmt.table)
+		return path if os.path.isfile(path) else None
+
+	# parse a statement once and keep it for the next time the same text runs
+	def prepare(self, sql):
+		stmt = self.statement_cache.get(sql)
+
+		if stmt is None:
+			# the trailing semicolon is optional here
+			text = sql if sql.rstrip().endswith(";") else sql + ";"
+			stmt = parse(text)
+
+			if len(self.statement_cache) >= statement_cache_size:
+				self.statement_cache.clear()
+
+			self.statement_cache[sql] = stmt
+
+		return stmt
+
+	# db-api cursor
+	def cursor(self):
+		return Cursor(self)
+
+	# commit the open transaction, outside of one every statement is already committed
+	def commit(self):
+		if self.transaction_flag:
+			commit(self, Commit())
+
+	# throw away the open transaction
+	def rollback(self):
+		self.end_transaction()
+
+	# run every statement in a script, yielding each result
+	def execute_script(self, script):
+		for statement in StatementSplitter().feed(script + "\n"):
+			yield self.execute(statement)
+
+	# path of a database directory
+	def database_path(self, db_name):
+		return os.path.join(self.root, db_name)
+
+	# drop the locks and the uncommitted changes of the current transaction and leave it
+	def end_transaction(self):
+		lock_manager.release(self)
+		self.changes = dict()
+		self.transaction_flag = False
+		self.abort_flag = False
+
+	# close the connection, an open transaction is thrown away
+	def close(self):
+		self.end_transaction()
+		self.database = None
+
+
+# Cursor Class
+# db-api cursor over a connection. query rows are read from the table file as they are fetched
+class Cursor:
+	def __init__(self, connection):
+		self.connection = connection
+		self.arraysize = 1
+		self.description = None
+		self.rowcount = -1
+		self.rows = None
+
+	# run one statement with optional parameters
+	def execute(self, operation, parameters=None):
+		self.check_open()
+		result = self.connection.execute(operation, parameters)
+		self.set_result(result)
+		return self
+
+	# run one statement for every set of parameters. inserts are bound up front and appended to the
+	# table in one write, unless their ON CONFLICT clause takes parameters of its own
+	def executemany(self, operation, seq_of_parameters):
+		self.check_open()
+		stmt = self.connection.prepare(operation)
+
+		if isinstance(stmt, Insert) and not has_params(stmt.conflict):
+			rows = list()
+			for parameters in seq_of_parameters:
+				rows.extend(bind_params(stmt.rows, parameters))
+
+			result = self.connection.run_statement(stmt, insert_rows, self.connection, stmt.table, rows, stmt.conflict)
+
+		else:
+			count = 0
+			for parameters in seq_of_parameters:
+				result = self.connection.execute(bind_params(stmt, parameters))
+				count += max(result.rowcount, 0)
+
+			result = Result(rowcount=count)
+
+		self.set_result(result)
+		self.description = None
+		self.rows = None
+		return self
+
+	# keep the rows and describe the columns of a result
+	def set_result(self, result):
+		self.rowcount = result.rowcount
+
+		if result.columns is None:
+			self.description = None
+			self.rows = None
+
+		else:
+			self.description = [(name, dtype, None, None, None, None, None) for name, dtype in result.columns]
+			self.rows = iter(result)
+
+	# next row or None
+	def fetchone(self):
+		self.check_rows()
+		return next(self.rows, None)
+
+	# up to size rows, arraysize by default
+	def fetchmany(self, size=None):
+		self.check_rows()
+		if size is None:
+			size = self.arraysize
+
+		return list(islice(self.rows, size))
+
+	# every remaining row
+	def fetchall(self):
+		self.check_rows()
+		return list(self.rows)
+
+	def __iter__(self):
+		self.check_rows()
+		return self.rows
+
+	# the rows are streamed, dropping them closes the table file
+	def close(self):
+		self.rows = None
+		self.connection = None
+
+	def setinputsizes(self, sizes):
+		pass
+
+	def setoutputsize(self, size, column=None):
+		pass
+
+	# fail when the cursor has been closed
+	def check_open(self):
+		if self.connection is None:
+			raise InterfaceError("Cursor is closed.")
+
+	# fail when the last statement returned no rows
+	def check_rows(self):
+		self.check_open()
+		if self.rows is None:
+			raise ProgrammingError("No query has been executed.")
+
+
+# Type Object Class
+# db-api type objects compare equal to the type codes in a cursor description
+class TypeObject:
+	def __init__(self, *cast_funcs):
+		self.cast_funcs = cast_funcs
+
+	def __eq__(self, other):
+		return get_cast(other) in self.cast_funcs
+
+	def __hash__(self):
+		return hash(self.cast_funcs)
+
+
+# db-api types and constructors
+STRING = TypeObject(str)
+NUMBER = TypeObject(int, float)
+BINARY = TypeObject(bytes)
+DATETIME = TypeObject(datetime.datetime)
+ROWID = TypeObject()
+Date = datetime.date
+Time = datetime.time
+Timestamp = datetime.datetime
+Binary = bytes
+
+
+# Connect Function
+# opens a connection on a directory of databases, the current directory by default
+def connect(root="."):
+	return Connection(root)
+
+
+# Bind Params Function
+# returns a copy of a statement node with its ? placeholders replaced by the given values
+def bind_params(node, params):
+	if isinstance(node, Param):
+		if node.index >= len(params):
+			raise ProgrammingError("Not enough parameters for the statement.")
+
+		return format_param(params[node.index])
+
+	if isinstance(node, tuple) and hasattr(node, "_fields"):
+		return type(node)._make([bind_params(field, params) for field in node])
+
+	if isinstance(node, (list, tuple)):
+		return type(node)([bind_params(item, params) for item in node])
+
+	return node
+
+
+# Has Params Function (Helper of Execute Many)
+# whether a statement node holds any ? placeholder
+def has_params(node):
+	if isinstance(node, Param):
+		return True
+
+	if isinstance(node, (list, tuple)):
+		return any(has_params(item) for item in node)
+
+	return False
+
+
+# Format Param Function (Helper of Bind Params)
+# turns a python value into the text stored in a table
+def format_param(value):
+	if value is None:
+		return ""
+
+	text = value if isinstance(value, str) else str(value)
+
+	# the separator and line breaks would break the table format
+	if "|" in text or "\n" in text:
+		raise DataError("Value " + repr(text) + " can not be stored in a table.")
+
+	return text
+
+
+# Storage #############################################################################################################
+# Open Table Function
+# returns the storage engine of a table file. paged and columnar tables start with their magic number,
+# anything else is a text table. a table opened in a snapshot reads the rows the snapshot sees
+def open_table(path, snapshot=None):
+	with open(path, "rb") as f:
+		magic = f.read(len(paged_magic))
+
+	if snapshot is not None:
+		lock_manager.refresh_pool(path)
+
+	if magic == paged_magic:
+		return PagedTable(path, snapshot)
+
+	if magic == columnar_magic:
+		return ColumnarTable(path, snapshot)
+
+	return TextTable(path, snapshot)
+
+
+# Text Table Class
+# a header line of name type pairs and a line per row, values separated by |
+class TextTable:
+	engine = "text"
+
+	# copy hands its chunks over as table text
+	text_chunks = True
+
+	# updates and deletes rewrite the whole file, rows found through an index would not save a read
+	indexed_writes = False
+
+	# a row's locator moves when a row before it changes length, transactions lock the whole table
+	row_locks = False
+
+	# a delete moves the rows after the ones it takes out
+	delete_moves = True
+
+	# fetch seeks to each row it is given
+	indexed_reads = True
+
+	def __init__(self, path, snapshot=None):
+		self.path = path
+		self.snapshot = snapshot
+		self.header, self.headers, self.dtypes = read_header(path)
+
+		# the zones of the int and float columns, tables made before zones are read whole until written again
+		self.zones = TextZones(path, self.dtypes)
+		if not self.zones.columns:
+			self.zones = None
+
+	# write the header of a new table and its empty zones
+	@staticmethod
+	def create(path, columns):
+		with open(path, "w") as f:
+			f.write("|".join([name + " " + dtype for name, dtype in columns]) + "\n")
+			inode = os.fstat(f.fileno()).st_ino
+
+		zones = TextZones(path, [dtype for name, dtype in columns])
+		if zones.columns:
+			zones.write(zones.path, inode, b"", 0)
+
+	# open the table file as the snapshot of the table sees it, as it is without one
+	def open(self, mode="r"):
+		if self.snapshot is None:
+			return open(self.path, mode)
+
+		return self.snapshot.open(self.path, mode)
+
+	# stream the rows split into their values, only the given columns in that order when asked for
+	def scan(self, columns=None):
+		return read_rows(self.open(), columns)
+
+	# stream the given columns of the rows that pass the filter, the filter is given the values of the
+	# param_index column a batch at a time
+	def select(self, columns, param_index, key_filter):
+		scan_columns = columns if param_index in columns else columns + [param_index]
+
+		# a bloom holding none of the keys spares reading the file
+		rows = () if bloom_rejects(key_filter, 0) else self.scan_zones(scan_columns, param_index, key_filter)
+		return select_rows(rows, scan_columns.index(param_index), len(columns), key_filter)
+
+	# stream the given columns of the rows starting in the blocks whose zones can pass the filter, every row
+	# when it is not a comparison on an int or float column or the zones are not those of the file read
+	def scan_zones(self, columns, param_index, key_filter):
+		f = self.open("rb")
+		ranges = self.zone_ranges(f, param_index, key_filter)
+
+		if ranges is None or ranges == [[0, f.seek(0, os.SEEK_END)]]:
+			f.close()
+			yield from self.scan(columns)
+			return
+
+		with f:
+			f.seek(0)
+			header_size = len(f.readline())
+
+			for start, stop in ranges:
+				# a row begins after the line break before it, the rest of one that began before is skipped
+				position = max(start, header_size)
+				f.seek(position - 1)
+				if f.read(1) != b"\n":
+					position += len(f.readline())
+
+				while position < stop:
+					line = f.readline()
+					if not line:
+						break
+
+					position += len(line)
+					rvalues = line.decode().rstrip().split("|")
+					yield [rvalues[i] for i in columns]
+
+	# the [start, stop) byte ranges of an open table file holding the blocks whose zones can pass the filter,
+	# None when every block is read
+	def zone_ranges(self, f, param_index, key_filter):
+		op = getattr(key_filter, "op", None)
+		if self.zones is None or op is None or param_index not in self.zones.columns:
+			return None
+
+		# the size is read first, every row up to it widened the zones before it was written
+		size = f.seek(0, os.SEEK_END)
+		return self.zones.ranges(os.fstat(f.fileno()).st_ino, size, self.zones.columns.index(param_index),
+								 zone_tests[op], key_filter.value)
+
+	# whether no block of the table file can hold a row passing the filter
+	def zones_reject(self, param_index, key_filter):
+		with open(self.path, "rb") as f:
+			return self.zone_ranges(f, param_index, key_filter) == []
+
+	# bytes of table data
+	def size(self):
+		return os.path.getsize(self.path)
+
+	# stream (locator, row) pairs, the locator of a row is the byte offset of its line
+	def scan_locators(self, columns=None):
+		with self.open("rb") as f:
+			position = len(f.readline())
+
+			for line in f:
+				rvalues = line.decode().rstrip().split("|")
+				yield position, rvalues if columns is None else [rvalues[i] for i in columns]
+				position += len(line)
+
+	# stream the rows at the given locators, only the given columns in that order when asked for
+	def fetch(self, locators, columns=None):
+		with self.open("rb") as f:
+			for locator in locators:
+				f.seek(locator)
+				rvalues = f.readline().decode().rstrip().split("|")
+				yield rvalues if columns is None else [rvalues[i] for i in columns]
+
+	# append rows with one write and return their locators
+	def insert(self, rows):
+		lines = ["|".join(values) + "\n" for values in rows]
+		data = "".join(lines).encode()
+		version_store.save_size(self.path)
+
+		with open(self.path, "ab") as f:
+			position = f.tell()
+			if self.zones is not None:
+				self.zones.widen(os.fstat(f.fileno()).st_ino, data, position)
+
+			f.write(data)
+
+		# the lines are as long in bytes as in characters unless they hold multibyte characters
+		sizes = map(len, lines) if len(data) == sum(map(len, lines)) else [len(line.encode()) for line in lines]
+		locators = list()
+		for size in sizes:
+			locators.append(position)
+			position += size
+
+		return locators
+
+	# append (text, count) chunks through one large buffer and return the row count. each chunk widens the
+	# zones before it is written
+	def load(self, chunks):
+		num_rows = 0
+		version_store.save_size(self.path)
+
+		with open(self.path, "ab", buffering=copy_buffer_size) as f:
+			position = f.tell()
+			inode = os.fstat(f.fileno()).st_ino
+
+			for text, count in chunks:
+				data = text.encode()
+				if self.zones is not None:
+					self.zones.widen(inode, data, position)
+
+				f.write(data)
+				position += len(data)
+				num_rows += count
+
+		return num_rows
+
+	# set the assigned values of the rows that pass the filter, the file is written again beside the table
+	# and put in its place. the filter is given the values of the param_index column a batch of rows at a
+	# time. the whole file is read either way so locators from an index are not used, and the lines move so
+	# no changes are returned for the indexes, even when no row passed
+	def update(self, key_filter, assignments, param_index, locators=None):
+		# a bloom holding none of the keys or zones none of whose blocks can pass spare writing the file
+		if bloom_rejects(key_filter, 0) or self.zones_reject(param_index, key_filter):
+			return 0, None
+
+		# read the lines of the table
+		with open(self.path, "r") as f:
+			lines = f.readlines()
+
+		num_changes = 0
+
+		# check the parameter a batch at a time
+		for start in range(1, len(lines), batch_size):
+			batch = [line.rstrip("\n").split("|") for line in lines[start:start + batch_size]]
+
+			for i in key_filter([rvalues[param_index] for rvalues in batch]):
+				# update requested values
+				rvalues = batch[i]
+				for set_index, set_val in assignments:
+					rvalues[set_index] = set_val
+
+				lines[start + i] = "|".join(rvalues)
+
+				# update counter
+				num_changes += 1
+
+		# write the table again, a query reading the old file goes on reading it
+		self.write_file((lines[0] + "".join([line.strip() + "\n" for line in lines[1:]])).encode())
+		self.install()
+		return num_changes, None
+
+	# remove the rows that pass the filter, the file is written again beside the table and put in its place.
+	# the lines after a removed one move, so no changes are returned for the indexes
+	def delete(self, key_filter, param_index, locators=None):
+		if bloom_rejects(key_filter, 0) or self.zones_reject(param_index, key_filter):
+			return 0, None
+
+		# open the file and read the lines
+		with open(self.path, "r") as f:
+			lines = f.readlines()
+
+		rewrite = list()
+		rewrite.append(lines[0])
+		num_changes = 0
+
+		# check the parameter a batch at a time
+		for start in range(1, len(lines), batch_size):
+			batch = lines[start:start + batch_size]
+			deleted = set(key_filter([line.rstrip("\n").split("|")[param_index] for line in batch]))
+			num_changes += len(deleted)
+			rewrite.extend([line for i, line in enumerate(batch) if i not in deleted])
+
+		self.write_file("".join(rewrite).encode())
+		self.install()
+		return num_changes, None
+
+	# (locator, row) pairs of the rows that pass the filter, checked a batch at a time and only split whole
+	# when they pass. the whole file is read either way so locators from an index are not used
+	def matches(self, param_index, key_filter, locators=None):
+		if self.zones_reject(param_index, key_filter):
+			return []
+
+		with open(self.path, "rb") as f:
+			lines = f.readlines()
+
+		# the locator of a row is the byte offset of its line
+		offsets = list(accumulate([0] + [len(line) for line in lines]))
+		last = param_index == len(self.headers) - 1
+		found = list()
+
+		for start in range(1, len(lines), batch_size):
+			batch = [line.decode() for line in lines[start:start + batch_size]]
+			values = [line.split("|", param_index + 1)[param_index] for line in batch]
+
+			for i in key_filter([value.rstrip() for value in values] if last else values):
+				found.append((offsets[start + i], batch[i].rstrip().split("|")))
+
+		return found
+
+	# text tables take any value check_rows lets through
+	def check_assignments(self, assignments):
+		pass
+
+	# write the rows a transaction changed into a new file beside the table, given sorted (locator, old row,
+	# new row) changes. returns no changes for the indexes, they are rebuilt, and the (row number, row)
+	# records that redo the changes
+	def stage(self, rows):
+		with open(self.path, "rb") as f:
+			lines = f.readlines()
+
+		# the locator of a row is the byte offset of its line, where the lines before it end
+		ends = list(accumulate([len(line) for line in lines]))
+		records = [(bisect_left(ends, locator), rvalues) for locator, old_values, rvalues in rows]
+		self.write_staged(lines, records)
+		return None, records
+
+	# write the lines of the table with the rows of (row number, row) records set, rows past the end are gone
+	def write_staged(self, lines, records):
+		for number, rvalues in records:
+			if number + 1 < len(lines):
+				lines[number + 1] = ("|".join(rvalues) + "\n").encode()
+
+		self.write_file(b"".join(lines))
+
+	# write the table file again beside the table, with the zones of the new file beside them
+	def write_file(self, data):
+		with open(self.path + staged_suffix, "wb") as f:
+			f.write(data)
+			inode = os.fstat(f.fileno()).st_ino
+
+		if self.zones is not None:
+			start = data.index(b"\n") + 1
+			self.zones.write(self.zones.path + staged_suffix, inode, data[start:], start)
+
+	# put the staged file in place of the table, its zones first so the zones in place never describe a file
+	# they were not collected from
+	def install(self):
+		if self.zones is not None and os.path.isfile(self.zones.path + staged_suffix):
+			os.replace(self.zones.path + staged_suffix, self.zones.path)
+
+		version_store.save_file(self.path)
+		os.replace(self.path + staged_suffix, self.path)
+
+	# throw the staged files away
+	def discard(self):
+		for path in [self.path + staged_suffix, self.path + zone_suffix + staged_suffix]:
+			if os.path.isfile(path):
+				os.remove(path)
+
+	# set the rows of logged (row number, row) records again
+	def redo(self, records):
+		with open(self.path, "rb") as f:
+			lines = f.readlines()
+
+		self.write_staged(lines, records)
+		self.install()
+
+	# every file of the table
+	def files(self):
+		return [self.path] + ([self.zones.path] if self.zones is not None and os.path.isfile(self.zones.path) else [])
+
+	# text tables are written as they change
+	def flush(self):
+		pass
+
+	# remember where the table ends so a failed load can be cut back
+	def savepoint(self):
+		return os.path.getsize(self.path)
+
+	def restore(self, size):
+		with open(self.path, "r+") as f:
+			f.truncate(size)
+
+	# remove the table and its zones
+	def drop(self):
+		os.remove(self.path)
+		if os.path.isfile(self.path + zone_suffix):
+			os.remove(self.path + zone_suffix)
+
+
+# Text Zones Class (Helper of Text Table)
+# the smallest and largest value of each int and float column of the rows of a text table starting in each
+# block of zone_pages * page_size bytes of its file, in the file table#zones next to it. the file starts with
+# the inode of the table file they were collected from and is not used for any other. zones are doubles
+# rounded outward, so ints too large for one still fit
+class TextZones:
+	inode = struct.Struct("<Q")
+
+	def __init__(self, path, dtypes):
+		self.path = path + zone_suffix
+		self.width = len(dtypes)
+		self.columns = [i for i, dtype in enumerate(dtypes) if get_cast(dtype) is not str]
+		self.casts = [get_cast(dtypes[i]) for i in self.columns]
+		self.entry = struct.Struct("<" + "dd" * len(self.columns))
+		self.block_size = zone_pages * page_size
+
+		# an empty zone is wider at its low end than its high end so it widens to whatever is added
+		self.bounds = [float("inf"), float("-inf")] * len(self.columns)
+		self.empty = self.entry.pack(*self.bounds)
+
+	# the zones of the blocks of the rows in data starting at byte offset start, by block. a block is split
+	# as one string, its lines hold a value per column
+	def collect(self, data, start):
+		zones = dict()
+		first = 0
+
+		while first < len(data):
+			block = (start + first) // self.block_size
+
+			# the first row starting in the next block
+			last = (block + 1) * self.block_size - start
+			if last < len(data) and data[last - 1:last] != b"\n":
+				last = data.find(b"\n", last) + 1 or len(data)
+
+			values = data[first:last].replace(b"\n", b"|").split(b"|")
+			values.pop()
+			zone = list()
+
+			# lines that do not hold a value per column leave the block always read
+			if len(values) != self.width * data.count(b"\n", first, last):
+				values = [b"nan"] * self.width
+
+			for i, cast_func in zip(self.columns, self.casts):
+				try:
+					column = [cast_func(value) for value in values[i::self.width] if value.strip()]
+
+				except ValueError:
+					column = [float("nan")]
+
+				# a float nan has no order, a block holding one is always read
+				total = sum(column)
+				if not column:
+					low, high = float("inf"), float("-inf")
+
+				elif total != total:
+					low, high = float("-inf"), float("inf")
+
+				else:
+					low, high = outward(min(column), float("-inf")), outward(max(column), float("inf"))
+
+				zone += [low, high]
+
+			zones[block] = zone
+			first = last
+
+		return zones
+
+	# write the zones of the rows in data starting at byte offset start of the file with the given inode
+	def write(self, path, inode, data, start):
+		zones = self.collect(data, start)
+		entries = [self.entry.pack(*zones[block]) if block in zones else self.empty
+				   for block in range(max(zones) + 1 if zones else 0)]
+
+		with open(path, "wb") as f:
+			f.write(self.inode.pack(inode) + b"".join(entries))
+
+	# widen the zones by the data of rows about to be appended at byte offset start of the file with the given
+	# inode. blocks no row started in before have empty zones
+	def widen(self, inode, data, start):
+		zones = self.collect(data, start)
+
+		try:
+			f = open(self.path, "r+b")
+
+		except FileNotFoundError:
+			return
+
+		with f:
+			if f.read(self.inode.size) != self.inode.pack(inode):
+				return
+
+			known = (f.seek(0, os.SEEK_END) - self.inode.size) // self.entry.size
+			for block in sorted(zones):
+				zone = zones[block]
+				if block < known:
+					f.seek(self.inode.size + block * self.entry.size)
+					old = self.entry.unpack(f.read(self.entry.size))
+					zone = [min(old[j], zone[j]) if j % 2 == 0 else max(old[j], zone[j]) for j in range(len(zone))]
+
+				else:
+					f.seek(self.inode.size + known * self.entry.size)
+					f.write(self.empty * (block - known))
+					known = block + 1
+
+				f.seek(self.inode.size + block * self.entry.size)
+				f.write(self.entry.pack(*zone))
+
+	# the [start, stop) byte ranges of the first size bytes of the file with the given inode in blocks whose
+	# zone of the column at position can pass test against value, None when the zones are of another file
+	def ranges(self, inode, size, position, test, value):
+		try:
+			with open(self.path, "rb") as f:
+				data = f.read()
+
+		except FileNotFoundError:
+			return None
+
+		if data[:self.inode.size] != self.inode.pack(inode):
+			return None
+
+		known = (len(data) - self.inode.size) // self.entry.size
+		ranges = list()
+
+		for block in range((size + self.block_size - 1) // self.block_size):
+			if block < known:
+				zone = self.entry.unpack_from(data, self.inode.size + block * self.entry.size)
+				if not test(zone[2 * position], zone[2 * position + 1], value):
+					continue
+
+			start, stop = block * self.block_size, min(size, (block + 1) * self.block_size)
+			if ranges and ranges[-1][1] == start:
+				ranges[-1][1] = stop
+
+			else:
+				ranges.append([start, stop])
+
+		return ranges
+
+
+# Outward Function (Helper of Text Zones)
+# a number as a double, rounded toward direction when it has no exact one so a zone holding it holds it
+def outward(value, direction):
+	try:
+		bound = float(value)
+
+	except OverflowError:
+		return direction
+
+	if bound != value and (bound > value) == (direction < 0):
+		bound = math.nextafter(bound, direction)
+
+	return bound
+
+
+# Buffer Pool Class (Helper of Paged Table)
+# the pages of paged tables held in memory for the whole process, keyed by table path and page number.
+# pages are evicted least recently used first once capacity bytes are held, a dirty page is written
+# out when it is evicted or flushed. a table file changed by another process since its pages were read
+# has them dropped when it is next opened. the dirty pages of a held table stay in memory until it is
+# released, so a commit's changes reach the file only after the log. a page is kept in the version log of
+# the commit changing it before it first changes, and a snapshot reads the pages as it sees them
+class BufferPool:
+	def __init__(self, capacity):
+		self.capacity = capacity
+		self.pages = OrderedDict()
+		self.dirty = set()
+		self.held = set()
+		self.sizes = dict()
+		self.stamps = dict()
+		self.files = dict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.writes = 0
+
+	# start a statement on a table, its pages are dropped if the file changed behind the pool
+	def open(self, path):
+		stamp = self.stamp(path)
+
+		if self.stamps.get(path) != stamp and not self.has_dirty(path):
+			self.invalidate(path)
+			self.stamps[path] = stamp
+			self.sizes[path] = stamp[2] // page_size
+
+	# what identifies the state of a file, its inode, modification time and size
+	def stamp(self, path):
+		st = os.stat(path)
+		return st.st_ino, st.st_mtime_ns, st.st_size
+
+	# number of pages of a table, pages only held in the pool included, or in a snapshot of it
+	def page_count(self, path, snapshot=None):
+		if snapshot is not None:
+			return snapshot.page_count(path)
+
+		return self.sizes[path]
+
+	# return the buffer of a page, reading it on a miss. a snapshot gets a copy of the page as it sees it
+	def get(self, path, number, snapshot=None):
+		if snapshot is not None:
+			return snapshot.page(path, number)
+
+		key = (path, number)
+		data = self.pages.get(key)
+
+		if data is not None:
+			self.hits += 1
+			self.pages.move_to_end(key)
+			return data
+
+		self.misses += 1
+		f = self.file(path)
+		f.seek(number * page_size)
+		data = bytearray(f.read(page_size))
+		self.add(key, data)
+		return data
+
+	# add an empty page to the end of a table and return its number and buffer
+	def new_page(self, path):
+		number = self.sizes[path]
+		version_store.save_page(path, number)
+		self.sizes[path] = number + 1
+		data = SlottedPage().data
+		self.add((path, number), data)
+		self.dirty.add((path, number))
+		return number, data
+
+	# mark a page as changed so it is written back
+	def mark_dirty(self, path, number):
+		version_store.save_page(path, number)
+		self.dirty.add((path, number))
+
+	# hold a page, evicting the least recently used ones past the capacity
+	def add(self, key, data):
+		self.pages[key] = data
+		kept = 0
+
+		while len(self.pages) * page_size > self.capacity and len(self.pages) > kept + 1:
+			old_key, old_data = self.pages.popitem(last=False)
+
+			# a dirty page of a held table goes back to the recent end
+			if old_key in self.dirty and old_key[0] in self.held:
+				self.pages[old_key] = old_data
+				kept += 1
+				continue
+
+			self.evictions += 1
+
+			if old_key in self.dirty:
+				self.write(old_key, old_data)
+
+	# write the dirty pages of a table back to its file
+	def flush(self, path):
+		for key in sorted([key for key in self.dirty if key[0] == path]):
+			self.write(key, self.pages[key])
+
+	# write one page to its file
+	def write(self, key, data):
+		path, number = key
+		f = self.file(path)
+		f.seek(number * page_size)
+		f.write(data)
+		f.flush()
+		self.dirty.discard(key)
+		self.writes += 1
+		self.stamps[path] = self.stamp(path)
+
+	# whether a table has pages not yet written
+	def has_dirty(self, path):
+		return any(key[0] == path for key in self.dirty)
+
+	# the open file of a table
+	def file(self, path):
+		f = self.files.get(path)
+		if f is None:
+			f = self.files[path] = open(path, "r+b")
+
+		return f
+
+	# drop a table and any tables under a directory, dirty pages are thrown away
+	def invalidate(self, path):
+		prefix = path + os.sep
+		for key in [key for key in self.pages if key[0] == path or key[0].startswith(prefix)]:
+			del self.pages[key]
+			self.dirty.discard(key)
+
+		for name in [name for name in self.files if name == path or name.startswith(prefix)]:
+			self.files.pop(name).close()
+			self.stamps.pop(name, None)
+			self.sizes.pop(name, None)
+
+		for name in [name for name in self.stamps if name == path or name.startswith(prefix)]:
+			self.stamps.pop(name, None)
+			self.sizes.pop(name, None)
+
+	# cut a table back to a number of pages
+	def truncate(self, path, count):
+		for number in range(count, self.sizes[path]):
+			version_store.save_page(path, number)
+
+		for key in [key for key in self.pages if key[0] == path and key[1] >= count]:
+			del self.pages[key]
+			self.dirty.discard(key)
+
+		self.file(path).truncate(count * page_size)
+		self.sizes[path] = count
+		self.stamps[path] = self.stamp(path)
+
+	# hit, miss, eviction and write counters
+	def stats(self):
+		return {"hits" : self.hits,
+				"misses" : self.misses,
+				"evictions" : self.evictions,
+				"writes" : self.writes,
+				"pages" : len(self.pages),
+				"dirty" : len(self.dirty)}
+
+
+# Slotted Page Class (Helper of Paged Table)
+# one page of a paged table. the slot directory grows from the front of the page and the records from
+# the back, a row keeps its slot number while it stays in the page. a page works on a buffer of the
+# buffer pool in place
+class SlottedPage:
+	def __init__(self, data=None):
+		if data is None:
+			self.data = bytearray(page_size)
+			page_header.pack_into(self.data, 0, 0, page_size)
+
+		else:
+			self.data = data
+
+		self.count, self.end = page_header.unpack_from(self.data, 0)
+
+	# offset of a slot in the directory
+	def slot_offset(self, slot):
+		return page_header.size + slot * slot_entry.size
+
+	# bytes between the slot directory and the records
+	def free(self):
+		return self.end - self.slot_offset(self.count)
+
+	# yield (slot, record) for every live record
+	def records(self):
+		data = self.data
+		slots = slot_entry.iter_unpack(data[page_header.size:self.slot_offset(self.count)])
+
+		for slot, (offset, length) in enumerate(slots):
+			if length:
+				yield slot, bytes(data[offset:offset + length])
+
+	# the record in a slot, None for a deleted or missing one
+	def record(self, slot):
+		if slot >= self.count:
+			return None
+
+		offset, length = slot_entry.unpack_from(self.data, self.slot_offset(slot))
+		return bytes(self.data[offset:offset + length]) if length else None
+
+	# store a record in a new slot and return the slot, None when the page is full
+	def add(self, record):
+		if len(record) + slot_entry.size > self.free():
+			self.compact()
+			if len(record) + slot_entry.size > self.free():
+				return None
+
+		slot = self.count
+		self.count += 1
+		self.place(slot, record)
+		return slot
+
+	# store a new version of a record in its slot, False when the page has no room for it
+	def replace(self, slot, record):
+		offset, length = slot_entry.unpack_from(self.data, self.slot_offset(slot))
+
+		# a record that does not grow is written over the old one
+		if len(record) <= length:
+			self.data[offset:offset + len(record)] = record
+			slot_entry.pack_into(self.data, self.slot_offset(slot), offset, len(record))
+			return True
+
+		self.remove(slot)
+		if len(record) > self.free():
+			# compacting may trim the slot off the end of the directory, keep it
+			self.compact()
+			self.count = max(self.count, slot + 1)
+			page_header.pack_into(self.data, 0, self.count, self.end)
+
+			if len(record) > self.free():
+				return False
+
+		self.place(slot, record)
+		return True
+
+	# store a record in a given slot, growing the directory up to it. False when the page has no room
+	def put(self, slot, record):
+		if slot >= self.count:
+			if (slot + 1 - self.count) * slot_entry.size > self.free():
+				self.compact()
+
+			grow = (slot + 1 - self.count) * slot_entry.size
+			if grow > self.free():
+				return False
+
+			self.data[self.slot_offset(self.count):self.slot_offset(slot + 1)] = bytes(grow)
+			self.count = slot + 1
+			page_header.pack_into(self.data, 0, self.count, self.end)
+
+		return self.record(slot) == record or self.replace(slot, record)
+
+	# mark a slot as deleted, its bytes are reclaimed when the page is compacted
+	def remove(self, slot):
+		slot_entry.pack_into(self.data, self.slot_offset(slot), 0, 0)
+
+	# write a record at the end of the free space and point a slot at it
+	def place(self, slot, record):
+		self.end -= len(record)
+		self.data[self.end:self.end + len(record)] = record
+		slot_entry.pack_into(self.data, self.slot_offset(slot), self.end, len(record))
+		page_header.pack_into(self.data, 0, self.count, self.end)
+
+	# move the live records together at the back of the page and drop deleted slots from the end of the
+	# directory
+	def compact(self):
+		live = list(self.records())
+		self.count = live[-1][0] + 1 if live else 0
+		self.end = page_size
+		self.data[page_header.size:] = bytes(page_size - page_header.size)
+
+		for slot, record in live:
+			self.place(slot, record)
+
+		page_header.pack_into(self.data, 0, self.count, self.end)
+
+
+# Paged Table Class
+# a table stored in fixed size pages of binary rows. page 0 holds paged_magic and the table header, the
+# data pages after it are slotted pages. a record is a null bitmap, the int and float columns packed as
+# 8 byte numbers in one fixed block, then each varchar as a length and its utf-8 bytes. the locator of a
+# row is its page number and slot as number << 16 | slot
+class PagedTable:
+	engine = "paged"
+
+	# copy hands its chunks over as rows
+	text_chunks = False
+
+	# updates and deletes only read the pages of the rows an index finds
+	indexed_writes = True
+
+	# fetch reads only the pages of the rows it is given
+	indexed_reads = True
+
+	# a row keeps its locator while it stays in its page, transactions lock the rows they change
+	row_locks = True
+
+	# a delete leaves the other rows in their slots
+	delete_moves = False
+
+	def __init__(self, path, snapshot=None):
+		self.path = path
+		self.snapshot = snapshot
+
+		# read the header from the first page
+		buffer_pool.open(path)
+		meta = buffer_pool.get(path, 0, snapshot)
+
+		start = len(paged_magic) + length_s.size
+		length, = length_s.unpack_from(meta, len(paged_magic))
+		self.header, self.headers, self.dtypes = parse_header(meta[start:start + length].decode())
+
+		# split the columns into the fixed block and the varchars
+		casts = [get_cast(dtype) or str for dtype in self.dtypes]
+		self.fixed_columns = [(i, cast_func) for i, cast_func in enumerate(casts) if cast_func is not str]
+		self.var_columns = [i for i, cast_func in enumerate(casts) if cast_func is str]
+		self.fixed = struct.Struct("<" + "".join(["q" if cast_func is int else "d"
+												  for i, cast_func in self.fixed_columns]))
+		self.fixed_indices = [i for i, cast_func in self.fixed_columns]
+		self.mask_size = (len(self.dtypes) + 7) // 8
+		self.var_start = self.mask_size + self.fixed.size
+
+		# the zone map of the int and float columns, tables made before zone maps have none
+		self.zones = None
+		if os.path.isfile(path + zone_suffix):
+			self.zones = ZoneMap(path + zone_suffix, self.fixed.format[1:], snapshot)
+
+	# write the first page of a new table and an empty zone map when it has int or float columns
+	@staticmethod
+	def create(path, columns):
+		header = "|".join([name + " " + dtype for name, dtype in columns]).encode()
+		meta = bytearray(page_size)
+		meta[:len(paged_magic)] = paged_magic
+		length_s.pack_into(meta, len(paged_magic), len(header))
+		meta[len(paged_magic) + length_s.size:len(paged_magic) + length_s.size + len(header)] = header
+
+		with open(path, "wb") as f:
+			f.write(meta)
+
+		if any((get_cast(dtype) or str) is not str for name, dtype in columns):
+			open(path + zone_suffix, "wb").close()
+
+	# turn a row of text values into a record, fails if a value does not fit its type or the record does
+	# not fit in a page
+	def encode(self, values):
+		nulls = 0
+		numbers = list()
+		parts = list()
+
+		# empty values are marked in the bitmap and stored as zero
+		for i, cast_func in self.fixed_columns:
+			value = values[i]
+			if not value:
+				nulls |= 1 << i
+				numbers.append(0)
+				continue
+
+			try:
+				numbers.append(cast_func(value))
+
+			except ValueError:
+				raise DataError("Value " + repr(value) + " is not a valid " + self.dtypes[i] + ".")
+
+		for i in self.var_columns:
+			data = values[i].encode()
+			if not data:
+				nulls |= 1 << i
+
+			# a value too long for its length to be stored could never fit a page either
+			if len(data) > page_size:
+				raise DataError("Row is too large for a page.")
+
+			parts.append(length_s.pack(len(data)))
+			parts.append(data)
+
+		try:
+			record = nulls.to_bytes(self.mask_size, "little") + self.fixed.pack(*numbers) + b"".join(parts)
+
+		except struct.error:
+			raise DataError("Value out of range in row " + repr("|".join(values)) + ".")
+
+		if len(record) + slot_entry.size > page_size - page_header.size:
+			raise DataError("Row is too large for a page.")
+
+		return record
+
+	# returns a function that reads the value of one column from a record. int and float values are read
+	# from the fixed block as numbers without decoding the rest, empty ones come back as ""
+	def key_reader(self, index):
+		if index in self.var_columns:
+			decode = self.decode
+			return lambda record: decode(record)[index]
+
+		position = self.fixed_indices.index(index)
+		fmt = struct.Struct("<" + self.fixed.format[1 + position])
+		offset = self.mask_size + struct.calcsize("<" + self.fixed.format[1:1 + position])
+		byte, bit = divmod(index, 8)
+
+		def key(record):
+			if record[byte] >> bit & 1:
+				return ""
+
+			return fmt.unpack_from(record, offset)[0]
+
+		return key
+
+	# turn a record back into a row of text values
+	def decode(self, record):
+		values = [""] * len(self.dtypes)
+
+		# the fixed block in one unpack
+		for i, number in zip(self.fixed_indices, self.fixed.unpack_from(record, self.mask_size)):
+			values[i] = str(number)
+
+		# then each varchar, the length is two little endian bytes
+		position = self.var_start
+		for i in self.var_columns:
+			end = position + 2 + (record[position] | record[position + 1] << 8)
+			values[i] = record[position + 2:end].decode()
+			position = end
+
+		# empty the values marked in the bitmap
+		if any(record[:self.mask_size]):
+			nulls = int.from_bytes(record[:self.mask_size], "little")
+			for i in self.fixed_indices:
+				if nulls >> i & 1:
+					values[i] = ""
+
+		return values
+
+	# stream the rows of every data page, only the given columns in that order when asked for
+	def scan(self, columns=None):
+		decode = self.decode
+
+		for number in range(1, buffer_pool.page_count(self.path, self.snapshot)):
+			for slot, record in SlottedPage(buffer_pool.get(self.path, number, self.snapshot)).records():
+				rvalues = decode(record)
+				yield rvalues if columns is None else [rvalues[i] for i in columns]
+
+	# stream (locator, row) pairs of every data page
+	def scan_locators(self, columns=None):
+		decode = self.decode
+
+		for number in range(1, buffer_pool.page_count(self.path, self.snapshot)):
+			for slot, record in SlottedPage(buffer_pool.get(self.path, number, self.snapshot)).records():
+				rvalues = decode(record)
+				yield number << 16 | slot, rvalues if columns is None else [rvalues[i] for i in columns]
+
+	# stream the rows at the given locators, only the given columns in that order when asked for
+	def fetch(self, locators, columns=None):
+		decode = self.decode
+
+		for number, page, records in self.pages(locators):
+			for slot, record in records:
+				rvalues = decode(record)
+				yield rvalues if columns is None else [rvalues[i] for i in columns]
+
+	# yield (number, page, [(slot, record)]) for every data page or the given page numbers, or for the pages
+	# of the given locators with only their live records
+	def pages(self, locators=None, numbers=None):
+		if locators is None:
+			for number in range(1, buffer_pool.page_count(self.path, self.snapshot)) if numbers is None else numbers:
+				page = SlottedPage(buffer_pool.get(self.path, number, self.snapshot))
+				yield number, page, list(page.records())
+
+			return
+
+		# locators in the same page are read together
+		locators = iter(locators)
+		locator = next(locators, None)
+
+		while locator is not None:
+			number = locator >> 16
+			page = SlottedPage(buffer_pool.get(self.path, number, self.snapshot))
+			records = list()
+
+			while locator is not None and locator >> 16 == number:
+				record = page.record(locator & 0xFFFF)
+				if record is not None:
+					records.append((locator & 0xFFFF, record))
+
+				locator = next(locators, None)
+
+			yield number, page, records
+
+	# the numbers of the data pages that can hold rows passing a filter. a filter compiled from a comparison
+	# on an int or float column skips the blocks whose zone can not pass it, one given a bloom skips the
+	# blocks whose bloom holds none of its keys
+	def candidates(self, param_index, key_filter):
+		count = buffer_pool.page_count(self.path, self.snapshot)
+		op = getattr(key_filter, "op", None)
+
+		if self.zones is None or op is None or param_index not in self.fixed_indices:
+			numbers = range(1, count)
+
+		else:
+			numbers = self.zones.pages(count, self.fixed_indices.index(param_index), zone_tests[op],
+									   key_filter.value)
+
+		if getattr(key_filter, "bloom", None) is None:
+			return numbers
+
+		# each block is looked up once for its pages
+		numbers = list(numbers)
+		kept = set([block for block in set([number // zone_pages for number in numbers])
+					if not bloom_rejects(key_filter, block)])
+		return [number for number in numbers if number // zone_pages in kept]
+
+	# stream the given columns of the rows that pass the filter, a page is checked at a time and only the
+	# rows that pass are decoded
+	def select(self, columns, param_index, key_filter):
+		decode = self.decode
+		key = self.key_reader(param_index)
+
+		for number in self.candidates(param_index, key_filter):
+			page = SlottedPage(buffer_pool.get(self.path, number, self.snapshot))
+			records = [record for slot, record in page.records()]
+
+			for i in key_filter([key(record) for record in records]):
+				rvalues = decode(records[i])
+				yield [rvalues[j] for j in columns]
+
+	# bytes of table data
+	def size(self):
+		return buffer_pool.page_count(self.path, self.snapshot) * page_size
+
+	# append rows and return their locators, every row is encoded before anything is written
+	def insert(self, rows):
+		return self.insert_records([self.encode(values) for values in rows])
+
+	# fill the last page and add new pages as they are needed, returns the locators of the records
+	def insert_records(self, records):
+		number = buffer_pool.page_count(self.path) - 1
+		locators = list()
+
+		if number > 0:
+			page = SlottedPage(buffer_pool.get(self.path, number))
+
+		else:
+			number, data = buffer_pool.new_page(self.path)
+			page = SlottedPage(data)
+
+		buffer_pool.mark_dirty(self.path, number)
+
+		for record in records:
+			slot = page.add(record)
+			if slot is None:
+				number, data = buffer_pool.new_page(self.path)
+				page = SlottedPage(data)
+				slot = page.add(record)
+
+			locators.append(number << 16 | slot)
+
+		self.widen([locator >> 16 for locator in locators], records)
+		return locators
+
+	# widen the zones of the blocks the records were written to, given the page number of each record.
+	# empty values are stored as zero and widen a zone by it, which only means it is skipped less
+	def widen(self, numbers, records):
+		if self.zones is None or not records:
+			return
+
+		unpack = self.fixed.unpack_from
+		mask_size = self.mask_size
+		blocks = dict()
+
+		for number, record in zip(numbers, records):
+			blocks.setdefault(number // zone_pages, []).append(unpack(record, mask_size))
+
+		for block, values in blocks.items():
+			self.zones.widen(block, list(zip(*values)))
+
+	# append (rows, count) chunks and return the row count
+	def load(self, chunks):
+		num_rows = 0
+
+		for rows, count in chunks:
+			self.insert(rows)
+			num_rows += count
+
+		return num_rows
+
+	# set the assigned values of the rows that pass the filter, a page of rows is checked at a time. rows
+	# are changed in their pages and only changed pages are marked dirty, a row that no longer fits its
+	# page moves to the end of the table. only the rows at the given sorted locators are checked when an
+	# index found them. returns the count and (old locator, old row, new locator, new row) per change
+	def update(self, key_filter, assignments, param_index, locators=None):
+		self.check_assignments(assignments)
+
+		changes = list()
+		moved = list()
+		written = list()
+
+		key = self.key_reader(param_index)
+		numbers = None if locators is not None else self.candidates(param_index, key_filter)
+
+		for number, page, records in self.pages(locators, numbers):
+			# check the parameter
+			for i in key_filter([key(record) for slot, record in records]):
+				# update requested values
+				old_values = self.decode(records[i][1])
+				rvalues = list(old_values)
+				for set_index, set_val in assignments:
+					rvalues[set_index] = set_val
+
+				slot = records[i][0]
+				record = self.encode(rvalues)
+				if page.replace(slot, record):
+					changes.append((number << 16 | slot, old_values, number << 16 | slot, rvalues))
+					written.append((number, record))
+
+				else:
+					moved.append((number << 16 | slot, old_values, record, rvalues))
+
+				buffer_pool.mark_dirty(self.path, number)
+
+		# the zones of changed rows are widened to their new values, moved rows widen theirs as they are added
+		self.widen([number for number, record in written], [record for number, record in written])
+
+		# rows are moved after the scan so they are not updated twice
+		if moved:
+			new_locators = self.insert_records([record for locator, old_values, record, rvalues in moved])
+			for (locator, old_values, record, rvalues), new_locator in zip(moved, new_locators):
+				changes.append((locator, old_values, new_locator, rvalues))
+
+		return len(changes), changes
+
+	# remove the rows that pass the filter, only changed pages are marked dirty. only the rows at the given
+	# sorted locators are checked when an index found them. returns the count and (locator, row) per row
+	def delete(self, key_filter, param_index, locators=None):
+		key = self.key_reader(param_index)
+		changes = list()
+		numbers = None if locators is not None else self.candidates(param_index, key_filter)
+
+		for number, page, records in self.pages(locators, numbers):
+			for i in key_filter([key(record) for slot, record in records]):
+				slot, record = records[i]
+				page.remove(slot)
+				buffer_pool.mark_dirty(self.path, number)
+				changes.append((number << 16 | slot, self.decode(record)))
+
+		return len(changes), changes
+
+	# (locator, row) pairs of the rows that pass the filter, only the rows at the given sorted locators are
+	# checked when an index found them
+	def matches(self, param_index, key_filter, locators=None):
+		key = self.key_reader(param_index)
+		numbers = None if locators is not None else self.candidates(param_index, key_filter)
+		found = list()
+
+		for number, page, records in self.pages(locators, numbers):
+			for i in key_filter([key(record) for slot, record in records]):
+				slot, record = records[i]
+				found.append((number << 16 | slot, self.decode(record)))
+
+		return found
+
+	# fail when an assigned value does not fit the type of its column
+	def check_assignments(self, assignments):
+		for set_index, set_val in assignments:
+			row = [""] * len(self.dtypes)
+			row[set_index] = set_val
+			self.encode(row)
+
+	# change the rows a transaction changed in the buffer pool, given sorted (locator, old row, new row)
+	# changes. the table is held so no page of it reaches the file before it is installed. returns the
+	# changes for the indexes and the (locator, row) records that redo them, a row moved out of its page
+	# leaves a record clearing its slot
+	def stage(self, rows):
+		encoded = [self.encode(rvalues) for locator, old_values, rvalues in rows]
+		buffer_pool.held.add(self.path)
+
+		changes = list()
+		records = list()
+		moved = list()
+		written = list()
+
+		for (locator, old_values, rvalues), record in zip(rows, encoded):
+			number = locator >> 16
+			buffer_pool.mark_dirty(self.path, number)
+
+			if SlottedPage(buffer_pool.get(self.path, number)).replace(locator & 0xFFFF, record):
+				changes.append((locator, old_values, locator, rvalues))
+				records.append((locator, rvalues))
+				written.append((number, record))
+
+			else:
+				records.append((locator, None))
+				moved.append((locator, old_values, record, rvalues))
+
+		self.widen([number for number, record in written], [record for number, record in written])
+
+		if moved:
+			new_locators = self.insert_records([record for locator, old_values, record, rvalues in moved])
+			for (locator, old_values, record, rvalues), new_locator in zip(moved, new_locators):
+				changes.append((locator, old_values, new_locator, rvalues))
+				records.append((new_locator, rvalues))
+
+		return changes, records
+
+	# release the table and write its staged pages
+	def install(self):
+		buffer_pool.held.discard(self.path)
+		self.flush()
+
+	# release the table and drop its staged pages
+	def discard(self):
+		buffer_pool.held.discard(self.path)
+		buffer_pool.invalidate(self.path)
+
+	# put the rows of logged (locator, row) records in their slots again, a row of None clears its slot.
+	# each page is either as it was before the commit or after it, so a record fits where it did
+	def redo(self, records):
+		for locator, rvalues in records:
+			number, slot = locator >> 16, locator & 0xFFFF
+
+			while buffer_pool.page_count(self.path) <= number:
+				buffer_pool.new_page(self.path)
+
+			page = SlottedPage(buffer_pool.get(self.path, number))
+			buffer_pool.mark_dirty(self.path, number)
+
+			if rvalues is None:
+				if slot < page.count:
+					page.remove(slot)
+
+				continue
+
+			record = self.encode(rvalues)
+			if not page.put(slot, record):
+				raise InternalError("Table " + os.path.basename(self.path) + " could not be recovered.")
+
+			self.widen([number], [record])
+
+		self.flush()
+
+	# every file of the table
+	def files(self):
+		return [self.path] + ([self.zones.path] if self.zones is not None else [])
+
+	# write the changed pages back to the file. the zone map is written first so it never holds less than
+	# the pages do
+	def flush(self):
+		if self.zones is not None:
+			self.zones.flush()
+
+		buffer_pool.flush(self.path)
+
+	# remember the size of the table and its last page so a failed load can be undone. the zones stay as
+	# wide as the load made them
+	def savepoint(self):
+		number = buffer_pool.page_count(self.path) - 1
+		return number, bytes(buffer_pool.get(self.path, number))
+
+	def restore(self, savepoint):
+		number, data = savepoint
+		buffer_pool.truncate(self.path, number + 1)
+		buffer_pool.get(self.path, number)[:] = data
+		buffer_pool.mark_dirty(self.path, number)
+		self.flush()
+
+	# remove the table and its zone map and drop their pages
+	def drop(self):
+		buffer_pool.invalidate(self.path)
+		os.remove(self.path)
+
+		if self.zones is not None:
+			buffer_pool.invalidate(self.zones.path)
+			os.remove(self.zones.path)
+
+
+# Zone Map Class (Helper of Paged Table)
+# the smallest and largest value of each int and float column of a paged table for every block of
+# zone_pages pages, kept in pages of its own file through the buffer pool. zones are only widened, rows
+# deleted or changed leave them as wide as they were. a block past the end of the file has no zone and is
+# always read
+class ZoneMap:
+	def __init__(self, path, formats, snapshot=None):
+		self.path = path
+		self.snapshot = snapshot
+		self.entry = struct.Struct("<" + "".join([fmt + fmt for fmt in formats]))
+		self.per_page = page_size // self.entry.size
+
+		# an empty zone is wider at its low end than its high end so it widens to whatever is added
+		bounds = {"q" : (2 ** 63 - 1, -2 ** 63), "d" : (float("inf"), float("-inf"))}
+		self.empty = self.entry.pack(*[bound for fmt in formats for bound in bounds[fmt]])
+		buffer_pool.open(path)
+
+	# the page holding the zone of a block, adding empty pages up to it
+	def page(self, block):
+		number = block // self.per_page
+
+		while buffer_pool.page_count(self.path) <= number:
+			new_number, data = buffer_pool.new_page(self.path)
+			data[:] = (self.empty * self.per_page).ljust(page_size, b"\0")
+
+		return number, buffer_pool.get(self.path, number)
+
+	# widen the zone of a block by the values of each column
+	def widen(self, block, columns):
+		number, data = self.page(block)
+		offset = block % self.per_page * self.entry.size
+		zone = list(self.entry.unpack_from(data, offset))
+
+		for j, values in enumerate(columns):
+			low, high = min(values), max(values)
+
+			# a float nan has no order, a block holding one is always read
+			total = sum(values)
+			if total != total:
+				low, high = float("-inf"), float("inf")
+
+			zone[2 * j] = min(zone[2 * j], low)
+			zone[2 * j + 1] = max(zone[2 * j + 1], high)
+
+		self.entry.pack_into(data, offset, *zone)
+		buffer_pool.mark_dirty(self.path, number)
+
+	# the numbers of the data pages below count in blocks whose zone of the column at position can pass
+	# test against value
+	def pages(self, count, position, test, value):
+		blocks = (count + zone_pages - 1) // zone_pages
+		known = min(blocks, buffer_pool.page_count(self.path, self.snapshot) * self.per_page)
+
+		for block in range(blocks):
+			if block < known:
+				data = buffer_pool.get(self.path, block // self.per_page, self.snapshot)
+				zone = self.entry.unpack_from(data, block % self.per_page * self.entry.size)
+				if not test(zone[2 * position], zone[2 * position + 1], value):
+					continue
+
+			yield from range(max(1, block * zone_pages), min(count, (block + 1) * zone_pages))
+
+	# write the changed pages back to the file
+	def flush(self):
+		buffer_pool.flush(self.path)
+
+
+# Columnar Table Class
+# a table stored a column per file. the table file holds columnar_magic and the header, each column is a
+# file in the database directory named table.column with a line per value. a scan reads only the files of
+# the columns it is asked for. the locator of a row is its position
+class ColumnarTable:
+	engine = "columnar"
+
+	# copy hands its chunks over as rows
+	text_chunks = False
+
+	# updates and deletes read the whole column, rows found through an index would not save a read
+	indexed_writes = False
+
+	# fetch reads whole columns, a join probing an index a batch at a time would read them again and again
+	indexed_reads = False
+
+	# a row keeps its position until a delete, transactions lock the rows they change
+	row_locks = True
+
+	# a delete moves the rows after the ones it takes out, it locks the whole table
+	delete_moves = True
+
+	def __init__(self, path, snapshot=None):
+		self.path = path
+		self.snapshot = snapshot
+
+		# the header is the second line of the table file
+		with open(path, "r") as f:
+			f.readline()
+			self.header, self.headers, self.dtypes = parse_header(f.readline())
+
+		# the columns a commit has written new files for
+		self.staged = list()
+
+	# write the table file and an empty file per column
+	@staticmethod
+	def create(path, columns):
+		with open(path, "w") as f:
+			f.write(columnar_magic.decode() + "\n" + "|".join([name + " " + dtype for name, dtype in columns]) + "\n")
+
+		for name, dtype in columns:
+			open(path + "." + name, "w").close()
+
+	# path of the file of a column
+	def column_path(self, index):
+		return self.path + "." + self.headers[index]
+
+	# every file of the table
+	def files(self):
+		return [self.path] + [self.column_path(i) for i in range(len(self.headers))]
+
+	# open a file of the table as the snapshot of the table sees it, as it is without one
+	def open(self, path):
+		if self.snapshot is None:
+			return open(path, "r")
+
+		return self.snapshot.open(path, "r")
+
+	# the values of a column
+	def read_column(self, index):
+		with self.open(self.column_path(index)) as f:
+			values = f.read().split("\n")
+
+		# drop what follows the last line break
+		values.pop()
+		return values
+
+	# write a column into a new file put in place of the old one, a query reading the old one goes on
+	def write_column(self, index, values):
+		path = self.column_path(index)
+		with open(path + staged_suffix, "w") as f:
+			f.write("".join([value + "\n" for value in values]))
+
+		version_store.save_file(path)
+		os.replace(path + staged_suffix, path)
+
+	# stream the rows, only the given columns in that order when asked for. only their files are read
+	def scan(self, columns=None):
+		if columns is None:
+			columns = range(len(self.headers))
+
+		data = dict()
+		for i in columns:
+			if i not in data:
+				data[i] = self.read_column(i)
+
+		for rvalues in zip(*[data[i] for i in columns]):
+			yield list(rvalues)
+
+	# stream (locator, row) pairs
+	def scan_locators(self, columns=None):
+		return enumerate(self.scan(columns))
+
+	# stream the rows at the given locators, only the files of the given columns are read
+	def fetch(self, locators, columns=None):
+		if columns is None:
+			columns = range(len(self.headers))
+
+		data = dict()
+		for i in columns:
+			if i not in data:
+				data[i] = self.read_column(i)
+
+		for locator in locators:
+			yield [data[i][locator] for i in columns]
+
+	# stream the given columns of the rows that pass the filter. the filter is given the whole column it
+	# checks and the other columns are only read to pick out the rows that passed
+	def select(self, columns, param_index, key_filter):
+		if bloom_rejects(key_filter, 0):
+			return
+
+		data = {param_index : self.read_column(param_index)}
+		positions = key_filter(data[param_index])
+
+		for i in columns:
+			if i not in data:
+				data[i] = self.read_column(i)
+
+		for position in positions:
+			yield [data[i][position] for i in columns]
+
+	# bytes of table data
+	def size(self):
+		return sum([os.path.getsize(path) for path in self.files()])
+
+	# append the values of the rows to each column file and return their locators
+	def insert(self, rows):
+		with open(self.column_path(0), "r") as f:
+			start = f.read().count("\n")
+
+		for i in range(len(self.headers)):
+			version_store.save_size(self.column_path(i))
+			with open(self.column_path(i), "a") as f:
+				f.write("".join([values[i] + "\n" for values in rows]))
+
+		return range(start, start + len(rows))
+
+	# append (rows, count) chunks and return the row count
+	def load(self, chunks):
+		num_rows = 0
+
+		for rows, count in chunks:
+			self.insert(rows)
+			num_rows += count
+
+		return num_rows
+
+	# set the assigned values of the rows that pass the filter, the filter is given the whole column it
+	# checks and only the assigned columns are rewritten. the column is read either way so locators from an
+	# index are not used, and no changes are returned so the indexes are rebuilt, even when no row passed
+	def update(self, key_filter, assignments, param_index, locators=None):
+		if bloom_rejects(key_filter, 0):
+			return 0, None
+
+		positions = key_filter(self.read_column(param_index))
+
+		if positions:
+			for set_index, set_val in assignments:
+				values = self.read_column(set_index)
+				for position in positions:
+					values[position] = set_val
+
+				self.write_column(set_index, values)
+
+		return len(positions), None
+
+	# remove the rows that pass the filter from every column, the rows after them move up so no changes are
+	# returned for the indexes
+	def delete(self, key_filter, param_index, locators=None):
+		if bloom_rejects(key_filter, 0):
+			return 0, None
+
+		positions = set(key_filter(self.read_column(param_index)))
+
+		if positions:
+			for i in range(len(self.headers)):
+				values = self.read_column(i)
+				self.write_column(i, [value for position, value in enumerate(values) if position not in positions])
+
+		return len(positions), None
+
+	# (locator, row) pairs of the rows that pass the filter, the filter is given the whole column and the
+	# other columns are only read for the rows that passed
+	def matches(self, param_index, key_filter, locators=None):
+		positions = key_filter(self.read_column(param_index))
+		return list(zip(positions, self.fetch(positions)))
+
+	# columnar tables take any value check_rows lets through
+	def check_assignments(self, assignments):
+		pass
+
+	# write the columns a transaction changed into new files beside them, given sorted (locator, old row,
+	# new row) changes. returns no changes for the indexes, they are rebuilt, and the (position, row)
+	# records that redo the changes
+	def stage(self, rows):
+		records = [(locator, rvalues) for locator, old_values, rvalues in rows]
+		self.staged = [i for i in range(len(self.headers))
+					   if any(old_values[i] != rvalues[i] for locator, old_values, rvalues in rows)]
+		self.write_staged(records, self.staged)
+		return None, records
+
+	# write the given columns with the rows of (position, row) records set, rows past the end are gone
+	def write_staged(self, records, columns):
+		for i in columns:
+			values = self.read_column(i)
+			for position, rvalues in records:
+				if position < len(values):
+					values[position] = rvalues[i]
+
+			with open(self.column_path(i) + staged_suffix, "w") as f:
+				f.write("".join([value + "\n" for value in values]))
+
+	# put the staged column files in place
+	def install(self):
+		for i in self.staged:
+			version_store.save_file(self.column_path(i))
+			os.replace(self.column_path(i) + staged_suffix, self.column_path(i))
+
+	# throw the staged column files away
+	def discard(self):
+		for i in self.staged:
+			if os.path.isfile(self.column_path(i) + staged_suffix):
+				os.remove(self.column_path(i) + staged_suffix)
+
+	# set the rows of logged (position, row) records again
+	def redo(self, records):
+		self.staged = range(len(self.headers))
+		self.write_staged(records, self.staged)
+		self.install()
+
+	# column files are written as they change
+	def flush(self):
+		pass
+
+	# remember the size of each column file so a failed load can be cut back
+	def savepoint(self):
+		return [os.path.getsize(self.column_path(i)) for i in range(len(self.headers))]
+
+	def restore(self, sizes):
+		for i, size in enumerate(sizes):
+			with open(self.column_path(i), "r+") as f:
+				f.truncate(size)
+
+	# remove the table
+	def drop(self):
+		for path in self.files():
+			os.remove(path)
+
+
+# Write-Ahead Log Class
+# the log of the transactions committed in a database, kept in the file #wal in its directory. a commit
+# appends one entry holding the rows it changed in each table and syncs the log once before any table
+# file changes, then appends a mark once the tables are written. an entry cut short by a crash fails its
+# crc and ends the log. a checkpoint syncs the tables the log names and empties it, and the first
+# connection of a process to use a database redoes the entries that were never marked
+class WriteAheadLog:
+	def __init__(self, directory):
+		self.directory = directory
+		self.path = os.path.join(directory, wal_name)
+
+	# append entries with one write, synced to disk when asked. the sync is shared with the other commits
+	# to the log that come in at the same time, from this process or any other
+	def append(self, entries, sync=False):
+		if fcntl is None:
+			fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+			try:
+				os.write(fd, self.encode(entries))
+				if sync:
+					os.fsync(fd)
+					wal_stats["commits"] += 1
+					wal_stats["syncs"] += 1
+
+			finally:
+				os.close(fd)
+
+			return
+
+		# write the entries and join the commits waiting on a sync
+		lock = self.lock()
+		try:
+			fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+			try:
+				os.write(fd, self.encode(entries))
+				end = os.lseek(fd, 0, os.SEEK_CUR)
+
+			finally:
+				os.close(fd)
+
+			if not sync:
+				return
+
+			synced, waiting = self.sync_state(lock)
+			os.pwrite(lock, wal_sync.pack(synced, waiting + 1), 0)
+
+		finally:
+			os.close(lock)
+
+		wal_stats["commits"] += 1
+		if waiting and group_commit_window:
+			time.sleep(group_commit_window)
+
+		# sync the log unless a commit that came in with this one already did
+		lock = self.lock()
+		try:
+			synced, waiting = self.sync_state(lock)
+			if synced < end:
+				fd = os.open(self.path, os.O_RDONLY)
+				try:
+					synced = os.fstat(fd).st_size
+					os.fsync(fd)
+
+				finally:
+					os.close(fd)
+
+				wal_stats["syncs"] += 1
+
+			os.pwrite(lock, wal_sync.pack(synced, max(waiting - 1, 0)), 0)
+
+		finally:
+			os.close(lock)
+
+	# the bytes of entries in the log
+	def encode(self, entries):
+		parts = list()
+		for entry in entries:
+			data = json.dumps(entry, separators=(",", ":")).encode()
+			parts.append(wal_header.pack(len(data), zlib.crc32(data)))
+			parts.append(data)
+
+		return b"".join(parts)
+
+	# open the sync file locked against every other writer of the log, closing it lets go
+	def lock(self):
+		lock = os.open(self.path + wal_sync_suffix, os.O_RDWR | os.O_CREAT, 0o644)
+		if fcntl is not None:
+			fcntl.flock(lock, fcntl.LOCK_EX)
+
+		return lock
+
+	# the offset the log is synced up to and the count of commits waiting on a sync
+	def sync_state(self, lock):
+		data = os.pread(lock, wal_sync.size, 0)
+		return wal_sync.unpack(data) if len(data) == wal_sync.size else (0, 0)
+
+	# the entries of the log in order, up to the first one cut short
+	def entries(self):
+		if not os.path.isfile(self.path):
+			return []
+
+		with open(self.path, "rb") as f:
+			data = f.read()
+
+		entries = list()
+		position = 0
+
+		while position + wal_header.size <= len(data):
+			length, crc = wal_header.unpack_from(data, position)
+			start = position + wal_header.size
+			payload = data[start:start + length]
+			if len(payload) < length or zlib.crc32(payload) != crc:
+				break
+
+			entries.append(json.loads(payload))
+			position = start + length
+
+		return entries
+
+	# bytes of the log
+	def size(self):
+		return os.path.getsize(self.path) if os.path.isfile(self.path) else 0
+
+	# sync every table the log names along with its indexes, then empty the log. a log with a commit that is
+	# not yet written to its tables is left for a later checkpoint. a caller already holding the sync file
+	# locked passes it
+	def checkpoint(self, held=None):
+		lock = self.lock() if held is None else held
+		try:
+			entries = self.entries()
+			written = set([entry["applied"] for entry in entries if "applied" in entry])
+			if any("tables" in entry and entry["txn"] not in written for entry in entries):
+				return
+
+			names = set([name for entry in entries for name in entry.get("tables", ())])
+			for name in sorted(names):
+				path = os.path.join(self.directory, name)
+				if not os.path.isfile(path):
+					continue
+
+				table = open_table(path)
+				table.flush()
+				for file_path in table.files() + [index.path for index in open_indexes(path)]:
+					sync_file(file_path)
+
+			with open(self.path, "wb") as f:
+				os.fsync(f.fileno())
+
+			os.pwrite(lock, wal_sync.pack(0, 0), 0)
+
+		finally:
+			if held is None:
+				os.close(lock)
+
+	# the entries never marked written whose process is gone. the entry of a commit still running is left
+	# to it, its process writes the tables and marks it
+	def unfinished(self):
+		entries = self.entries()
+		written = set([entry["applied"] for entry in entries if "applied" in entry])
+		return [entry for entry in entries if "tables" in entry and entry["txn"] not in written and
+				not version_store.process_alive(int(entry["txn"].split(".")[0]))]
+
+	# redo the unfinished entries and rebuild the indexes of their tables, then mark them written and
+	# checkpoint so they are not redone again. recovery holds the commit slots of the tables, taken in the
+	# order a commit takes them, and then the sync file, so no commit writes them or the log meanwhile. an
+	# entry naming a table whose slot was not taken is left for a later recovery. a table dropped since is
+	# passed over
+	def recover(self):
+		names = sorted(set([name for entry in self.unfinished() for name in entry["tables"]]))
+		if not names:
+			return
+
+		committing = list()
+		try:
+			for name in names:
+				lock_manager.begin_commit(os.path.join(self.directory, name))
+				committing.append(os.path.join(self.directory, name))
+
+			lock = self.lock()
+			try:
+				redone = list()
+				for entry in self.unfinished():
+					if not set(entry["tables"]).issubset(names):
+						continue
+
+					for name, records in entry["tables"].items():
+						path = os.path.join(self.directory, name)
+						if os.path.isfile(path):
+							table = open_table(path)
+							table.redo(records)
+							update_indexes(table, open_indexes(path))
+
+					redone.append({"applied" : entry["txn"]})
+
+				if redone:
+					fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+					try:
+						os.write(fd, self.encode(redone))
+
+					finally:
+						os.close(fd)
+
+					self.checkpoint(lock)
+
+			finally:
+				os.close(lock)
+
+		finally:
+			for path in committing:
+				lock_manager.end_commit(path)
+
+
+# Sync File Function (Helper of Write-Ahead Log)
+# forces the written data of a file to disk
+def sync_file(path):
+	fd = os.open(path, os.O_RDONLY)
+	try:
+		os.fsync(fd)
+
+	finally:
+		os.close(fd)
+
+
+# Lock Manager Class
+# the locks transactions hold on tables and rows and the commit slots of tables, kept apart between the
+# connections of this process here and between processes with fcntl locks on the #locks file of each
+# database. a process holds an fcntl lock for every connection of it holding the lock, so the file stays
+# open for as long as the process runs. without fcntl only the connections of this process are kept apart.
+# a lock another transaction holds is waited for, up to lock_timeout seconds or until the waits-for graph
+# shows a deadlock
+class LockManager:
+	def __init__(self):
+		# guards the tables below, waiters are told when locks are let go through it
+		self.mutex = threading.Condition()
+		self.files = dict()
+		self.holders = dict()
+		self.owned = dict()
+		self.latches = dict()
+		self.slots = dict()
+		self.commits = dict()
+
+		# what each waiting connection waits for and the thread each connection last locked from
+		self.waiting = dict()
+		self.threads = dict()
+
+		self.waits = 0
+		self.wait_time = 0.0
+		self.longest_wait = 0.0
+		self.timeouts = 0
+		self.deadlocks = 0
+
+	# the path and open file of the #locks file of the database holding a table. a file removed along with
+	# its database is opened again
+	def file(self, tbl_path):
+		path = os.path.join(os.path.dirname(tbl_path), lock_name)
+		fd = self.files.get(path)
+
+		if fd is not None and os.fstat(fd).st_nlink == 0:
+			os.close(fd)
+			fd = None
+
+		if fd is None:
+			fd = self.files[path] = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+		return path, fd
+
+	# the byte locked for a key of a table, the table itself is the key None
+	def offset(self, tbl_path, key):
+		data = (os.path.basename(tbl_path) + "/" + str(key)).encode()
+		return lock_key_base + (zlib.crc32(data) << 30 | zlib.adler32(data) & 0x3FFFFFFF)
+
+	# lock keys of a table for the transaction of a connection, shared or exclusive, waiting for the ones
+	# another transaction holds. a timeout or a deadlock with this transaction as its victim aborts it and
+	# raises. returns whether it waited, the rows may have changed in the meantime
+	def acquire(self, conn, tbl_path, keys, exclusive):
+		waited = False
+		for key in keys:
+			blockers = self.try_acquire(conn, tbl_path, key, exclusive)
+			if blockers is not None:
+				self.wait(conn, tbl_path, key, exclusive, blockers)
+				waited = True
+
+		return waited
+
+	# lock one key if no other transaction holds it in a way that conflicts, returns None when locked and
+	# otherwise what holds it, the connections of this process or the id of another process, 0 when the
+	# other process is not known
+	def try_acquire(self, conn, tbl_path, key, exclusive):
+		with self.mutex:
+			path, fd = self.file(tbl_path)
+			lock = (path, self.offset(tbl_path, key))
+			self.threads[conn] = threading.get_ident()
+
+			holders = self.holders.get(lock, {})
+			if holders.get(conn) in (True, exclusive):
+				return None
+
+			# other connections of this process keep it, only exclusive locks conflict
+			others = [holder for holder, mode in holders.items() if holder is not conn]
+			if others and (exclusive or any([holders[holder] for holder in others])):
+				return others
+
+			# the process takes the fcntl lock when it first locks the key or makes it exclusive
+			if not others and fcntl is not None:
+				try:
+					fcntl.lockf(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB, 1, lock[1])
+
+				except OSError:
+					return [self.holder_process(fd, lock[1], exclusive)]
+
+			self.holders.setdefault(lock, dict())[conn] = exclusive
+			self.owned.setdefault(conn, set()).add(lock)
+			return None
+
+	# the id of a process holding a byte of a #locks file in a way that conflicts, 0 when not known
+	def holder_process(self, fd, offset, exclusive):
+		if not sys.platform.startswith("linux"):
+			return 0
+
+		query = flock_layout.pack(fcntl.F_WRLCK if exclusive else fcntl.F_RDLCK, os.SEEK_SET, offset, 1, 0)
+		lock_type, whence, start, length, pid = flock_layout.unpack(fcntl.fcntl(fd, fcntl.F_GETLK, query))
+		return pid if lock_type != fcntl.F_UNLCK else 0
+
+	# wait for a key blocked by other transactions until it is locked, the timeout passes or this
+	# transaction is a deadlock's victim. an aborted transaction lets go of its locks at once
+	def wait(self, conn, tbl_path, key, exclusive, blockers):
+		tbl_name = os.path.basename(tbl_path)
+		start = time.perf_counter()
+		delay = lock_poll_interval
+		self.waits += 1
+
+		try:
+			while blockers is not None:
+				# another waiter chose this transaction as the victim of a deadlock
+				if conn.abort_flag:
+					raise OperationalError("Transaction abort because of a deadlock on table " + tbl_name + ".")
+
+				with self.mutex:
+					self.waiting[conn] = blockers
+					victim = self.find_deadlock(conn, tbl_path)
+
+					if victim is not None:
+						self.deadlocks += 1
+						victim.abort_flag = True
+
+						if victim is conn:
+							self.release(conn)
+							raise OperationalError("Transaction abort because of a deadlock on table " + tbl_name + ".")
+
+						# the victim's locks go now, its next statement finds it aborted
+						self.release(victim)
+
+					elif time.perf_counter() - start >= lock_timeout:
+						self.timeouts += 1
+						conn.abort_flag = True
+						self.release(conn)
+						raise OperationalError("Error: Table " + tbl_name + " is locked!")
+
+					else:
+						self.mutex.wait(delay)
+						delay = min(delay * 2, lock_poll_max)
+
+				blockers = self.try_acquire(conn, tbl_path, key, exclusive)
+
+		finally:
+			with self.mutex:
+				self.waiting.pop(conn, None)
+				self.publish_wait(conn, tbl_path, None)
+
+			waited = time.perf_counter() - start
+			self.wait_time += waited
+			self.longest_wait = max(self.longest_wait, waited)
+
+	# the victim of a deadlock the waiting transaction of a connection is part of, the youngest transaction
+	# in it, None when there is none or the victim is in another process, which finds it itself. a
+	# connection holding a lock is waiting on the thread it locked from when that thread is the one waiting
+	def find_deadlock(self, conn, tbl_path):
+		current = threading.get_ident()
+		processes = [blocker for blocker in self.waiting[conn] if not isinstance(blocker, Connection)]
+		self.publish_wait(conn, tbl_path, processes[0] if processes else 0)
+
+		# look for a path of connections of this process waiting for each other back to this one
+		path = [conn]
+		edges = [self.waits_for(conn, current)]
+		seen = set([conn])
+		while path:
+			blocker = next(edges[-1], None)
+			if blocker is None:
+				path.pop()
+				edges.pop()
+
+			elif blocker is conn:
+				return max(path, key=lambda member: member.transaction_start)
+
+			elif blocker not in seen:
+				seen.add(blocker)
+				path.append(blocker)
+				edges.append(self.waits_for(blocker, current))
+
+		# follow the processes waiting for each other back to this one
+		if processes:
+			return self.find_process_deadlock(conn, tbl_path, processes[0])
+
+		return None
+
+	# the connections of this process a connection waits for. one that is not waiting but last locked from
+	# the current thread waits for the connection waiting on that thread
+	def waits_for(self, conn, current):
+		blockers = self.waiting.get(conn)
+		if blockers is None:
+			blockers = [waiter for waiter in self.waiting if self.threads.get(conn) == current == self.threads.get(waiter)]
+
+		return iter([blocker for blocker in blockers if isinstance(blocker, Connection)])
+
+	# the victim of a deadlock between processes through the wait records of a database, this connection
+	# when its transaction is the youngest in it
+	def find_process_deadlock(self, conn, tbl_path, pid):
+		path, fd = self.file(tbl_path)
+		data = os.pread(fd, lock_wait.size * lock_wait_slots, lock_slot.size * lock_slots)
+		records = dict()
+		for process, waits_for, started in lock_wait.iter_unpack(data.ljust(lock_wait.size * lock_wait_slots, b"\0")):
+			if process:
+				records[process] = (waits_for, started)
+
+		youngest = conn.transaction_start
+		seen = set()
+		while pid and pid not in seen:
+			if pid == os.getpid():
+				return conn if youngest == conn.transaction_start else None
+
+			seen.add(pid)
+			pid, started = records.get(pid, (0, 0))
+			youngest = max(youngest, started)
+
+		return None
+
+	# write or clear the wait record of this process in the #locks file of a database
+	def publish_wait(self, conn, tbl_path, pid):
+		if fcntl is None:
+			return
+
+		path, fd = self.file(tbl_path)
+		offset = lock_slot.size * lock_slots + lock_wait.size * (os.getpid() % lock_wait_slots)
+		if pid is None:
+			os.pwrite(fd, lock_wait.pack(0, 0, 0), offset)
+
+		else:
+			os.pwrite(fd, lock_wait.pack(os.getpid(), pid, conn.transaction_start), offset)
+
+	# the mode a connection holds a key of a table in, None when it does not hold it
+	def held(self, conn, tbl_path, key):
+		with self.mutex:
+			path, fd = self.file(tbl_path)
+			return self.holders.get((path, self.offset(tbl_path, key)), {}).get(conn)
+
+	# let go of every lock of a connection and tell the waiters
+	def release(self, conn):
+		with self.mutex:
+			self.threads.pop(conn, None)
+			for lock in self.owned.pop(conn, ()):
+				holders = self.holders[lock]
+				del holders[conn]
+
+				if not holders:
+					del self.holders[lock]
+					if fcntl is not None:
+						fcntl.lockf(self.files[lock[0]], fcntl.LOCK_UN, 1, lock[1])
+
+			self.mutex.notify_all()
+
+	# wait, timeout and deadlock counters
+	def stats(self):
+		return {"waits" : self.waits,
+				"wait_time" : self.wait_time,
+				"longest_wait" : self.longest_wait,
+				"timeouts" : self.timeouts,
+				"deadlocks" : self.deadlocks}
+
+	# the #locks file of the database holding a table, the offset of the table's commit slot in it and the
+	# latch keeping the commits of this process to the table apart. tables whose names share a slot share
+	# its latch, which a thread may take again for each of them
+	def commit_slot(self, tbl_path):
+		with self.mutex:
+			path, fd = self.file(tbl_path)
+			slot = lock_slot.size * (zlib.crc32(os.path.basename(tbl_path).encode()) % lock_slots)
+			return fd, slot, self.latches.setdefault((path, slot), threading.RLock())
+
+	# wait for the commit slot of a table, so one commit at a time writes it and its indexes. its count is
+	# odd while the commit writes. the pages of the table and its indexes held in the pool are dropped when
+	# another process committed to it since. a commit already holding the slot for another table takes it
+	# once, slots keeps the count it found and the tables it holds the slot for
+	def begin_commit(self, tbl_path):
+		fd, slot, latch = self.commit_slot(tbl_path)
+		latch.acquire()
+		if fcntl is None:
+			return
+
+		held = self.slots.get(latch)
+		if held is None:
+			fcntl.lockf(fd, fcntl.LOCK_EX, lock_slot.size, slot)
+			count = self.slot_count(fd, slot)
+			held = self.slots[latch] = {"count" : count, "tables" : list(), "ended" : list()}
+			os.pwrite(fd, lock_slot.pack(count + 1 if count % 2 == 0 else count + 2), slot)
+
+		held["tables"].append(tbl_path)
+		self.drop_changed(tbl_path, held["count"])
+
+	# count the commit done and let another commit to the table in once the slot is done with for every
+	# table of the commit holding it
+	def end_commit(self, tbl_path):
+		fd, slot, latch = self.commit_slot(tbl_path)
+
+		if fcntl is not None:
+			held = self.slots[latch]
+			held["tables"].remove(tbl_path)
+			held["ended"].append(tbl_path)
+
+			if not held["tables"]:
+				del self.slots[latch]
+				count = self.slot_count(fd, slot) + 1
+				os.pwrite(fd, lock_slot.pack(count), slot)
+				for path in held["ended"]:
+					self.commits[path] = count
+
+				fcntl.lockf(fd, fcntl.LOCK_UN, lock_slot.size, slot)
+
+		latch.release()
+
+	# drop the pages of a table and its indexes held in the pool when another process committed to it since
+	# they were read, before a snapshot reads it. a commit of this process writing the table keeps them
+	def refresh_pool(self, tbl_path):
+		fd, slot, latch = self.commit_slot(tbl_path)
+		if fcntl is not None and latch not in self.slots:
+			self.drop_changed(tbl_path, self.slot_count(fd, slot))
+
+	# the count of a commit slot
+	def slot_count(self, fd, slot):
+		data = os.pread(fd, lock_slot.size, slot)
+		return lock_slot.unpack(data)[0] if len(data) == lock_slot.size else 0
+
+	# drop the pages of a table and its indexes when the count of its commit slot is not the one this process
+	# last saw. a count a commit is still writing under is not kept, pages read while it writes are dropped
+	# again
+	def drop_changed(self, tbl_path, count):
+		if self.commits.get(tbl_path) != count:
+			for name in [name for name in buffer_pool.sizes if name == tbl_path or
+						 name.startswith((tbl_path + "#", tbl_path + "@"))]:
+				buffer_pool.invalidate(name)
+
+			self.commits[tbl_path] = count if count % 2 == 0 else None
+
+
+# Version Log Class (Helper of Version Store)
+# the version log of a commit of this thread to a database, the open file of #versions/<number>, the pages,
+# sizes and files it has kept and how many statements it is open for
+class VersionLog:
+	def __init__(self, directory, number, fd):
+		self.directory = directory
+		self.number = number
+		self.fd = fd
+		self.depth = 1
+		self.pages = set()
+		self.sizes = set()
+		self.replaced = set()
+		self.links = 0
+
+	# path of the log, or of the log once it has ended
+	def path(self, suffix=""):
+		return os.path.join(self.directory, versions_name, str(self.number) + suffix)
+
+	# append an entry about a file of the database
+	def write(self, kind, path, value, data=b""):
+		name = os.path.basename(path).encode()
+		os.write(self.fd, version_entry.pack(kind, len(name), value) + name + data)
+
+
+# Version Store Class
+# the row versions of the databases this process uses. a commit writing a database takes the next number
+# of the clock in #locks and writes what it writes over to #versions/<number>, renamed <number>.end once
+# all it wrote is in the files. a snapshot takes the clock and the commits still running under a latch on
+# the clock, so no commit starts in between, and registers the oldest of them in a reader slot of its
+# process. the vacuum thread removes the logs and links of ended commits older than every registered
+# snapshot. a commit whose process is gone counts as ended
+class VersionStore:
+	def __init__(self):
+		# guards the clock between the threads of this process, the fcntl lock on it between processes
+		self.mutex = threading.Lock()
+		self.local = threading.local()
+
+		# the commits running in this process and the snapshots open, by database
+		self.writing = dict()
+		self.readers = dict()
+		self.slots = dict()
+
+		# the databases the vacuum thread looks after, it holds vacuum_lock while it works on one
+		self.directories = set()
+		self.vacuum_thread = None
+		self.vacuum_lock = threading.Lock()
+		self.commits = 0
+		self.snapshots = 0
+		self.vacuumed = 0
+
+	# the offset of the clock in #locks, or of a reader slot
+	def offset(self, slot=None):
+		base = lock_slot.size * lock_slots + lock_wait.size * lock_wait_slots
+		if slot is None:
+			return base
+
+		return base + version_clock.size + version_reader.size * slot
+
+	# take the clock latch of a database and return its #locks file
+	def lock(self, directory):
+		with lock_manager.mutex:
+			path, fd = lock_manager.file(os.path.join(directory, versions_name))
+
+		self.mutex.acquire()
+		if fcntl is not None:
+			try:
+				fcntl.lockf(fd, fcntl.LOCK_EX, version_clock.size, self.offset())
+
+			except OSError:
+				self.mutex.release()
+				raise
+
+		return fd
+
+	def unlock(self, fd):
+		if fcntl is not None:
+			fcntl.lockf(fd, fcntl.LOCK_UN, version_clock.size, self.offset())
+
+		self.mutex.release()
+
+	# the number of the last commit to start
+	def clock(self, fd):
+		data = os.pread(fd, version_clock.size, self.offset())
+		return version_clock.unpack(data)[0] if len(data) == version_clock.size else 0
+
+	# the version log of the commit of this thread to the database holding a file, None outside of one
+	def current(self, path):
+		logs = getattr(self.local, "logs", None)
+		return logs.get(os.path.dirname(path)) if logs else None
+
+	# start a commit of this thread to a database, or go on with the one it is in. the log is made before
+	# the clock moves on, so a snapshot that sees the clock finds the log
+	def begin(self, directory):
+		if not hasattr(self.local, "logs"):
+			self.local.logs = dict()
+
+		log = self.local.logs.get(directory)
+		if log is not None:
+			log.depth += 1
+			return
+
+		versions = os.path.join(directory, versions_name)
+		os.makedirs(versions, exist_ok=True)
+
+		fd = self.lock(directory)
+		try:
+			# without fcntl another process may have taken the number, the next one not taken is used
+			number = self.clock(fd) + 1
+			while True:
+				path = os.path.join(versions, str(number))
+
+				try:
+					if not os.path.exists(path + ".end"):
+						log_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+						break
+
+				except FileExistsError:
+					pass
+
+				number += 1
+
+			os.write(log_fd, version_entry.pack(b"w", 0, os.getpid()))
+			os.pwrite(fd, version_clock.pack(number), self.offset())
+			self.writing[directory] = self.writing.get(directory, 0) + 1
+
+		finally:
+			self.unlock(fd)
+
+		self.local.logs[directory] = VersionLog(directory, number, log_fd)
+		self.commits += 1
+		self.start_vacuum(directory)
+
+	# end the commit of this thread to a database once its last statement is done. every page it changed is
+	# written to its file before the log ends, and the log ends under the clock latch so a snapshot finds
+	# the commits that ended before it all at once
+	def end(self, directory):
+		log = self.local.logs[directory]
+		log.depth -= 1
+		if log.depth:
+			return
+
+		del self.local.logs[directory]
+		try:
+			for path in sorted(set([path for path, number in log.pages])):
+				buffer_pool.flush(path)
+
+			os.write(log.fd, version_entry.pack(b"e", 0, 0))
+			fd = self.lock(directory)
+			try:
+				os.rename(log.path(), log.path(".end"))
+
+			finally:
+				self.unlock(fd)
+
+		finally:
+			os.close(log.fd)
+			with self.mutex:
+				self.writing[directory] -= 1
+
+	# keep a page as it is before the commit of this thread first changes it, or that it is not there yet
+	def save_page(self, path, number):
+		log = self.current(path)
+		if log is None or (path, number) in log.pages:
+			return
+
+		log.pages.add((path, number))
+		self.save_size(path)
+
+		image = os.pread(buffer_pool.file(path).fileno(), page_size, number * page_size)
+		if len(image) == page_size:
+			log.write(b"p", path, number, image)
+
+		else:
+			log.write(b"n", path, number)
+
+	# keep the size of a file before the commit of this thread first changes it
+	def save_size(self, path):
+		log = self.current(path)
+		if log is None or path in log.sizes:
+			return
+
+		log.sizes.add(path)
+		log.write(b"s", path, os.path.getsize(path))
+
+	# keep a file the commit of this thread is about to put another file in place of, linked into #versions
+	def save_file(self, path):
+		log = self.current(path)
+		if log is None or path in log.replaced:
+			return
+
+		self.save_size(path)
+		log.replaced.add(path)
+		log.links += 1
+		os.link(path, log.path("." + str(log.links)))
+		log.write(b"f", path, log.links)
+
+	# register a snapshot of a database, returns the clock, the commits still running and the oldest commit
+	# the snapshot may read the log of
+	def register(self, directory):
+		fd = self.lock(directory)
+		try:
+			number = self.clock(fd)
+			running = self.running(directory, number)
+			horizon = min(running + [number + 1])
+			self.readers.setdefault(directory, list()).append(horizon)
+			self.publish(directory, fd)
+
+		finally:
+			self.unlock(fd)
+
+		self.snapshots += 1
+		self.start_vacuum(directory)
+		return number, running, horizon
+
+	# let the vacuum have the logs a closed snapshot held back
+	def unregister(self, directory, horizon):
+		fd = self.lock(directory)
+		try:
+			self.readers[directory].remove(horizon)
+			self.publish(directory, fd)
+
+		finally:
+			self.unlock(fd)
+
+	# write the oldest commit the open snapshots of this process need to its reader slot, 0 for none. the
+	# process takes a free slot, or one of a process that is gone, the first time
+	def publish(self, directory, fd):
+		slot = self.slots.get(directory)
+
+		if slot is None:
+			size = version_reader.size * version_reader_slots
+			readers = list(version_reader.iter_unpack(os.pread(fd, size, self.offset(0)).ljust(size, b"\0")))
+			start = os.getpid() % version_reader_slots
+			slot = start
+
+			for i in [(start + i) % version_reader_slots for i in range(version_reader_slots)]:
+				pid, horizon = readers[i]
+				if pid in (0, os.getpid()) or not self.process_alive(pid):
+					slot = i
+					break
+
+			self.slots[directory] = slot
+
+		horizons = self.readers.get(directory)
+		os.pwrite(fd, version_reader.pack(os.getpid(), min(horizons) if horizons else 0), self.offset(slot))
+
+	# the numbers up to a clock of the commits still running, their logs have not ended
+	def running(self, directory, number):
+		try:
+			names = os.listdir(os.path.join(directory, versions_name))
+
+		except FileNotFoundError:
+			return []
+
+		return sorted([int(name) for name in names if name.isdigit() and int(name) <= number and
+					   self.writer_alive(directory, int(name))])
+
+	# whether the process of a running commit is still there, a log that ended in the meantime is not
+	def writer_alive(self, directory, number):
+		try:
+			with open(os.path.join(directory, versions_name, str(number)), "rb") as f:
+				kind, length, pid = version_entry.unpack(f.read(version_entry.size))
+
+		except (OSError, struct.error):
+			return False
+
+		return self.process_alive(pid)
+
+	# whether a process is still there
+	def process_alive(self, pid):
+		if pid == os.getpid():
+			return True
+
+		try:
+			os.kill(pid, 0)
+
+		except ProcessLookupError:
+			return False
+
+		except PermissionError:
+			pass
+
+		return True
+
+	# start the vacuum thread of the process the first time it uses a database's versions
+	def start_vacuum(self, directory):
+		with self.mutex:
+			self.directories.add(directory)
+
+			if self.vacuum_thread is None:
+				self.vacuum_thread = threading.Thread(target=self.run_vacuum, name="vacuum", daemon=True)
+				self.vacuum_thread.start()
+
+	# vacuum every database the process has used every vacuum_interval seconds, one that is gone is let go
+	def run_vacuum(self):
+		while True:
+			time.sleep(vacuum_interval)
+
+			for directory in sorted(self.directories):
+				with self.vacuum_lock:
+					if directory not in self.directories:
+						continue
+
+					try:
+						self.vacuum(directory)
+
+					except OSError:
+						with self.mutex:
+							self.directories.discard(directory)
+
+	# stop vacuuming a database that is about to be removed, once a vacuum of it that is running is done
+	def forget(self, directory):
+		with self.vacuum_lock, self.mutex:
+			self.directories.discard(directory)
+
+	# remove the logs and links of the ended commits older than every registered snapshot of a database,
+	# returns how many commits it removed
+	def vacuum(self, directory):
+		versions = os.path.join(directory, versions_name)
+		if not os.path.isdir(versions):
+			return 0
+
+		fd = self.lock(directory)
+		try:
+			horizon = self.clock(fd) + 1
+			size = version_reader.size * version_reader_slots
+			for pid, oldest in version_reader.iter_unpack(os.pread(fd, size, self.offset(0)).ljust(size, b"\0")):
+				if pid and oldest and self.process_alive(pid):
+					horizon = min(horizon, oldest)
+
+			names = os.listdir(versions)
+
+		finally:
+			self.unlock(fd)
+
+		ended = set()
+		for name in names:
+			number, dot, suffix = name.partition(".")
+			if not number.isdigit() or int(number) >= horizon:
+				continue
+
+			if suffix == "end" or not dot and not self.writer_alive(directory, int(number)):
+				ended.add(number)
+
+		for name in names:
+			if name.partition(".")[0] in ended:
+				try:
+					os.remove(os.path.join(versions, name))
+
+				except FileNotFoundError:
+					pass
+
+		self.vacuumed += len(ended)
+		return len(ended)
+
+	# commits started, snapshots taken and commits vacuumed by this process
+	def stats(self):
+		return {"commits" : self.commits,
+				"snapshots" : self.snapshots,
+				"vacuumed" : self.vacuumed}
+
+
+# Snapshot Class
+# the database as a statement reads it: every commit that ended before the statement began and none of
+# the others. what those others wrote over is read from their logs, looked at again after each page or
+# file is read, so a commit that changes a page after it was read is still found. the snapshot holds
+# the vacuum back until it is closed
+class Snapshot:
+	def __init__(self, directory):
+		self.directory = directory
+		self.versions = os.path.join(directory, versions_name)
+		self.closed = True
+		self.number, running, self.horizon = version_store.register(directory)
+		self.closed = False
+
+		# the logs of the commits it does not see that have not ended, as [file, offset, bytes not yet read
+		# as an entry], and the pages and files those commits kept
+		self.logs = dict()
+		self.seen = self.number
+		self.pages = dict()
+		self.files = dict()
+
+		for number in running:
+			self.open_log(number)
+
+	# start reading the log of a commit it does not see, under the name it ends with when it has ended
+	def open_log(self, number):
+		path = os.path.join(self.versions, str(number))
+
+		try:
+			fd = os.open(path, os.O_RDONLY)
+
+		except FileNotFoundError:
+			fd = os.open(path + ".end", os.O_RDONLY)
+
+		self.logs[number] = [fd, 0, b""]
+
+	# read the logs of the commits started since it last looked and what the ones it does not see wrote. the
+	# clock is read through the #locks file the lock manager keeps open, closing any other file on it would
+	# let go of every lock the process holds there
+	def refresh(self):
+		with lock_manager.mutex:
+			path, fd = lock_manager.file(self.versions)
+
+		data = os.pread(fd, version_clock.size, version_store.offset())
+		clock = version_clock.unpack(data)[0] if len(data) == version_clock.size else 0
+
+		while self.seen < clock:
+			self.seen += 1
+			self.open_log(self.seen)
+
+		for number in list(self.logs):
+			self.read_log(number)
+
+	# read the new entries of a log, keeping the first version of each page and the sizes and links of files
+	def read_log(self, number):
+		log = self.logs[number]
+		fd, offset, data = log
+
+		while True:
+			chunk = os.pread(fd, copy_chunk_bytes, offset)
+			if not chunk:
+				break
+
+			offset += len(chunk)
+			data += chunk
+
+		position = 0
+		while len(data) - position >= version_entry.size:
+			kind, length, value = version_entry.unpack_from(data, position)
+			start = position + version_entry.size + length
+			end = start + (page_size if kind == b"p" else 0)
+			if end > len(data):
+				break
+
+			name = data[position + version_entry.size:start].decode()
+			position = end
+
+			if kind in (b"p", b"n"):
+				kept = self.pages.get((name, value))
+				if kept is None or number < kept[0]:
+					self.pages[(name, value)] = (number, data[start:end])
+
+			elif kind in (b"s", b"f"):
+				self.files.setdefault(name, dict()).setdefault(number, list()).append((kind, value))
+
+			# an ended log has nothing more to read
+			elif kind == b"e":
+				os.close(fd)
+				del self.logs[number]
+				return
+
+		log[1] = offset
+		log[2] = data[position:]
+
+	# a copy of a page as the snapshot sees it, an empty page for one that was not there yet
+	def page(self, path, number):
+		if path not in buffer_pool.sizes:
+			buffer_pool.open(path)
+
+		data = b""
+		if number < buffer_pool.sizes[path]:
+			data = bytes(buffer_pool.get(path, number))
+
+			# a commit of this process may be changing the page in the pool, the file only holds what it wrote
+			if version_store.writing.get(self.directory):
+				data = os.pread(buffer_pool.file(path).fileno(), page_size, number * page_size)
+
+		self.refresh()
+		kept = self.pages.get((os.path.basename(path), number))
+		if kept is not None:
+			data = kept[1]
+
+		return data if len(data) == page_size else bytes(page_size)
+
+	# number of pages of a file the snapshot sees
+	def page_count(self, path):
+		self.refresh()
+		size, link = self.file(os.path.basename(path))
+
+		if path not in buffer_pool.sizes:
+			buffer_pool.open(path)
+
+		return buffer_pool.sizes[path] if size is None else size // page_size
+
+	# the size of a file the snapshot sees and the link to it in #versions once a commit it does not see
+	# has put another file in its place, None for either when the file is as it was
+	def file(self, name):
+		size = None
+		link = None
+		versions = self.files.get(name, {})
+
+		for number in sorted(versions):
+			for kind, value in versions[number]:
+				if kind == b"s" and size is None:
+					size = value
+
+				elif kind == b"f" and link is None:
+					link = os.path.join(self.versions, str(number) + "." + str(value))
+
+		return size, link
+
+	# open a file as the snapshot sees it, read up to the size it had. the file is opened before the logs
+	# are looked at, so a commit that puts another in its place later is found
+	def open(self, path, mode="r"):
+		f = open(path, "rb", buffering=0)
+		size = os.fstat(f.fileno()).st_size
+		self.refresh()
+		kept_size, link = self.file(os.path.basename(path))
+
+		if link is not None:
+			f.close()
+			f = open(link, "rb", buffering=0)
+
+		if kept_size is not None:
+			size = kept_size
+
+		f = io.BufferedReader(SnapshotFile(f, size))
+		return f if mode == "rb" else io.TextIOWrapper(f)
+
+	# stream the rows of a plan read in the snapshot, closing it once they run out or are left
+	def rows(self, plan):
+		try:
+			yield from plan
+
+		finally:
+			self.close()
+
+	# let the vacuum have what the snapshot held back
+	def close(self):
+		if self.closed:
+			return
+
+		self.closed = True
+		version_store.unregister(self.directory, self.horizon)
+
+		for fd, offset, data in self.logs.values():
+			os.close(fd)
+
+	# a snapshot left without being read is closed when it is let go
+	def __del__(self):
+		self.close()
+
+
+# Snapshot File Class (Helper of Snapshot)
+# a file read only up to the size a snapshot saw it at, rows appended since are past its end
+class SnapshotFile(io.RawIOBase):
+	def __init__(self, f, size):
+		self.file = f
+		self.size = size
+		self.position = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def readinto(self, buffer):
+		data = os.pread(self.file.fileno(), max(0, min(len(buffer), self.size - self.position)), self.position)
+		buffer[:len(data)] = data
+		self.position += len(data)
+		return len(data)
+
+	def seek(self, offset, whence=os.SEEK_SET):
+		if whence == os.SEEK_CUR:
+			offset += self.position
+
+		elif whence == os.SEEK_END:
+			offset += self.size
+
+		self.position = offset
+		return offset
+
+	def tell(self):
+		return self.position
+
+	# the zones of a text table are looked up by the inode of the file read
+	def fileno(self):
+		return self.file.fileno()
+
+	def close(self):
+		if not self.closed:
+			self.file.close()
+
+		super().close()
+
+
+# Lock Rows Function (Helper of Update, Delete and Insert)
+# locks the rows of a table an open transaction is about to change, or the whole table when it can not lock
+# rows or there are too many of them. returns whether it waited for another transaction. a statement
+# holding the commit slot of the table does not wait, it raises LockWait with the keys others hold
+def lock_rows(conn, table, locators, wait=True):
+	path = table.path
+	if lock_manager.held(conn, path, None):
+		return False
+
+	keys = locators
+	if not table.row_locks or len(locators) > lock_escalation_rows:
+		keys = [None]
+
+	if wait:
+		return lock_manager.acquire(conn, path, keys, True)
+
+	blocked = [key for key in keys if lock_manager.try_acquire(conn, path, key, True) is not None]
+	if blocked:
+		raise LockWait(path, blocked, True)
+
+	return False
+
+
+# Lock Wait Class (Helper of Lock Statement)
+# raised by a statement that found keys of a table it is about to change locked by another transaction.
+# the statement holds the table's commit slot, which that transaction needs to commit, so it lets go of
+# the slot before waiting for the keys and then runs again
+class LockWait(Exception):
+	def __init__(self, path, keys, exclusive):
+		super().__init__(path)
+		self.path = path
+		self.keys = keys
+		self.exclusive = exclusive
+
+
+# Lock Statement Function (Helper of Update, Delete and Insert)
+# locks what a statement writing a table in place is about to change the way a transaction locks it. the
+# statement takes the whole table when no other transaction holds any of it, otherwise a shared lock on the
+# table and an exclusive lock on each row the rows function returns, or the whole table anyway without a
+# rows function. raises LockWait instead of waiting
+def lock_statement(conn, table, rows):
+	path = table.path
+	if lock_manager.held(conn, path, None) or lock_manager.try_acquire(conn, path, None, True) is None:
+		return
+
+	if not table.row_locks or rows is None:
+		raise LockWait(path, [None], True)
+
+	if lock_manager.try_acquire(conn, path, None, False) is not None:
+		raise LockWait(path, [None], False)
+
+	lock_rows(conn, table, rows(), False)
+
+
+# Transaction View Class
+# a table as an open transaction sees it, the rows it changed but has not committed laid over the rows of
+# the table. changes maps the locator of each changed row to [row as read, row as changed], nothing is
+# written to the table until the transaction commits. the connection of the transaction locks the rows
+# before they change
+class TransactionView:
+	def __init__(self, table, changes, conn):
+		self.table = table
+		self.changes = changes
+		self.conn = conn
+		self.headers = table.headers
+		self.dtypes = table.dtypes
+
+	# (locator, row) pairs of the rows that pass the filter. the table finds the rows the transaction left
+	# alone, through the sorted locators an index found when they are given, and the changed rows are
+	# checked here
+	def matches(self, param_index, key_filter, locators=None):
+		changes = self.changes
+		found = [(locator, rvalues) for locator, rvalues in self.table.matches(param_index, key_filter, locators)
+				 if locator not in changes]
+
+		changed = list(changes.items())
+		for i in key_filter([change[1][param_index] for locator, change in changed]):
+			locator, change = changed[i]
+			found.append((locator, change[1]))
+
+		return found
+
+	# stream the given columns of the rows that pass the filter
+	def select(self, columns, param_index, key_filter):
+		for locator, rvalues in self.matches(param_index, key_filter):
+			yield [rvalues[i] for i in columns]
+
+	# change the rows that pass the filter in the transaction only, returns the count and no changes
+	def update(self, key_filter, assignments, param_index, locators=None):
+		self.table.check_assignments(assignments)
+		matched = self.matches(param_index, key_filter, locators)
+
+		# rows locked after waiting are read again, the transaction that held them may have changed them
+		while lock_rows(self.conn, self.table, [locator for locator, rvalues in matched if locator not in self.changes]):
+			self.table = open_table(self.table.path)
+			matched = self.matches(param_index, key_filter, locators)
+
+		for locator, rvalues in matched:
+			new_values = list(rvalues)
+			for set_index, set_val in assignments:
+				new_values[set_index] = set_val
+
+			# the row as read is kept from the first change
+			self.changes[locator] = [self.changes.get(locator, [rvalues])[0], new_values]
+
+		return len(matched), None
+
+
+# Index Node Class (Helper of Index)
+# one node of an index read out of its page. a b+tree leaf or a hash bucket holds (key, locator) entries
+# and the page of the next leaf or overflow page, a b+tree inner node holds the first entry of each child
+# but the first
+class IndexNode:
+	def __init__(self, leaf, keys, locators, children=None, next_leaf=0):
+		self.leaf = leaf
+		self.keys = keys
+		self.locators = locators
+		self.children = children
+		self.next_leaf = next_leaf
+
+
+# Index Class
+# what the index methods share. an index of one column of a table is kept in a file named table@index
+# next to it, its first page holds the magic number of the method, the column with its type and any
+# unique or primary constraint it enforces, then the fields of the method. entries are (key, locator)
+# pairs so equal keys are told apart by where their rows are. empty numbers are not indexed, a where
+# clause can not match them and a unique column may hold any number of them
+class Index:
+	def __init__(self, path, snapshot=None):
+		self.path = path
+		self.snapshot = snapshot
+		self.name = path[path.rindex("@") + 1:]
+
+		# read the column and the fields of the method from the first page
+		buffer_pool.open(path)
+		meta = buffer_pool.get(path, 0, snapshot)
+
+		start = len(self.magic) + length_s.size
+		length, = length_s.unpack_from(meta, len(self.magic))
+		self.column, self.dtype, *constraint = meta[start:start + length].decode().split(" ")
+		self.fields_offset = start + length
+
+		# a primary key is unique and never empty
+		self.constraint = constraint[0] if constraint else None
+		self.unique = self.constraint is not None
+		self.primary = self.constraint == "primary"
+
+		for field, value in zip(self.fields, self.layout.unpack_from(meta, self.fields_offset)):
+			setattr(self, field, value)
+
+		self.cast_func = get_cast(self.dtype) or str
+		self.key_format = {int : "q", float : "d"}.get(self.cast_func)
+
+	# write the first page of a new index, its fields start at zero
+	@classmethod
+	def create(cls, path, column, dtype, constraint=None):
+		text = " ".join([column, dtype] + ([constraint] if constraint else [])).encode()
+		start = len(cls.magic) + length_s.size
+		meta = bytearray(page_size)
+		meta[:len(cls.magic)] = cls.magic
+		length_s.pack_into(meta, len(cls.magic), len(text))
+		meta[start:start + len(text)] = text
+
+		with open(path, "wb") as f:
+			f.write(meta)
+
+	# write the fields of the method to the first page
+	def write_meta(self):
+		self.layout.pack_into(buffer_pool.get(self.path, 0), self.fields_offset,
+							  *[getattr(self, field) for field in self.fields])
+		buffer_pool.mark_dirty(self.path, 0)
+
+	# the key of a stored value, None for an empty number or a value that is not one. fails for a varchar
+	# too long to index or holding the nul that separates varchar keys in a node
+	def key(self, value):
+		if self.cast_func is str:
+			if len(value) > index_key_size // 4 and len(value.encode()) > index_key_size:
+				raise DataError("Value " + repr(value[:20] + "...") + " is too long for index " + self.name + ".")
+
+			if "\0" in value:
+				raise DataError("Value " + repr(value) + " can not be stored in index " + self.name + ".")
+
+			return value
+
+		if not value:
+			return None
+
+		try:
+			return self.cast_func(value)
+
+		except ValueError:
+			return None
+
+	# (key, locator) entries of (locator, row) pairs for the column at index
+	def keyed(self, pairs, index):
+		key = self.key
+		entries = list()
+
+		for locator, rvalues in pairs:
+			value = key(rvalues[index])
+			if value is not None:
+				entries.append((value, locator))
+
+		return entries
+
+	# the bytes a key is hashed from. 0.0 and -0.0 are equal so they hash the same
+	def key_bytes(self, key):
+		if self.key_format == "d":
+			return struct.pack("<d", key + 0.0)
+
+		if self.key_format:
+			return struct.pack("<q", key)
+
+		return key.encode()
+
+	# whether the index has taken in so many entries since it was built that it should be built again
+	def outgrown(self):
+		return False
+
+	# bytes a key takes in a node
+	def key_size(self, key):
+		return 8 if self.key_format else 1 + len(key.encode())
+
+	# read a node from its page
+	def read_node(self, number):
+		data = buffer_pool.get(self.path, number, self.snapshot)
+		leaf, count, next_leaf = node_header.unpack_from(data, 0)
+		position = node_header.size
+
+		# numbers in one unpack, varchars as one run of text after its length split on nul
+		if self.key_format:
+			keys = list(struct.unpack_from("<%d%s" % (count, self.key_format), data, position))
+			position += 8 * count
+
+		else:
+			length, = length_s.unpack_from(data, position)
+			keys = data[position + length_s.size:position + length_s.size + length].decode().split("\0")
+			keys.pop()
+			position += length_s.size + length
+
+		locators = list(struct.unpack_from("<%dQ" % count, data, position))
+		position += 8 * count
+
+		if leaf:
+			return IndexNode(True, keys, locators, None, next_leaf)
+
+		return IndexNode(False, keys, locators, list(struct.unpack_from("<%dI" % (count + 1), data, position)))
+
+	# turn a node into the bytes of its page
+	def encode_node(self, node):
+		count = len(node.keys)
+		parts = [node_header.pack(node.leaf, count, node.next_leaf)]
+
+		if self.key_format:
+			parts.append(struct.pack("<%d%s" % (count, self.key_format), *node.keys))
+
+		else:
+			data = "".join([key + "\0" for key in node.keys]).encode()
+			parts.append(length_s.pack(len(data)))
+			parts.append(data)
+
+		parts.append(struct.pack("<%dQ" % count, *node.locators))
+
+		if not node.leaf:
+			parts.append(struct.pack("<%dI" % (count + 1), *node.children))
+
+		return b"".join(parts)
+
+	# write the bytes of a node into its page
+	def write_node(self, number, data):
+		buffer_pool.get(self.path, number)[:len(data)] = data
+		buffer_pool.mark_dirty(self.path, number)
+
+	# add a page holding an empty leaf and return its number
+	def new_node(self):
+		number, data = buffer_pool.new_page(self.path)
+		self.write_node(number, self.encode_node(IndexNode(True, [], [])))
+		return number
+
+	# split items into runs whose sizes fill a node to seven eighths, there is always at least one run
+	def chunk(self, items, sizes):
+		chunks = [[]]
+		fill = node_header.size
+
+		for item, size in zip(items, sizes):
+			if fill + size > page_size * 7 // 8 and chunks[-1]:
+				chunks.append([])
+				fill = node_header.size
+
+			chunks[-1].append(item)
+			fill += size
+
+		return chunks
+
+	# add (key, locator) entries, many at once are merged with the index and it is built again
+	def add(self, entries):
+		if len(entries) > max(index_bulk_rows, self.count // 8):
+			self.build(list(self.entries()) + entries)
+
+		else:
+			for key, locator in entries:
+				self.insert(key, locator)
+
+	# remove (key, locator) entries
+	def remove(self, entries):
+		if len(entries) > max(index_bulk_rows, self.count // 8):
+			removed = set(entries)
+			self.build([entry for entry in self.entries() if entry not in removed])
+
+		else:
+			for key, locator in entries:
+				self.delete(key, locator)
+
+	# build the index from the rows of its table, a unique index is checked before it is changed
+	def rebuild(self, table):
+		pairs = list(table.scan_locators([table.headers.index(self.column)]))
+		entries = self.keyed(pairs, 0)
+
+		if self.unique:
+			self.check(pairs, entries)
+
+		self.build(entries)
+
+	# fail when the rows of a table break the constraint of the index
+	def check(self, pairs, entries):
+		failure = "!Failed to build index " + self.name + " because "
+
+		if self.primary and not all(rvalues[0] for locator, rvalues in pairs):
+			raise IntegrityError(failure + "primary key " + self.column + " is empty.")
+
+		keys = sorted([key for key, locator in entries])
+		for i in range(1, len(keys)):
+			if keys[i] == keys[i - 1]:
+				raise IntegrityError(failure + self.column + " " + repr(str(keys[i])) + " is not unique.")
+
+	# write the changed pages back to the file
+	def flush(self):
+		buffer_pool.flush(self.path)
+
+	# remove the index and drop its pages
+	def drop(self):
+		buffer_pool.invalidate(self.path)
+		os.remove(self.path)
+
+
+# B+Tree Index Class
+# an ordered index, its fields are the root page and the entry count. entries removed from a node leave it
+# smaller, nodes are not merged
+class BTreeIndex(Index):
+	method = "btree"
+	magic = btree_magic
+	fields = ("root", "count")
+	layout = struct.Struct("<IQ")
+
+	# the where clause operators the index can answer
+	operators = ("=", "<", "<=", ">", ">=")
+
+	# the leaf an entry belongs in and the (number, node, child) steps taken to reach it
+	def descend(self, entry):
+		steps = list()
+		number = self.root
+		node = self.read_node(number)
+
+		while not node.leaf:
+			i = bisect_right(list(zip(node.keys, node.locators)), entry)
+			steps.append((number, node, i))
+			number = node.children[i]
+			node = self.read_node(number)
+
+		return number, node, steps
+
+	# add one entry, splitting the nodes that overflow their page from the leaf up
+	def insert(self, key, locator):
+		entry = (key, locator)
+		number, node, steps = self.descend(entry)
+
+		i = bisect_left(list(zip(node.keys, node.locators)), entry)
+		node.keys.insert(i, key)
+		node.locators.insert(i, locator)
+		self.count += 1
+
+		while True:
+			data = self.encode_node(node)
+			if len(data) <= page_size:
+				self.write_node(number, data)
+				break
+
+			# move the second half of the node to a new page
+			right, separator = self.split(node)
+			right_number, page = buffer_pool.new_page(self.path)
+			if node.leaf:
+				right.next_leaf = node.next_leaf
+				node.next_leaf = right_number
+
+			self.write_node(number, self.encode_node(node))
+			self.write_node(right_number, self.encode_node(right))
+
+			# point the parent at the new node, or grow a new root
+			if steps:
+				number, node, i = steps.pop()
+				node.keys.insert(i, separator[0])
+				node.locators.insert(i, separator[1])
+				node.children.insert(i + 1, right_number)
+
+			else:
+				node = IndexNode(False, [separator[0]], [separator[1]], [number, right_number])
+				number, page = buffer_pool.new_page(self.path)
+				self.root = number
+
+		self.write_meta()
+
+	# cut a node where half of its bytes are on each side, returns the new right node and the entry that
+	# separates them in the parent
+	def split(self, node):
+		sizes = [self.key_size(key) for key in node.keys]
+		half = sum(sizes) // 2
+		total = 0
+
+		for mid, size in enumerate(sizes):
+			total += size
+			if total >= half:
+				break
+
+		mid = max(1, min(mid, len(sizes) - 2))
+
+		# a leaf keeps every entry, an inner node moves its middle entry up to the parent
+		if node.leaf:
+			right = IndexNode(True, node.keys[mid:], node.locators[mid:])
+			separator = (node.keys[mid], node.locators[mid])
+
+		else:
+			right = IndexNode(False, node.keys[mid + 1:], node.locators[mid + 1:], node.children[mid + 1:])
+			separator = (node.keys[mid], node.locators[mid])
+			del node.children[mid + 1:]
+
+		del node.keys[mid:]
+		del node.locators[mid:]
+		return right, separator
+
+	# remove one entry if it is there
+	def delete(self, key, locator):
+		entry = (key, locator)
+		number, node, steps = self.descend(entry)
+
+		i = bisect_left(list(zip(node.keys, node.locators)), entry)
+		if i < len(node.keys) and node.keys[i] == key and node.locators[i] == locator:
+			del node.keys[i]
+			del node.locators[i]
+			self.write_node(number, self.encode_node(node))
+			self.count -= 1
+			self.write_meta()
+
+	# stream every entry in order along the leaves
+	def entries(self):
+		node = self.read_node(self.root)
+		while not node.leaf:
+			node = self.read_node(node.children[0])
+
+		while True:
+			yield from zip(node.keys, node.locators)
+			if not node.next_leaf:
+				break
+
+			node = self.read_node(node.next_leaf)
+
+	# write the index again from (key, locator) entries. leaves are filled to seven eighths so the next
+	# inserts do not split them straight away, then each level of inner nodes is built over the one below
+	def build(self, entries):
+		entries.sort()
+		buffer_pool.truncate(self.path, 1)
+
+		# the leaves are written in order, each pointing at the next
+		chunks = self.chunk(entries, [self.key_size(key) + 8 for key, locator in entries])
+		numbers = [buffer_pool.new_page(self.path)[0] for chunk in chunks]
+		level = list()
+
+		for j, chunk in enumerate(chunks):
+			next_leaf = numbers[j + 1] if j + 1 < len(numbers) else 0
+			node = IndexNode(True, [key for key, locator in chunk], [locator for key, locator in chunk], None,
+							 next_leaf)
+			self.write_node(numbers[j], self.encode_node(node))
+			level.append((chunk[0] if chunk else None, numbers[j]))
+
+		# inner nodes over the level below until one node is left
+		while len(level) > 1:
+			chunks = self.chunk(level, [self.key_size(entry[0]) + 12 for entry, number in level])
+			upper = list()
+
+			for chunk in chunks:
+				number, page = buffer_pool.new_page(self.path)
+				node = IndexNode(False, [entry[0] for entry, child in chunk[1:]],
+								 [entry[1] for entry, child in chunk[1:]], [child for entry, child in chunk])
+				self.write_node(number, self.encode_node(node))
+				upper.append((chunk[0][0], number))
+
+			level = upper
+
+		self.root = level[0][1]
+		self.count = len(entries)
+		self.write_meta()
+
+	# stream the locators of the entries that pass a where clause, in key order. key is the literal cast to
+	# the type of the column
+	def search(self, op, key):
+		lower = key if op in ("=", ">", ">=") else None
+		upper = key if op in ("=", "<", "<=") else None
+		find = bisect_right if op == ">" else bisect_left
+
+		# walk down to the leaf of the first entry that can pass
+		node = self.read_node(self.root)
+		while not node.leaf:
+			node = self.read_node(node.children[0 if lower is None else find(node.keys, lower)])
+
+		i = 0 if lower is None else find(node.keys, lower)
+		below = operator.lt if op == "<" else operator.le
+
+		# then along the leaves until a key is past the upper bound
+		while True:
+			keys = node.keys
+			for j in range(i, len(keys)):
+				if upper is not None and not below(keys[j], upper):
+					return
+
+				yield node.locators[j]
+
+			if not node.next_leaf:
+				return
+
+			node = self.read_node(node.next_leaf)
+			i = 0
+
+
+# Hash Index Class
+# an index answering equality by linear hashing, its fields are the bucket count and the entry count. a key
+# goes to the bucket given by the low bits of its crc32, one bit more for the buckets already split in this
+# round. each bucket is a chain of pages, and once there are hash_bucket_rows entries per bucket the next
+# bucket in turn is split in two. the page of each bucket is kept in directory pages whose numbers follow
+# the fields in the first page
+class HashIndex(Index):
+	method = "hash"
+	magic = hash_magic
+	fields = ("buckets", "count")
+	layout = struct.Struct("<IQ")
+
+	# the where clause operators the index can answer
+	operators = ("=",)
+
+	# bucket page numbers a directory page holds
+	directory_size = page_size // 4
+
+	# the bucket of a key
+	def bucket(self, key):
+		code = zlib.crc32(self.key_bytes(key))
+		low = 1 << (self.buckets.bit_length() - 1)
+		bucket = code & (low - 1)
+
+		if bucket < self.buckets - low:
+			bucket = code & (2 * low - 1)
+
+		return bucket
+
+	# the first page of a bucket
+	def bucket_page(self, bucket):
+		directory, slot = divmod(bucket, self.directory_size)
+		meta = buffer_pool.get(self.path, 0, self.snapshot)
+		number, = struct.unpack_from("<I", meta, self.directory_offset(directory))
+		return struct.unpack_from("<I", buffer_pool.get(self.path, number, self.snapshot), 4 * slot)[0]
+
+	# point a bucket at its first page, the buckets are numbered in order so a new directory page is added
+	# when the first bucket of one is set
+	def set_bucket_page(self, bucket, page):
+		directory, slot = divmod(bucket, self.directory_size)
+		offset = self.directory_offset(directory)
+
+		if slot == 0:
+			if offset + 4 > page_size:
+				raise InternalError("Index " + self.name + " has too many buckets.")
+
+			number, data = buffer_pool.new_page(self.path)
+			data[:] = bytes(page_size)
+			struct.pack_into("<I", buffer_pool.get(self.path, 0), offset, number)
+			buffer_pool.mark_dirty(self.path, 0)
+
+		number, = struct.unpack_from("<I", buffer_pool.get(self.path, 0), offset)
+		struct.pack_into("<I", buffer_pool.get(self.path, number), 4 * slot, page)
+		buffer_pool.mark_dirty(self.path, number)
+
+	# where the page number of a directory page is kept in the first page
+	def directory_offset(self, directory):
+		return self.fields_offset + self.layout.size + 4 * directory
+
+	# stream (number, node) for each page of the chain starting at number
+	def chain(self, number):
+		while number:
+			node = self.read_node(number)
+			yield number, node
+			number = node.next_leaf
+
+	# write entries over the chain starting at number, adding pages as they are needed. pages left over
+	# stay in the chain empty for later inserts
+	def write_chain(self, number, entries):
+		chunks = self.chunk(entries, [self.key_size(key) + 8 for key, locator in entries])
+
+		for j, chunk in enumerate(chunks):
+			next_page = self.read_node(number).next_leaf
+			if j + 1 < len(chunks) and not next_page:
+				next_page = self.new_node()
+
+			node = IndexNode(True, [key for key, locator in chunk], [locator for key, locator in chunk], None,
+							 next_page)
+			self.write_node(number, self.encode_node(node))
+			number = next_page
+
+		for number, node in self.chain(number):
+			if node.keys:
+				self.write_node(number, self.encode_node(IndexNode(True, [], [], None, node.next_leaf)))
+
+	# add one entry to the first page of its bucket with room for it, splitting a bucket once the index is
+	# full enough
+	def insert(self, key, locator):
+		last = None
+
+		for number, node in self.chain(self.bucket_page(self.bucket(key))):
+			node.keys.append(key)
+			node.locators.append(locator)
+			data = self.encode_node(node)
+
+			if len(data) <= page_size:
+				self.write_node(number, data)
+				break
+
+			last = number, node
+
+		# every page is full, chain a new one
+		else:
+			number, node = last
+			node.next_leaf = self.new_node()
+			node.keys.pop()
+			node.locators.pop()
+			self.write_node(number, self.encode_node(node))
+			self.write_node(node.next_leaf, self.encode_node(IndexNode(True, [key], [locator])))
+
+		self.count += 1
+		if self.count > self.buckets * hash_bucket_rows:
+			self.split()
+
+		self.write_meta()
+
+	# split the next bucket in turn between itself and a new bucket at the end
+	def split(self):
+		old = self.buckets - (1 << (self.buckets.bit_length() - 1))
+		number = self.bucket_page(old)
+		entries = [entry for page, node in self.chain(number) for entry in zip(node.keys, node.locators)]
+
+		self.buckets += 1
+		self.set_bucket_page(self.buckets - 1, self.new_node())
+
+		self.write_chain(number, [entry for entry in entries if self.bucket(entry[0]) == old])
+		self.write_chain(self.bucket_page(self.buckets - 1),
+						 [entry for entry in entries if self.bucket(entry[0]) != old])
+
+	# remove one entry if it is there
+	def delete(self, key, locator):
+		for number, node in self.chain(self.bucket_page(self.bucket(key))):
+			for i in range(len(node.keys)):
+				if node.locators[i] == locator and node.keys[i] == key:
+					del node.keys[i]
+					del node.locators[i]
+					self.write_node(number, self.encode_node(node))
+					self.count -= 1
+					self.write_meta()
+					return
+
+	# stream every entry, bucket by bucket
+	def entries(self):
+		for bucket in range(self.buckets):
+			for number, node in self.chain(self.bucket_page(bucket)):
+				yield from zip(node.keys, node.locators)
+
+	# write the index again from (key, locator) entries with enough buckets to hold them
+	def build(self, entries):
+		buffer_pool.truncate(self.path, 1)
+		self.buckets = max(1, -(-len(entries) // hash_bucket_rows))
+
+		groups = [list() for bucket in range(self.buckets)]
+		for entry in entries:
+			groups[self.bucket(entry[0])].append(entry)
+
+		for bucket, group in enumerate(groups):
+			number = self.new_node()
+			self.set_bucket_page(bucket, number)
+			self.write_chain(number, group)
+
+		self.count = len(entries)
+		self.write_meta()
+
+	# stream the locators of the entries equal to key, the literal cast to the type of the column
+	def search(self, op, key):
+		for number, node in self.chain(self.bucket_page(self.bucket(key))):
+			for i, value in enumerate(node.keys):
+				if value == key:
+					yield node.locators[i]
+
+
+# Bloom Index Class
+# a bloom filter of a column, it answers no where clause itself but tells a scan which blocks can not hold
+# a key so they are not read. a paged table has a bloom per block of zone_pages pages, any other table one
+# bloom for the whole table sized by its row count when it is built. the blooms follow the meta page,
+# each block_bytes long. a bloom can not forget a key, rows deleted or changed leave their keys in it until
+# it is built again
+class BloomIndex(Index):
+	method = "bloom"
+	magic = bloom_magic
+	fields = ("paged", "block_bytes", "count")
+	layout = struct.Struct("<BIQ")
+
+	# the where clause operators the index can answer
+	operators = ()
+
+	# the bits of a key in a bloom, found by double hashing
+	def bits(self, key):
+		data = self.key_bytes(key)
+		first = zlib.crc32(data)
+		step = zlib.adler32(data) | 1
+		size = self.block_bytes * 8
+		return [(first + i * step) % size for i in range(bloom_hashes)]
+
+	# the block of a row
+	def block(self, locator):
+		return (locator >> 16) // zone_pages if self.paged else 0
+
+	# the page and position of the byte holding a bit of the bloom of a block, adding zeroed pages up to it
+	def byte(self, block, bit):
+		number, position = divmod(block * self.block_bytes + (bit >> 3), page_size)
+
+		while buffer_pool.page_count(self.path) <= number + 1:
+			new_number, data = buffer_pool.new_page(self.path)
+			data[:] = bytes(page_size)
+
+		return number + 1, position
+
+	# add one entry
+	def insert(self, key, locator):
+		block = self.block(locator)
+
+		for bit in self.bits(key):
+			number, position = self.byte(block, bit)
+			buffer_pool.get(self.path, number)[position] |= 1 << (bit & 7)
+			buffer_pool.mark_dirty(self.path, number)
+
+		self.count += 1
+		self.write_meta()
+
+	# add (key, locator) entries
+	def add(self, entries):
+		for key, locator in entries:
+			self.insert(key, locator)
+
+	# entries removed stay in the bloom
+	def remove(self, entries):
+		pass
+
+	# a table other than a paged one has outgrown its bloom once it holds twice the keys it was sized for
+	def outgrown(self):
+		return not self.paged and self.count > 2 * self.block_bytes * 8 // bloom_bits_per_key
+
+	# build the blooms from the rows of the table, the table tells whether it has blocks
+	def rebuild(self, table):
+		self.paged = table.engine == "paged"
+		Index.rebuild(self, table)
+
+	# write the blooms again from (key, locator) entries, set in memory and written a page at a time
+	def build(self, entries):
+		buffer_pool.truncate(self.path, 1)
+		self.block_bytes = bloom_block_bytes
+
+		if not self.paged:
+			size = (len(entries) * bloom_bits_per_key + 7) // 8
+			self.block_bytes = max(page_size, 1 << (size - 1).bit_length())
+
+		blocks = max([self.block(locator) for key, locator in entries], default=0) + 1
+		data = bytearray(blocks * self.block_bytes + (-blocks * self.block_bytes) % page_size)
+
+		for key, locator in entries:
+			start = self.block(locator) * self.block_bytes * 8
+			for bit in self.bits(key):
+				data[(start + bit) >> 3] |= 1 << (bit & 7)
+
+		for start in range(0, len(data), page_size):
+			number, page = buffer_pool.new_page(self.path)
+			page[:] = data[start:start + page_size]
+
+		self.count = len(entries)
+		self.write_meta()
+
+	# whether the bloom of a block may hold a key, a block past the blooms has never been given one
+	def may_contain(self, block, key):
+		for bit in self.bits(key):
+			number, position = divmod(block * self.block_bytes + (bit >> 3), page_size)
+			if number + 1 >= buffer_pool.page_count(self.path, self.snapshot):
+				return False
+
+			if not buffer_pool.get(self.path, number + 1, self.snapshot)[position] >> (bit & 7) & 1:
+				return False
+
+		return True
+
+
+# Index Path Function
+# path of the file of an index of a table
+def index_path(tbl_path, idx_name):
+	return tbl_path + "@" + idx_name
+
+
+# Open Index Function
+# returns the index in a file by its magic number, read as a snapshot sees it when one is given
+def open_index(path, snapshot=None):
+	with open(path, "rb") as f:
+		magic = f.read(len(btree_magic))
+
+	for method in index_methods.values():
+		if method.magic == magic:
+			return method(path, snapshot)
+
+	raise InternalError("Index " + os.path.basename(path) + " is damaged.")
+
+
+# Open Indexes Function
+# every index of a table
+def open_indexes(tbl_path, snapshot=None):
+	directory, tbl_name = os.path.split(tbl_path)
+	prefix = tbl_name + "@"
+	return [open_index(os.path.join(directory, name), snapshot) for name in sorted(os.listdir(directory))
+			if name.startswith(prefix)]
+
+
+# Find Index Function
+# an index on a column that can answer a where clause operator, None if there is none. the index
+# answering the fewest operators is the one made for it, a hash index before a b+tree for =
+def find_index(indexes, column, op):
+	found = [index for index in indexes if index.column == column and op in index.operators]
+	return min(found, key=lambda index: len(index.operators)) if found else None
+
+
+# dictionary of storage engines by the name given to CREATE TABLE ... ENGINE=
+table_engines = {	"text" : TextTable,
+					"paged" : PagedTable,
+					"columnar" : ColumnarTable	}
+
+# dictionary of index methods by the name given to CREATE INDEX ... USING
+index_methods = {	"btree" : BTreeIndex,
+					"hash" : HashIndex,
+					"bloom" : BloomIndex	}
+
+# the pages of every paged table and index open in this process
+buffer_pool = BufferPool(buffer_pool_size)
+
+# databases whose write-ahead log this process has recovered
+recovered_databases = set()
+
+# the locks of the transactions of this process
+lock_manager = LockManager()
+
+# the row versions of the commits and snapshots of this process
+version_store = VersionStore()
+
+
+# Operators ###########################################################################################################
+# Operator Class
+# base of the query operators, each one streams rows from the operators below it. open starts the rows,
+# next returns the next row or None once they run out and close stops early, releasing any files.
+# iterating an operator runs the whole cycle. columns are the (name, type) pairs of the rows it returns
+class Operator:
+	rows = None
+
+	def open(self):
+		self.rows = self.generate()
+
+	def next(self):
+		return next(self.rows, None)
+
+	def close(self):
+		if self.rows is not None:
+			self.rows.close()
+			self.rows = None
+
+	def __iter__(self):
+		self.open()
+		try:
+			yield from self.rows
+
+		finally:
+			self.close()
+
+	# bytes of table data below the operator, what joins and sorts budget memory against
+	def size(self):
+		return self.child.size()
+
+	# path of the table below the operator, runs spilled to disk are written next to it
+	@property
+	def path(self):
+		return self.child.path
+
+
+# Scan Operator
+# rows of a table, only the given column indices when they are given. a where clause pushed into the scan
+# as (param_index, key_filter) is checked by the storage engine so it reads and decodes what it must
+class Scan(Operator):
+	def __init__(self, table, indices=None, where=None):
+		self.table = table
+		self.indices = indices
+		self.where = where
+
+		columns = list(zip(table.headers, table.dtypes))
+		self.columns = columns if indices is None else [columns[i] for i in indices]
+
+	def generate(self):
+		if self.where is None:
+			return self.table.scan(self.indices)
+
+		indices = list(range(len(self.table.headers))) if self.indices is None else self.indices
+		return self.table.select(indices, *self.where)
+
+	def size(self):
+		return self.table.size()
+
+	@property
+	def path(self):
+		return self.table.path
+
+
+# Index Scan Operator
+# rows of a table that pass a where clause, found through an index on its column instead of reading the
+# whole table. the rows are read in table order so rows in the same page are read together
+class IndexScan(Operator):
+	def __init__(self, table, index, condition, indices=None):
+		self.table = table
+		self.index = index
+		self.op = condition.op
+		self.key = cast_literal(condition, index.cast_func)
+		self.indices = indices
+
+		columns = list(zip(table.headers, table.dtypes))
+		self.columns = columns if indices is None else [columns[i] for i in indices]
+
+	def generate(self):
+		return self.table.fetch(sorted(self.index.search(self.op, self.key)), self.indices)
+
+	def size(self):
+		return self.table.size()
+
+	@property
+	def path(self):
+		return self.table.path
+
+
+# Filter Operator
+# rows of the child that pass a key filter on the column at index, checked a batch at a time
+class Filter(Operator):
+	def __init__(self, child, index, key_filter):
+		self.child = child
+		self.index = index
+		self.key_filter = key_filter
+		self.columns = child.columns
+
+	def generate(self):
+		return select_rows(self.child, self.index, len(self.columns), self.key_filter)
+
+
+# Project Operator
+# the given columns of each row of the child
+class Project(Operator):
+	def __init__(self, child, indices):
+		self.child = child
+		self.indices = indices
+		self.columns = [child.columns[i] for i in indices]
+
+	def generate(self):
+		indices = self.indices
+		for row in self.child:
+			yield [row[i] for i in indices]
+
+
+# Join Operator
+# rows of the left child joined with the rows of the right child on a comparison of one column of each,
+# padded with missing values for unmatched left rows of an outer join
+class Join(Operator):
+	def __init__(self, left, right, index_one, index_two, operator, outer_flag):
+		self.left = left
+		self.right = right
+		self.index_one = index_one
+		self.index_two = index_two
+		self.operator = operator
+		self.outer_flag = outer_flag
+		self.columns = left.columns + right.columns
+
+	def generate(self):
+		return join_rows(self.left, self.right, self.index_one, self.index_two,
+						 self.left.columns[self.index_one][1], self.operator, self.outer_flag,
+						 len(self.right.columns))
+
+	def size(self):
+		return self.left.size() + self.right.size()
+
+	@property
+	def path(self):
+		return self.left.path
+
+
+# Index Join Operator
+# rows of the left child joined on equality with the rows of a table an index on its column finds, padded
+# with missing values for unmatched left rows of an outer join. the left rows are probed a batch at a time
+# and the table rows they found are read together in table order. a left value the column could not hold
+# matches nothing
+class IndexJoin(Operator):
+	def __init__(self, left, table, index, index_one, outer_flag):
+		self.left = left
+		self.table = table
+		self.index = index
+		self.index_one = index_one
+		self.outer_flag = outer_flag
+		self.columns = left.columns + list(zip(table.headers, table.dtypes))
+
+	def generate(self):
+		padding = [None] * len(self.table.headers)
+		rows = iter(self.left)
+
+		while True:
+			batch = list(islice(rows, batch_size))
+			if not batch:
+				return
+
+			# the locators each row finds, then the rows of all of them in one pass over the table
+			found = [sorted(self.index.search("=", key)) if key is not None else [] for key in self.keys(batch)]
+			locators = sorted(set().union(*found))
+			fetched = dict(zip(locators, self.table.fetch(locators)))
+
+			for row, row_locators in zip(batch, found):
+				if row_locators:
+					for locator in row_locators:
+						yield row + fetched[locator]
+
+				elif self.outer_flag:
+					yield row + padding
+
+	# the index key of the join value of each row, None when the index could not hold it
+	def keys(self, batch):
+		key = self.index.key
+		index_one = self.index_one
+
+		for row in batch:
+			try:
+				yield key(row[index_one])
+
+			except DataError:
+				yield None
+
+	def size(self):
+		return self.left.size() + self.table.size()
+
+	@property
+	def path(self):
+		return self.left.path
+
+
+# Sort Operator
+# rows of the child ordered on the column at index, spilling sorted runs to disk past the memory budget
+class Sort(Operator):
+	def __init__(self, child, index, reverse=False):
+		self.child = child
+		self.index = index
+		self.reverse = reverse
+		self.columns = child.columns
+
+	def generate(self):
+		sorted_input = SortedInput(self.child, self.index, self.columns[self.index][1], join_memory_budget,
+								   self.path, self.reverse)
+		try:
+			for position, key, row in sorted_input.scan():
+				yield row
+
+		finally:
+			sorted_input.close()
+
+
+# Function Declarations ###############################################################################################
+# Create Database Function
+def create_database(conn, stmt):
+	db_name = stmt.name
+	db_path = conn.database_path(db_name)
+
+	# check if database already exists
+	if not os.path.exists(db_path):
+		# make the database
+		os.mkdir(db_path)
+
+		# report success
+		return Result("Database " + db_name + " created.")
+
+	else:
+		# report error
+		raise DatabaseError("!Failed to create database " + db_name + " because it already exists.")
+
+
+# Delete Database Function
+def drop_database(conn, stmt):
+	db_name = stmt.name
+	db_path = conn.database_path(db_name)
+
+	# stop using the database if it is the current one
+	if conn.database is not None and conn.database.path == db_path:
+		conn.database = None
+
+	# make sure the database exists
+	if os.path.exists(db_path):
+		# drop the database, the vacuum thread lets it go first so it does not remove files from under rmtree
+		buffer_pool.invalidate(db_path)
+		version_store.forget(db_path)
+		rmtree(db_path)
+
+		# report success
+		return Result("Database " + db_name + " deleted.")
+
+	else:
+		# report error
+		raise DatabaseError("!Failed to delete " + db_name + " because it does not exist.")
+
+
+# Use Database Function
+def use_database(conn, stmt):
+	db_name = stmt.name
+	db_path = conn.database_path(db_name)
+
+	# leave the current database
+	conn.database = None
+
+	# make sure the database exists
+	if os.path.isdir(db_path):
+		# change to the database, the first time this process uses it any commit a crash cut short is redone
+		conn.database = Database(db_path)
+		if db_path not in recovered_databases:
+			WriteAheadLog(db_path).recover()
+			recovered_databases.add(db_path)
+
+		# report success
+		return Result("Using database " + db_name + ".")
+
+	else:
+		# report error
+		raise DatabaseError("!Failed to use database " + db_name + " because it does not exist.")
+
+
+# Create Table Function
+def create_table(conn, stmt):
+	tbl_name = stmt.name
+
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to create table " + tbl_name +
+							" because USE has not been called on a valid database.")
+
+	# check if file exists
+	path = conn.database.table_path(tbl_name)
+	if os.path.isfile(path):
+		# report error
+		raise DatabaseError("!Failed to create table " + tbl_name + " because it already exists.")
+
+	# check the storage engine
+	engine = table_engines.get(stmt.engine or "text")
+	if engine is None:
+		raise DatabaseError("Table " + tbl_name + " not created because engine " + stmt.engine + " is unknown.")
+
+	# check the key constraints, a table has one primary key and the indexes enforcing them are free
+	if sum(constraint == "primary" for column, constraint in stmt.constraints) > 1:
+		raise DatabaseError("Table " + tbl_name + " not created because it has more than one primary key.")
+
+	keys = [CreateIndex(key_name(tbl_name, column, constraint), tbl_name, column, "btree", constraint)
+			for column, constraint in stmt.constraints]
+
+	for key in keys:
+		if conn.database.find_index(key.name) is not None:
+			raise DatabaseError("Table " + tbl_name + " not created because index " + key.name +
+								" already exists.")
+
+	# check for valid data types
+	if all(get_cast(dtype) is not None for name, dtype in stmt.columns):
+		# write the header of the table and an index per key
+		engine.create(path, stmt.columns)
+
+		for key in keys:
+			create_index(conn, key)
+
+		# report success
+		return Result("Table " + tbl_name + " created.")
+
+	else:
+		raise DatabaseError("Table " + tbl_name + " not created because datatypes are invalid.")
+
+
+# Key Name Function (Helper of Create Table)
+# name of the index enforcing a constraint on a column
+def key_name(tbl_name, column, constraint):
+	if constraint == "primary":
+		return tbl_name + "_pkey"
+
+	return tbl_name + "_" + column + "_key"
+
+
+# Delete Table Function
+def drop_table(conn, stmt):
+	tbl_name = stmt.name
+
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to delete table " + tbl_name +
+							" because USE has not been called on a valid database.")
+
+	# make sure the table exists
+	path = conn.database.table_path(tbl_name)
+	if os.path.isfile(path):
+		# drop the table and its indexes
+		for index in open_indexes(path):
+			index.drop()
+
+		open_table(path).drop()
+
+		# report success
+		return Result("Table " + tbl_name + " deleted.")
+
+	else:
+		# report error
+		raise DatabaseError("!Failed to delete table " + tbl_name + " because it does not exist.")
+
+
+# Create Index Function
+# builds an index on a column from the rows already in the table
+def create_index(conn, stmt):
+	idx_name = stmt.name
+
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to create index " + idx_name +
+							" because USE has not been called on a valid database.")
+
+	# make sure the table exists and the index does not
+	path = conn.database.table_path(stmt.table)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to create index " + idx_name + " because table " + stmt.table +
+							" does not exist.")
+
+	if conn.database.find_index(idx_name) is not None:
+		raise DatabaseError("!Failed to create index " + idx_name + " because it already exists.")
+
+	# check the index method and the column
+	method = index_methods.get(stmt.method)
+	if method is None:
+		raise DatabaseError("Index " + idx_name + " not created because method " + stmt.method + " is unknown.")
+
+	if stmt.constraint and not method.operators:
+		raise DatabaseError("Index " + idx_name + " not created because method " + stmt.method +
+							" can not enforce uniqueness.")
+
+	table = open_table(path)
+	if stmt.column not in table.headers:
+		raise DatabaseError("!Failed to create index " + idx_name + " because column " + stmt.column +
+							" does not exist.")
+
+	# write the index and fill it from the table
+	idx_path = index_path(path, idx_name)
+	method.create(idx_path, stmt.column, table.dtypes[table.headers.index(stmt.column)], stmt.constraint)
+	index = method(idx_path)
+
+	try:
+		index.rebuild(table)
+		index.flush()
+
+	except DatabaseError:
+		index.drop()
+		raise
+
+	# report success
+	return Result("Index " + idx_name + " created.")
+
+
+# Delete Index Function
+def drop_index(conn, stmt):
+	idx_name = stmt.name
+
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to delete index " + idx_name +
+							" because USE has not been called on a valid database.")
+
+	# make sure the index exists
+	idx_path = conn.database.find_index(idx_name)
+	if idx_path is not None:
+		# drop the index
+		open_index(idx_path).drop()
+
+		# report success
+		return Result("Index " + idx_name + " deleted.")
+
+	else:
+		# report error
+		raise DatabaseError("!Failed to delete index " + idx_name + " because it does not exist.")
+
+
+# Insert Value to Table Function
+def insert_to_table(conn, stmt):
+	return insert_rows(conn, stmt.table, stmt.rows, stmt.conflict)
+
+
+# Insert Rows Function (Helper of Insert)
+# appends any number of rows to a table with one open and one write. the header is read once and
+# every row is checked against its data types and unique indexes before anything is written. with an
+# ON CONFLICT clause, rows whose key is already taken change the row holding it instead
+def insert_rows(conn, tbl_name, rows, conflict=None):
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to insert into table " + tbl_name +
+							" because USE has not been called on a valid database.")
+
+	# make sure the table exists
+	path = conn.database.table_path(tbl_name)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to insert into table " + tbl_name + " because it does not exist.")
+
+	# check the rows against the data types
+	failure = "!Failed to insert into table " + tbl_name
+	table = open_table(path)
+	check_rows(failure, table.dtypes, rows)
+
+	# merge the rows that conflict into the rows they conflict with, which are written again
+	indexes = open_indexes(path)
+	replaced = list()
+
+	if conflict is not None:
+		rows, replaced = resolve_conflicts(failure, table, indexes, rows, conflict)
+		check_rows(failure, table.dtypes, rows)
+
+	# check the rows against the indexes
+	for index in indexes:
+		index.keyed(enumerate(rows), table.headers.index(index.column))
+
+	check_unique(failure, table, indexes, rows, set(locator for locator, rvalues in replaced))
+
+	# take out the replaced rows, matched on the keys they hold in the conflict column. they are locked
+	# against open transactions before they change
+	removed = list()
+	if replaced:
+		lock_statement(conn, table, lambda: [locator for locator, rvalues in replaced])
+		index = find_conflict_index(failure, table, indexes, conflict)
+		column = table.headers.index(index.column)
+		cast_func = index.cast_func
+		keys = set(cast_func(rvalues[column]) for locator, rvalues in replaced)
+
+		def key_filter(values):
+			return [i for i, value in enumerate(values) if value != "" and cast_func(value) in keys]
+
+		num_changes, removed = table.delete(key_filter, column, sorted(locator for locator, rvalues in replaced))
+
+	# append the table and add the rows to its indexes
+	locators = table.insert(rows)
+	table.flush()
+
+	if removed is None:
+		update_indexes(table, indexes)
+
+	else:
+		update_indexes(table, indexes, removed, list(zip(locators, rows)))
+
+	# report success
+	inserted = len(rows) - len(replaced)
+	if inserted == 1:
+		message = "1 new record inserted."
+
+	else:
+		message = str(inserted) + " new records inserted."
+
+	if replaced:
+		modified = "1 record" if len(replaced) == 1 else str(len(replaced)) + " records"
+		message = message[:-1] + ", " + modified + " modified."
+
+	return Result(message, rowcount=len(rows))
+
+
+# Resolve Conflicts Function (Helper of Insert Rows)
+# the rows to write for an insert with an ON CONFLICT clause along with the (locator, row) pairs of the rows
+# they replace. a row whose key an earlier row of the statement or a row of the table holds updates that
+# row through the DO UPDATE assignments, or is dropped for DO NOTHING
+def resolve_conflicts(failure, table, indexes, rows, conflict):
+	headers = table.headers
+	index = find_conflict_index(failure, table, indexes, conflict)
+	column = headers.index(index.column)
+
+	# check the assignments, a value taken from the inserted row is kept as the index of its column
+	assignments = list()
+	for set_column, value in conflict.assignments or ():
+		if isinstance(value, Excluded):
+			if value.column not in headers:
+				raise DatabaseError(failure + " because requested change is invalid.")
+
+			value = headers.index(value.column)
+
+		if set_column not in headers:
+			raise DatabaseError(failure + " because requested change is invalid.")
+
+		assignments.append((headers.index(set_column), value))
+
+	# look up each key once and read the rows holding them together
+	keys = [index.key(values[column]) for values in rows]
+	found = dict()
+	for key in set(keys):
+		if key is not None:
+			for locator in index.search("=", key):
+				found[key] = locator
+
+	locators = sorted(found.values())
+	existing = dict(zip(locators, table.fetch(locators)))
+
+	# the row each key ends up in is kept by its position in the output
+	output = list()
+	positions = dict()
+	replaced = list()
+
+	for key, values in zip(keys, rows):
+		if key is None:
+			output.append(values)
+			continue
+
+		if key not in positions:
+			if key not in found:
+				positions[key] = len(output)
+				output.append(values)
+				continue
+
+			if conflict.assignments is None:
+				continue
+
+			positions[key] = len(output)
+			output.append(existing[found[key]])
+			replaced.append((found[key], existing[found[key]]))
+
+		if conflict.assignments is not None:
+			row = list(output[positions[key]])
+			for set_index, value in assignments:
+				row[set_index] = values[value] if isinstance(value, int) else value
+
+			output[positions[key]] = row
+
+	return output, replaced
+
+
+# Find Conflict Index Function (Helper of Insert Rows)
+# the unique index an ON CONFLICT clause names by its column, the primary key when it names none
+def find_conflict_index(failure, table, indexes, conflict):
+	for index in indexes:
+		if index.primary if conflict.column is None else index.unique and index.column == conflict.column:
+			return index
+
+	if conflict.column is None:
+		raise DatabaseError(failure + " because it has no primary key.")
+
+	raise DatabaseError(failure + " because column " + conflict.column + " has no unique index.")
+
+
+# Check Unique Function (Helper of Insert Rows)
+# fails when rows about to be written would give a unique index a key twice or leave a primary key empty.
+# keys held by the replaced locators are free
+def check_unique(failure, table, indexes, rows, replaced):
+	for index in indexes:
+		if not index.unique:
+			continue
+
+		column = table.headers.index(index.column)
+		seen = set()
+
+		for values in rows:
+			value = values[column]
+			if index.primary and not value:
+				raise IntegrityError(failure + " because primary key " + index.column + " is empty.")
+
+			key = index.key(value)
+			if key is None:
+				continue
+
+			if key in seen or any(locator not in replaced for locator in index.search("=", key)):
+				raise IntegrityError(failure + " because " + index.column + " " + repr(value) + " is not unique.")
+
+			seen.add(key)
 
-# file lock name
-lock_file = ""
 
-# dictionaries
-ops = { "!=" : operator.ne,
-		"=" : operator.eq,
-		"<" : operator.lt,
-		"<=" : operator.le,
-		">" : operator.gt,
-		">=" : operator.ge 	}
+# Check Rows Function (Helper of Insert Rows, Copy and Update)
+# makes sure each row has a value per column, that no value holds the separator or a line break and that
+# numeric values cast, empty values are allowed. failure starts the error message
+def check_rows(failure, dtypes, rows):
+	# only the numeric columns need their values cast
+	numeric = [(i, get_cast(dtype), dtype) for i, dtype in enumerate(dtypes) if (get_cast(dtype) or str) is not str]
+	width = len(dtypes)
 
-casts = { 	"varchar(10)" : str,
-			"wavrchar(20)" : str,
-			"int" : int,
-			"float" : float	}
+	for values in rows:
+		if len(values) != width:
+			raise DataError(failure + " because " + str(len(values)) + " values were given for " +
+							str(width) + " columns.")
 
+		# the separator and line breaks would break the table format
+		joined = "".join(values)
+		if "|" in joined or "\n" in joined:
+			value = [value for value in values if "|" in value or "\n" in value][0]
+			raise DataError(failure + " because " + repr(value) + " holds a | or a line break.")
 
-# Function Declarations ###############################################################################################
-# Create Database Function
-def create_database(re_match):
-	db_name = re_match.group(1)
+		for i, cast_func, dtype in numeric:
+			value = values[i]
+			if value:
+				try:
+					cast_func(value)
 
-	# check if database already exists
-	if not os.path.exists(db_name):
-		# make the database
-		os.mkdir(db_name)
+				except ValueError:
+					raise DataError(failure + " because " + repr(value) + " is not a valid " + dtype + ".")
 
-		# print success
-		print("Database", db_name,  "created.")
 
-	else:
-		# print error
-		print("!Failed to create database", db_name,
-			  "because it already exists.")
+# Update Indexes Function (Helper of Insert, Copy, Commit, Update and Delete)
+# brings the indexes of a table up to date after its rows changed. removed and added are the (locator,
+# row) pairs taken out of and put into the table, each index only changes the entries of its column that
+# differ. without them every index is built again from the table
+def update_indexes(table, indexes, removed=None, added=None):
+	for index in indexes:
+		if removed is None:
+			index.rebuild(table)
 
+		else:
+			column = table.headers.index(index.column)
+			old = index.keyed(removed, column)
+			new = index.keyed(added, column)
 
-# Delete Database Function
-def drop_database(re_match):
-	global use_flag
-	db_name = re_match.group(1)
+			# entries a statement left alone are not touched
+			if old and new:
+				same = set(old).intersection(new)
+				old = [entry for entry in old if entry not in same]
+				new = [entry for entry in new if entry not in same]
 
-	# make sure the database exists
-	if (use_flag == True) and (db_name == os.path.basename(os.getcwd())):
-		os.chdir("..")
-		use_flag = False
+			index.remove(old)
+			index.add(new)
 
-	if os.path.exists(db_name):
-		# drop the database
-		rmtree(db_name)
+			# a bloom sized for fewer keys is built again at the size it now needs
+			if index.outgrown():
+				index.rebuild(table)
 
-		# print success
-		print("Database", db_name,  "deleted.")
+		index.flush()
 
-	else:
-		# print error
-		print("!Failed to delete", db_name,
-			  "because it does not exist.")
 
+# Copy Function
+# streams a csv or | separated file into a table. rows are checked in chunks, by a pool of worker
+# processes when workers are asked for, and appended through one large buffer. if any chunk fails
+# the table is cut back to where it was
+def copy_to_table(conn, stmt):
+	tbl_name = stmt.table
 
-# Use Database Function
-def use_database(re_match):
-	global use_flag
-	db_name = re_match.group(1)
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed to copy into table " + tbl_name +
+							" because USE has not been called on a valid database.")
 
-	# make sure the database exists
-	if use_flag == True:
-		os.chdir("..")
-		use_flag = False
+	# make sure the table and the file exist
+	path = conn.database.table_path(tbl_name)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to copy into table " + tbl_name + " because it does not exist.")
 
-	if os.path.exists(db_name):
-		# change to the database
-		os.chdir(db_name)
-		use_flag = True
+	source_path = os.path.join(conn.root, stmt.path)
+	if not os.path.isfile(source_path):
+		raise DatabaseError("!Failed to copy into table " + tbl_name + " because " + stmt.path +
+							" does not exist.")
 
-		# print success
-		print("Using database", db_name + ".")
+	table = open_table(path)
+	savepoint = table.savepoint()
+	pool = None
 
-	else:
-		# print error
-		print("!Failed to use database", db_name,
-			  "because it does not exist.")
+	try:
+		with open(source_path, "r", newline="") as source:
+			# skip the header line of the file
+			if stmt.header:
+				source.readline()
 
+			chunks = read_copy_chunks(source, stmt.format)
+			args = (tbl_name, table.dtypes, stmt.format)
 
-# Create Table Function
-def create_table(re_match):
-	global use_flag
-	global casts
-	tbl_name = re_match.group(1)
-	tbl_items = re_match.group(2)
+			# check the chunks here, or hand them to the pool keeping a bounded number in flight
+			if stmt.workers > 0:
+				pool = ProcessPoolExecutor(stmt.workers)
 
-	# check USE flag
-	if not(use_flag):
-		print("!Failed to create table", tbl_name,
-			  "because USE has not been called on a valid database.")
+			num_rows = table.load(check_copy_chunks(pool, stmt.workers, args, chunks, table.text_chunks))
+			table.flush()
 
-	# check if file exists
-	elif os.path.isfile(tbl_name):
-		# print error
-		print("!Failed to create table", tbl_name,
-			  "because it already exists.")
+		# the indexes are built again over the loaded rows
+		update_indexes(table, open_indexes(path))
 
-	else:
-		# create the file
-		f = open(tbl_name, "w+")
+	except (DatabaseError, csv.Error, UnicodeDecodeError, OSError) as e:
+		# cut the table back to where it was before the copy, its indexes may already hold the loaded rows
+		table.restore(savepoint)
+		update_indexes(table, open_indexes(path))
 
-		# parse the items
-		items = tbl_items.split(", ")
+		if isinstance(e, csv.Error):
+			raise DataError("!Failed to copy into table " + tbl_name + " because " + str(e) + ".")
 
-		# check for valid data types
-		dcheck = [i.split(" ")[1] for i in items]
-		dtypes = [i[0] for i in casts.items()]
+		if isinstance(e, UnicodeDecodeError):
+			raise DataError("!Failed to copy into table " + tbl_name + " because line " +
+							str(undecodable_line(source_path)) + " of " + stmt.path + " is not utf-8.")
 
-		if set(dcheck).issubset(dtypes):
-			# write in the table
-			delim = ""
-			for x in items:
-				f.write(delim)
-				f.write(x)
-				
-				delim = "|"
+		if isinstance(e, OSError):
+			raise OperationalError("!Failed to copy into table " + tbl_name + " because " + stmt.path +
+								   " could not be read: " + (e.strerror or str(e)) + ".")
 
-			f.write("\n")
+		raise
 
-			# close the file
-			f.close()
+	finally:
+		if pool is not None:
+			pool.shutdown(cancel_futures=True)
 
-			# print success
-			print("Table", tbl_name, "created.")
+	# report success
+	return Result(str(num_rows) + " new records copied.", rowcount=num_rows)
 
-		else:
-			print("Table", tbl_name, "not created because datatypes are invalid.")
 
+# Undecodable Line Function (Helper of Copy)
+# the number of the first line of a file holding bytes that are not utf-8, read a block at a time
+def undecodable_line(path):
+	decoder = codecs.getincrementaldecoder("utf-8")()
+	line = 1
 
-# Delete Table Function
-def drop_table(re_match):
-	tbl_name = re_match.group(1)
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(copy_chunk_bytes), b""):
+			try:
+				decoder.decode(block)
 
-	# check USE flag
-	if not(use_flag):
-		print("!Failed to delete table", tbl_name,
-			  "because USE has not been called on a valid database.")
+			# the decoder may hold back the start of a character cut by the block before
+			except UnicodeDecodeError as e:
+				return line + block.count(b"\n", 0, max(e.start - len(e.object) + len(block), 0))
+
+			line += block.count(b"\n")
+
+	return line
 
-	# make sure the table exists
-	elif os.path.isfile(tbl_name):
-		# drop the table
-		os.remove(tbl_name)
 
-		# print success
-		print("Table", tbl_name,  "deleted.")
+# Read Copy Chunks Function (Helper of Copy)
+# yields lists of csv rows, or lists of lines for | separated files
+def read_copy_chunks(source, fmt):
+	if fmt == "csv":
+		reader = csv.reader(source)
+		while True:
+			chunk = list(islice(reader, copy_chunk_rows))
+			if not chunk:
+				break
+
+			yield chunk
 
 	else:
-		# print error
-		print("!Failed to delete table", tbl_name,
-			  "because it does not exist.")
+		while True:
+			chunk = source.readlines(copy_chunk_bytes)
+			if not chunk:
+				break
 
+			yield chunk
 
-# Insert Value to Table Function
-def insert_to_table(re_match):
-	tbl_name = re_match.group(1)
-	tbl_items = re_match.group(2)
 
-	# make sure the table exists
-	if os.path.isfile(tbl_name):
-		# open the file
-		f = open(tbl_name, "a")
+# Check Copy Chunks Function (Helper of Copy)
+# yields the checked chunks in order, keeping at most two per worker in flight when there is a pool
+def check_copy_chunks(pool, workers, args, chunks, as_text):
+	if pool is None:
+		for chunk in chunks:
+			yield copy_chunk(*args, chunk, as_text)
+
+		return
 
-		# parse items
-		items = tbl_items.split(",")
-		items = [i.strip().replace("'", "") for i in items]
+	pending = deque()
+	for chunk in chunks:
+		pending.append(pool.submit(copy_chunk, *args, chunk, as_text))
 
-		# append the table
-		delim = ""
-		for x in items:
-			f.write(delim)
-			f.write(x)
-			delim = "|"
+		if len(pending) >= 2 * workers:
+			yield pending.popleft().result()
 
-		f.write("\n")
+	while pending:
+		yield pending.popleft().result()
 
-		# print success
-		print("1 new record inserted.")
 
-		# close the file
-		f.close()
+# Copy Chunk Function (Helper of Copy)
+# checks one chunk against the table and returns it with its row count, as table text or as rows for
+# engines that encode rows themselves. runs in the worker processes when copy uses a pool
+def copy_chunk(tbl_name, dtypes, fmt, chunk, as_text=True):
+	if fmt == "csv":
+		# skip blank lines and join the values with the table separator
+		rows = [values for values in chunk if values]
+		lines = ["|".join(values) for values in rows]
+
+		# a value holding the separator would add a column
+		for line in lines:
+			if line.count("|") != len(dtypes) - 1 or "\n" in line:
+				raise DataError("!Failed to copy into table " + tbl_name + " because " + repr(line) +
+								" holds a | or a line break.")
 
 	else:
-		# print error
-		print("!Failed to insert into table", tbl_name,
-			  "because it does not exist.")
+		# strip the line ends and skip blank lines
+		lines = [line.rstrip("\r\n") for line in chunk]
+		lines = [line for line in lines if line.strip()]
+		rows = [line.split("|") for line in lines]
 
+	check_rows("!Failed to copy into table " + tbl_name, dtypes, rows)
 
-# Begin Transaction Function
-def begin_trans(re_match):
-	# declare variables
-	global transaction_flag
+	if not as_text:
+		return rows, len(rows)
+
+	if not lines:
+		return "", 0
+
+	return "\n".join(lines) + "\n", len(lines)
 
-	# set transaction flag
-	transaction_flag = True
+
+# Begin Transaction Function
+def begin_trans(conn, stmt):
+	# set transaction flag, the youngest transaction in a deadlock is the one aborted
+	conn.transaction_flag = True
+	conn.transaction_start = time.time_ns()
 
 	# report success
-	print("Transaction starts.")
+	return Result("Transaction starts.")
 
 
 # Commit Function
-def commit(re_match):
-	# declare variables
-	global lock_file
-	global transaction_flag
-	global abort_flag
-
+def commit(conn, stmt):
 	# check transaction flag
-	if transaction_flag:
-		# check abort flag
-		if abort_flag:
-			# report failure
-			print("Transaction abort.")
+	if not conn.transaction_flag:
+		raise DatabaseError("Not in a transaction.")
 
-		else:
-			# upload temp lock file into list
-			# check that file exists
-			if os.path.isfile(lock_file):
-				# open file
-				with open(lock_file, "r") as f:
-					# read line by line into list
-					new_table = f.readlines()
-
-			# else print error
-			else:
-				# report failure
-				print("Lock file not found.")
+	# check abort flag, an aborted transaction throws its changes away
+	if conn.abort_flag:
+		conn.end_transaction()
+		raise DatabaseError("Transaction abort.")
 
-			# get table name and check that it exists
-			tbl_name = lock_file.replace("_lock", "")
-			if os.path.isfile(tbl_name):
-				# open file
-				with open(tbl_name, "r+") as f:
-					# rewrite and truncate
-					for line in new_table:
-						f.write(line)
+	# make sure each changed table still exists
+	for tbl_path in conn.changes:
+		if not os.path.isfile(tbl_path):
+			conn.end_transaction()
+			raise DatabaseError("Table " + os.path.basename(tbl_path) + " not found.")
 
-					f.truncate()
+	# log the changes and write them to the tables, the transaction ends either way
+	try:
+		commit_changes(conn.changes)
 
-				# delete lock
-				os.remove(lock_file)
+	finally:
+		conn.end_transaction()
 
-			else:
-				# report failure
-				print("Table", tbl_name, "not found.")
-				return
+	# report success
+	return Result("Transaction committed.")
 
-			# reset globals and report success
-			lock_file = ""
-			transaction_flag = False;
-			abort_flag = False;
-			print("Transaction committed.")
 
-	else:
-		# print failure
-		print("Not in a transaction.")
+# Commit Changes Function (Helper of Commit)
+# stages the rows a transaction changed in each table, logs them with one write and one sync per database,
+# then puts them in place and brings the indexes along. a row changed outside the transaction since it
+# read it aborts the commit before anything is logged
+def commit_changes(changes):
+	txn = "%d.%d" % (os.getpid(), time.time_ns())
 
+	# one commit at a time writes a table, taken in order so two commits never wait on each other. the
+	# commit takes its numbers once it holds every table, so it writes them after any commit numbered before
+	committing = list()
+	versioning = list()
+	try:
+		for path in sorted(changes):
+			lock_manager.begin_commit(path)
+			committing.append(path)
 
-# Update Table Function
-def update_table(re_match):
-	# declare variables
-	global use_flag
-	global lock_file
-	global abort_flag
-	lock_path = ""
-
-	semico_p = re.compile(r".*;\s*", re.S)
-	input = re_match.group(0)
-	update_param_p = re.compile(r"UPDATE\s+(.+)\s+SET\s+(.+)\s+WHERE\s+(.+);\s*", re.I)
-
-	# take in the update command all the way to the semicolon
-	while True:
-		re_match = semico_p.fullmatch(input)
+		for directory in sorted(set([os.path.dirname(path) for path in changes])):
+			version_store.begin(directory)
+			versioning.append(directory)
 
-		if re_match is None:
-			input += sys.stdin.readline()
+		entries = write_changes(changes, txn)
 
-		else:
-			break
+	finally:
+		for directory in versioning:
+			version_store.end(directory)
 
-	# normalize the string
-	input = input.replace("\n", "")
+		for path in committing:
+			lock_manager.end_commit(path)
 
-	# parse the string for desired information and execute
-	u_param = update_param_p.fullmatch(input)
+	# mark the entries written and checkpoint a log that has grown large
+	for directory in entries:
+		log = WriteAheadLog(directory)
+		log.append([{"applied" : txn}])
 
-	# check USE flag
-	if not use_flag:
-		print("!Failed update. USE has not been called on a valid database.")
-
-	elif u_param is not None:
-		# make sure the table exists
-		tbl_name = u_param.group(1)
-		if os.path.isfile(tbl_name):
-			# check transaction flag
-			if transaction_flag:
-				if not abort_flag:
-					# set lock file name
-					lock_path = tbl_name + "_lock"
-
-					# check to see if file is locked by other process
-					if os.path.isfile(lock_path) and lock_path != lock_file:
-						# set the abort flag
-						abort_flag = True
-
-						# report failure
-						print("Error: Table", tbl_name, "is locked!")
-						return
+		if log.size() >= wal_checkpoint_size:
+			log.checkpoint()
 
-					else:
-						# set lock file
-						lock_file = lock_path
 
-						# create the lock file
-						open(lock_file, "a").close()
+# Write Changes Function (Helper of Commit)
+# checks, stages, logs and installs the changes of a transaction while it holds the commit slots of their
+# tables, returns the log entries by database
+def write_changes(changes, txn):
+	staged = list()
+	entries = dict()
 
-				else:
-					# report aborted
-					print("Transaction has been aborted!")
-					return
+	try:
+		for path, rows in changes.items():
+			table = open_table(path)
+			locators = sorted(rows)
 
-			# open the file and read the lines
-			f = open(tbl_name, "r+")
-			# read the table header and parse the elements
-			lines = f.readlines()
-			headers = lines[0].split("|")
-			headers[-1] = headers[-1].rstrip()
-			dtypes = list()
-			delimiter = "|"
-
-			# strip and store the data types
-			for i in range(len(headers)):
-				parsed = headers[i].split(" ")
-				headers[i] = parsed[0]
-				dtypes.append(parsed[1])
-
-			# parse the request
-			request = u_param.group(2).split(" ")
-			request =[i.replace("'", "") for i in request]
-			request[-1] = request[-1].rstrip()
-
-			# parse the parameter
-			parameter = u_param.group(3).split(" ")
-			parameter =[i.replace("'", "") for i in parameter]
-
-			# check the request and parameter
-			if (
-					set(request).intersection(headers) and
-					set(parameter).intersection(headers)
-				):
-				# assign the indices of desired table columns to list
-				set_index = headers.index(request[0])
-				set_val = request[2]
-				param_index = headers.index(parameter[0])
-				castval = dtypes[param_index]
-				rewrite = list()
-				rewrite.append(lines[0])
-				num_changes = 0
-
-				# until end of file
-				for line in lines[1:]:
-					# split and strip line
-					rvalues = line.split("|")
-
-					# check the parameter
-					if evaluate(parameter, rvalues[param_index], castval):
-						# update requested value
-						rvalues[set_index] = set_val
-
-
-						# write to file
-						line = delimiter.join(rvalues)
-
-						# update counter
-						num_changes += 1
-
-					line = line.strip()
-					line += "\n"
-					rewrite.append(line)
-
-				# check transaction flag
-				if not transaction_flag:
-					# find header of current file
-					f.seek(0,0)
-
-				# if it is a transaction
-				else:
-					# close table and write to temporary lock file
-					f.close()
-					f = open(lock_file, "r+")
+			# a locator past the end of a columnar table raises IndexError
+			try:
+				current = list(table.fetch(locators))
 
-				# overwrite table
-				for x in rewrite:
-					f.write(x)
+			except IndexError:
+				current = None
 
-				# truncate any extra
-				f.truncate()
+			if current != [rows[locator][0] for locator in locators]:
+				raise OperationalError("Transaction abort because table " + os.path.basename(path) +
+									   " was changed outside of it.")
 
-				# close the file
-				f.close()
+			check_unique_changes(table, rows)
+			staged.append((table,) + table.stage([(locator,) + tuple(rows[locator]) for locator in locators]))
 
-				# report success
-				if(num_changes == 1):
-					print("1 record modified.")
+		# one log entry per database holds the records of each of its tables
+		for table, index_changes, records in staged:
+			directory, tbl_name = os.path.split(table.path)
+			entries.setdefault(directory, {"txn" : txn, "tables" : dict()})["tables"][tbl_name] = records
 
-				else:
-					print(num_changes, "records modified.")
+		for directory, entry in entries.items():
+			WriteAheadLog(directory).append([entry], sync=True)
 
-			# report failure
-			else:
-				print("!Failed to update table", tbl_name,
-					"because requested change is invalid.")
+	except (DatabaseError, OSError):
+		for table, index_changes, records in staged:
+			table.discard()
+
+		raise
+
+	# the changes are durable, write them to the tables and their indexes
+	for table, index_changes, records in staged:
+		table.install()
+		indexes = open_indexes(table.path)
+
+		if index_changes is None:
+			update_indexes(table, indexes)
 
-		# report failure
 		else:
-			print("!Failed to update table", tbl_name,
-			  "because it does not exist.")
+			update_indexes(table, indexes, [change[:2] for change in index_changes],
+						   [change[2:] for change in index_changes])
+
+	return entries
+
+
+# Check Unique Changes Function (Helper of Commit)
+# fails the commit when it would leave a unique column holding a value twice. a transaction checks its
+# updates against its own copy of the table, another one changing other rows may have given the same
+# value to one of them since. the indexes hold the table as committed, a row they find holding the value
+# is fine only when this commit changes it
+def check_unique_changes(table, rows):
+	for index in open_indexes(table.path):
+		if not index.unique:
+			continue
+
+		column = table.headers.index(index.column)
+		keys = [index.key(new_values[column]) for old_values, new_values in rows.values()]
+
+		for key in set([key for key in keys if key is not None]):
+			if keys.count(key) > 1 or any(locator not in rows for locator in index.search("=", key)):
+				value = rows[list(rows)[keys.index(key)]][1][column]
+				raise IntegrityError("Transaction abort because " + index.column + " " + repr(value) +
+									 " is not unique in table " + os.path.basename(table.path) + ".")
+
+
+# Update Table Function
+def update_table(conn, stmt):
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed update. USE has not been called on a valid database.")
+
+	# make sure the table exists
+	tbl_name = stmt.table
+	path = conn.database.table_path(tbl_name)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to update table " + tbl_name + " because it does not exist.")
 
+	# read the table header and parse the elements
+	table = open_table(path)
+	headers = table.headers
+
+	# check transaction flag
+	if conn.transaction_flag:
+		if conn.abort_flag:
+			# report aborted
+			raise DatabaseError("Transaction has been aborted!")
+
+		# a transaction shares the table with others changing other rows of it, a table without row locks
+		# is locked whole. the table is read again after waiting for it
+		if lock_manager.acquire(conn, path, [None], not table.row_locks):
+			table = open_table(path)
+
+	dtypes = table.dtypes
+
+	# the parameter
+	parameter = stmt.where
+
+	# check the request and parameter
+	if not (
+			all(column in headers for column, value in stmt.assignments) and
+			parameter.column in headers
+		):
+		raise DatabaseError("!Failed to update table " + tbl_name + " because requested change is invalid.")
+
+	# assign the indices of desired table columns to list
+	assignments = [(headers.index(column), value) for column, value in stmt.assignments]
+	param_index = headers.index(parameter.column)
+
+	# the assigned values are checked as an inserted row's are before any row changes
+	assigned = [""] * len(dtypes)
+	for set_index, set_val in assignments:
+		assigned[set_index] = set_val
+
+	check_rows("!Failed to update table " + tbl_name, dtypes, [assigned])
+	key_filter = compile_filter(parameter, dtypes[param_index])
+
+	# check the new values against the indexes of their columns
+	indexes = open_indexes(path)
+	unique = list()
+
+	# a bloom on the parameter only describes the table itself, not a transaction's copy of it
+	if parameter.op == "=" and not conn.transaction_flag:
+		attach_bloom(key_filter, indexes, parameter.column, [key_filter.value])
+
+	for index in indexes:
+		for set_index, set_val in assignments:
+			if headers[set_index] == index.column:
+				index.key(set_val)
+
+				if index.unique:
+					unique.append((index, set_index, set_val))
+
+	unique_columns = [set_index for index, set_index, set_val in unique]
+
+	# inside a transaction the changed rows are kept by the connection until it commits, every update
+	# sees the rows as the transaction changed them
+	if conn.transaction_flag:
+		table = TransactionView(table, conn.changes.setdefault(path, dict()), conn)
+		if unique:
+			check_assigned("!Failed to update table " + tbl_name, table, unique,
+						   find_rows(table, [], parameter, key_filter, param_index, unique_columns), False)
+
+		# the indexes hold the rows as committed, an index on the parameter finds the ones left alone
+		num_changes, changes = table.update(key_filter, assignments, param_index,
+											find_locators(table.table, indexes, parameter))
+
+	# otherwise an index on the parameter finds the rows to check and the indexes follow the changes
 	else:
-		# print error
-		print("Failed! to update. Select command syntax invalid.")
+		if unique:
+			check_assigned("!Failed to update table " + tbl_name, table, unique,
+						   find_rows(table, indexes, parameter, key_filter, param_index, unique_columns), True)
 
+		# the rows to change are locked against open transactions before they change
+		locators = find_locators(table, indexes, parameter)
+		lock_statement(conn, table, lambda: [locator for locator, rvalues in table.matches(param_index, key_filter,
+																						   locators)])
 
-# Delete Tuple Function
-def delete_from_table(re_match):
-	# declare variables
-	global use_flag
-	semico_p = re.compile(r".*;\s*", re.S)
-	input = re_match.group(0)
-	delete_param_p = re.compile(r"DELETE\s+FROM\s+(.+)\s+WHERE\s+(.+);\s*", re.I)
-
-	# take in the update command all the way to the semicolon
-	while True:
-		re_match = semico_p.fullmatch(input)
+		num_changes, changes = table.update(key_filter, assignments, param_index, locators)
+		table.flush()
 
-		if re_match is None:
-			input += sys.stdin.readline()
+		# an engine that returns no changes has its indexes rebuilt, unless no row changed
+		if changes is None:
+			if num_changes:
+				update_indexes(table, indexes)
 
 		else:
-			break
+			update_indexes(table, indexes, [change[:2] for change in changes], [change[2:] for change in changes])
+
+	# report success
+	if num_changes == 1:
+		return Result("1 record modified.", rowcount=1)
 
-	# normalize the string
-	input = input.replace("\n", "")
+	else:
+		return Result(str(num_changes) + " records modified.", rowcount=num_changes)
 
-	# parse the string for desired information and execute
-	d_param = delete_param_p.fullmatch(input)
 
+# Delete Tuple Function
+def delete_from_table(conn, stmt):
 	# check USE flag
-	if not(use_flag):
-		print("!Failed update. USE has not been called on a valid database.")
-
-	elif d_param is not None:
-		# make sure the table exists
-		tbl_name = d_param.group(1)
-		if os.path.isfile(tbl_name):
-			# open the file and read the lines
-			with open(tbl_name, "r+") as f:
-				#read = table.readlines()
-				
-				# loop through the lines and update where needed
-
-				# read the table header and parse the elements
-				lines = f.readlines()
-				headers = lines[0].split("|")
-				headers[-1] = headers[-1].rstrip()
-				dtypes = list()
-				delimiter = "|"
-
-				# strip and store the data types
-				for i in range(len(headers)):
-					parsed = headers[i].split(" ")
-					headers[i] = parsed[0]
-					dtypes.append(parsed[1])
-
-				# parse the parameter
-				parameter = d_param.group(2).split(" ")
-				parameter =[i.replace("'", "") for i in parameter]
-
-				# check the request and parameter
-				if (set(parameter).intersection(headers)):
-					# assign the indices of desired table columns to list
-					param_index = headers.index(parameter[0])
-					castval = dtypes[param_index]
-					rewrite = list()
-					rewrite.append(lines[0])
-					num_changes = 0
-
-					# until end of file
-					for line in lines[1:]:
-						# split and strip line
-						rvalues = line.split("|")
-
-						# check the parameter
-						if evaluate(parameter, rvalues[param_index], castval):
-							# delete
-							line = ''
-
-							# update counter
-							num_changes += 1
-
-						rewrite.append(line)
-
-					f.seek(0,0)
-
-					for x in rewrite:
-						f.write(x)
-
-					f.truncate()
-
-					# report success
-					if(num_changes == 1):
-						print("1 record deleted.")
+	if conn.database is None:
+		raise DatabaseError("!Failed update. USE has not been called on a valid database.")
 
-					else:
-						print(num_changes, "records deleted.")
+	# make sure the table exists
+	tbl_name = stmt.table
+	path = conn.database.table_path(tbl_name)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to delete from table " + tbl_name + " because it does not exist.")
 
-				# report failure
-				else:
-					print("!Failed to delete from table", tbl_name,
-						"because requested delete is invalid.")
+	# read the table header and parse the elements
+	table = open_table(path)
+	headers = table.headers
 
-		# report failure
-		else:
-			print("!Failed to delete from table", tbl_name,
-			  "because it does not exist.")
+	# the parameter
+	parameter = stmt.where
+
+	# check the request and parameter
+	if parameter.column not in headers:
+		raise DatabaseError("!Failed to delete from table " + tbl_name +
+							" because requested delete is invalid.")
+
+	# assign the indices of desired table columns to list
+	param_index = headers.index(parameter.column)
+	key_filter = compile_filter(parameter, table.dtypes[param_index])
+
+	# an index on the parameter finds the rows to check, the indexes drop the deleted rows
+	indexes = open_indexes(path)
+	if parameter.op == "=":
+		attach_bloom(key_filter, indexes, parameter.column, [key_filter.value])
+
+	# the rows to delete are locked against open transactions before they go, all of them when the rows
+	# after them move
+	locators = find_locators(table, indexes, parameter)
+	lock_statement(conn, table, None if table.delete_moves else
+				   lambda: [locator for locator, rvalues in table.matches(param_index, key_filter, locators)])
+
+	num_changes, changes = table.delete(key_filter, param_index, locators)
+	table.flush()
+
+	# an engine that returns no changes has its indexes rebuilt, unless no row went
+	if changes is not None or num_changes:
+		update_indexes(table, indexes, changes, None if changes is None else [])
+
+	# report success
+	if num_changes == 1:
+		return Result("1 record deleted.", rowcount=1)
 
 	else:
-		# print error
-		print("Failed! to delete. Select command syntax invalid.")
+		return Result(str(num_changes) + " records deleted.", rowcount=num_changes)
 
 
-# Select Function
-def select_from_table(re_match):
-	# declare variables
-	global use_flag
-	semico_p = re.compile(r".*;\s*", re.S)
-	input = re_match.group(0)
-	comma_flag = False
-
-	# command checks
-	select_all_p = re.compile(r"SELECT\s+\*\s+FROM\s+(\w+);\s*", re.I)
-	select_no_param_p = re.compile(r"SELECT\s+(.+)\s+FROM\s+(\w+);\s*", re.I)
-	select_param_p = re.compile(r"SELECT\s+(.+)\s+FROM\s+(.+)\s+WHERE\s+(.+);\s*", re.I)
-	select_inner_join_p = re.compile(r"SELECT\s+(.+)\s+FROM\s+(.+)\s+ON\s+(.+);\s*", re.I)
-
-	# take in the select command all the way to the semicolon
-	while True:
-		re_match = semico_p.fullmatch(input)
+# Check Assigned Function (Helper of Update)
+# fails when an update would give a unique column a value another row holds or leave a primary key empty.
+# unique holds the (index, column, value) of each unique column assigned and matched the rows the update
+# changes with those columns. the index finds the rows holding a value when it is current, a transaction
+# checks its copy of the table instead
+def check_assigned(failure, table, unique, matched, current):
+	matched = list(matched)
+
+	for i, (index, column, value) in enumerate(unique):
+		if index.primary and not value:
+			raise IntegrityError(failure + " because primary key " + index.column + " is empty.")
 
-		if re_match is None:
-			input += sys.stdin.readline()
+		# one row keeping its own value is fine, any more would hold it twice
+		key = index.key(value)
+		if key is None or not matched or len(matched) == 1 and index.key(matched[0][i]) == key:
+			continue
+
+		if current:
+			taken = len(matched) > 1 or any(True for locator in index.search("=", key))
 
 		else:
+			key_of = index.key
+			taken = len(matched) > 1 or any(True for row in table.select(
+				[column], column, lambda values: [j for j, value in enumerate(values) if key_of(value) == key]))
+
+		if taken:
+			raise IntegrityError(failure + " because " + index.column + " " + repr(value) + " is not unique.")
+
+
+# Find Rows Function (Helper of Update)
+# the given columns of the rows that pass the parameter, found through an index on it when there is one
+def find_rows(table, indexes, parameter, key_filter, param_index, columns):
+	index = find_index(indexes, parameter.column, parameter.op)
+
+	if index is None or not table.indexed_reads:
+		return table.select(columns, param_index, key_filter)
+
+	return table.fetch(sorted(index.search(parameter.op, cast_literal(parameter, index.cast_func))), columns)
+
+
+# Find Locators Function (Helper of Update and Delete)
+# the sorted locators of the rows an index on the parameter finds, None when the table has no such index
+# or its engine reads every row anyway
+def find_locators(table, indexes, parameter):
+	index = find_index(indexes, parameter.column, parameter.op)
+
+	if index is None or not table.indexed_writes:
+		return None
+
+	return sorted(index.search(parameter.op, cast_literal(parameter, index.cast_func)))
+
+
+# Attach Bloom Function (Helper of Select, Update and Delete)
+# hands a filter the bloom index on its column along with the keys a row must hold to pass, so a storage
+# engine can pass over the blocks or the table whose bloom holds none of them
+def attach_bloom(key_filter, indexes, column, keys):
+	for index in indexes:
+		if isinstance(index, BloomIndex) and index.column == column:
+			key_filter.bloom = index
+			key_filter.keys = keys
 			break
 
-	# normalize the string
-	input = input.replace("\n", "")
+	return key_filter
 
-	# parse the string for desired information and execute
-	s_all = select_all_p.fullmatch(input)
-	s_no_param = select_no_param_p.fullmatch(input)
-	s_param = select_param_p.fullmatch(input)
-	s_inner_join = select_inner_join_p.fullmatch(input)
 
-	# check USE flag
-	if not(use_flag):
-		print("!Failed query. USE has not been called on a valid database.")
+# Bloom Rejects Function (Helper of Storage Engines)
+# whether the bloom a filter was handed holds none of its keys for a block
+def bloom_rejects(key_filter, block):
+	bloom = getattr(key_filter, "bloom", None)
+	return bloom is not None and not any(bloom.may_contain(block, key) for key in key_filter.keys)
 
-	# select all
-	elif s_all is not None:
-		sel_all(s_all)
 
-	# select without parameters
-	elif s_no_param is not None:
-		sel_no_p(s_no_param)
+# Select Function
+# plans the query and returns its rows as they are read. the query reads a snapshot of the database taken
+# as it starts, without locks, commits running or made while the rows are read are not seen
+def select_from_table(conn, stmt):
+	# check USE flag
+	if conn.database is None:
+		raise DatabaseError("!Failed query. USE has not been called on a valid database.")
 
-	elif s_param is not None:
-		# check for multiple tables (inner join)
-		if len(s_param.group(2).split(",")) > 1:
-			comma_flag = True
-			sel_inner_join(s_param, comma_flag)
+	snapshot = Snapshot(conn.database.path)
+	try:
+		# comma, inner and left outer joins
+		if stmt.join is not None:
+			plan = plan_join(conn, stmt, snapshot)
 
+		# one table, with or without parameters
 		else:
-			sel_p(s_param)
+			plan = plan_select(conn, stmt, snapshot)
 
-	elif s_inner_join is not None:
-		sel_inner_join(s_inner_join, comma_flag)
+	except (DatabaseError, OSError):
+		snapshot.close()
+		raise
 
-	else:
-		# print error
-		print("Failed! to query. Select command syntax invalid.")
+	return Result(columns=plan.columns, rows=snapshot.rows(plan))
 
 
-# Select Helper Functions
-# Select All (Helper of Select)
-def sel_all(re_match):
+# Plan Select Function (Helper of Select)
+# builds the operators of a query on one table: a scan of the columns the query uses, a filter for the
+# parameter, a sort and a projection dropping columns that were only read for the filter or the sort.
+# the filter goes below the sort so fewer rows are sorted
+def plan_select(conn, stmt, snapshot=None):
 	# make sure the table exists
-	tbl_name = re_match.group(1)
-	if os.path.isfile(tbl_name):
-		# open the file
-		f = open(tbl_name, "r")
+	tbl_name = stmt.tables[0].name
+	path = conn.database.table_path(tbl_name)
+	if not os.path.isfile(path):
+		raise DatabaseError("!Failed to query table " + tbl_name + " because it does not exist.")
+
+	# read the table header and parse the elements
+	table = open_table(path, snapshot)
+	headers = table.headers
+	dtypes = table.dtypes
+
+	# the requested values, every column for select *
+	values = headers if stmt.columns is None else stmt.columns
+	parameter = stmt.where
+	extra = list()
+
+	if parameter is not None:
+		extra.append(parameter.column)
 
-		# print the table
-		print(f.read(), end='')
+	if stmt.order is not None:
+		extra.append(stmt.order[0])
 
-		# close the file
-		f.close()
+	# check the values
+	if not set(values).union(extra).issubset(headers):
+		raise DatabaseError("!Failed to query table " + tbl_name + " because requested values are invalid.")
+
+	# assign the indices of desired table columns to list, followed by any the parameter and sort need
+	indices = [headers.index(i) for i in values]
+	scan_indices = list(indices)
+
+	for column in extra:
+		if headers.index(column) not in scan_indices:
+			scan_indices.append(headers.index(column))
+
+	# select * reads whole rows
+	if stmt.columns is None and len(scan_indices) == len(indices):
+		plan = Scan(table)
 
-	# report failure
 	else:
-		print("!Failed to query table", tbl_name,
-		  "because it does not exist.")
+		plan = Scan(table, scan_indices)
 
+	# check the parameter, through an index on its column when there is one
+	if parameter is not None:
+		param_index = headers.index(parameter.column)
+		indexes = open_indexes(path, snapshot)
+		index = find_index(indexes, parameter.column, parameter.op)
+
+		if index is not None:
+			plan = IndexScan(table, index, parameter, plan.indices)
 
-# Select Without Parameters (Helper of Select)
-def sel_no_p(re_match):
-	# make sure the table exists
-	tbl_name = re_match.group(2)
-	if os.path.isfile(tbl_name):
-		# open the file
-		f = open(tbl_name, "r")
-
-		# read the table header and parse the elements
-		line = f.readline()
-		headers = line.split("|")
-		headers[-1] = headers[-1].rstrip()
-		pheaders = headers[:]
-
-		# strip the data types
-		for i in range(len(headers)):
-			parsed = headers[i].split(" ")
-			headers[i] = parsed[0]
-
-		# parse the requested values
-		values = re_match.group(1).split(", ")
-		values[-1] = values[-1].rstrip()
-
-		# check the values
-		if set(values).issubset(headers):
-			# assign the indices of desired table columns to list
-			indices = list()
-			delimiter = ""
-
-			for i in values:
-				if i in headers:
-					indices.append(headers.index(i))
-
-			# print requested columns
-			# print headers
-			for i in indices:
-				print(delimiter + pheaders[i], end='')
-				delimiter = "|"
-			print()
-
-			# until end of file
-			for line in f:
-				# reset delimiter
-				delimiter = ""
-
-				# split and strip line
-				rvalues = line.split("|")
-				rvalues[-1] = rvalues[-1].rstrip()
-					
-				# print only columns given by indices
-				for i in indices:
-					print(delimiter + rvalues[i], end='')
-					delimiter = "|"
-				print()
-
-		# report failure
 		else:
-			print("!Failed to query table", tbl_name, "because requested values are invalid.")
+			key_filter = compile_filter(parameter, dtypes[param_index])
+			if parameter.op == "=":
+				attach_bloom(key_filter, indexes, parameter.column, [key_filter.value])
 
-		# close the file
-		f.close()
+			plan = Filter(plan, scan_indices.index(param_index), key_filter)
 
-	# report failure
-	else:
-		print("!Failed to query table", tbl_name, "because it does not exist.")
+	# sort the rows
+	if stmt.order is not None:
+		plan = Sort(plan, scan_indices.index(headers.index(stmt.order[0])), stmt.order[1])
+
+	# drop the columns that were only read for the parameter or the sort
+	if len(scan_indices) > len(indices):
+		plan = Project(plan, list(range(len(indices))))
+
+	return combine(plan)
+
+
+# Combine Function (Helper of Plan Select)
+# merges operators the storage engine can run itself. a filter straight over a scan becomes part of the
+# scan, so the engine checks the parameter before it decodes or reads the other columns
+def combine(plan):
+	if isinstance(plan, Filter) and isinstance(plan.child, Scan) and plan.child.where is None:
+		scan = plan.child
+		param_index = plan.index if scan.indices is None else scan.indices[plan.index]
+		return Scan(scan.table, scan.indices, (param_index, plan.key_filter))
+
+	# combine the operators below this one
+	for name in ("child", "left", "right"):
+		if hasattr(plan, name):
+			setattr(plan, name, combine(getattr(plan, name)))
 
+	return plan
 
-# Select Inner Join (Helper of Select)
-def sel_inner_join(re_match, flag):
+
+# Plan Join Function (Helper of Select)
+# builds the operators of a comma, inner or left outer join of two tables, a projection and a sort go
+# over the joined rows
+def plan_join(conn, stmt, snapshot=None):
 	# acquire table names and id's
-	tbl_names = re_match.group(2)
-	outer_flag = False
+	outer_flag = stmt.join == "left outer"
+	table_one, table_one_id = stmt.tables[0]
+	table_two, table_two_id = stmt.tables[1]
+	path_one = conn.database.table_path(table_one)
+	path_two = conn.database.table_path(table_two)
+
+	# make sure tables exist
+	if not (os.path.isfile(path_one) and os.path.isfile(path_two)):
+		raise DatabaseError("!Failed to query tables because at least one does not exist.")
+
+	# read and parse both headers
+	tbl_one = open_table(path_one, snapshot)
+	tbl_two = open_table(path_two, snapshot)
+	headers_one, dtypes_one = tbl_one.headers, tbl_one.dtypes
+	headers_two, dtypes_two = tbl_two.headers, tbl_two.dtypes
+
+	# parse the parameter
+	param_one = stmt.where.column.split(".")
+	param_two = stmt.where.value.split(".")
+
+	# check the values
+	if not (param_one[-1] in headers_one and param_two[-1] in headers_two):
+		raise DatabaseError("!Failed to query tables because requested values are invalid.")
+
+	# assign the indices of desired parameters
+	param_one_index = headers_one.index(param_one[-1])
+	param_two_index = headers_two.index(param_two[-1])
+
+	# check that comparison requests are of same datatype
+	if dtypes_one[param_one_index] != dtypes_two[param_two_index]:
+		raise DatabaseError("!Failed to query tables because requested join parameters are not of the same type.")
 
-	if flag:
-		tables = tbl_names.split(",")
-		tables[-1] = tables[-1].strip()
+	# an index on the second table's column is probed for each row of a much smaller first table instead
+	# of reading the second table
+	index = None
+	if stmt.where.op == "=" and tbl_two.indexed_reads:
+		index = find_index(open_indexes(path_two, snapshot), headers_two[param_two_index], "=")
+
+	if index is not None and tbl_one.size() * index_join_ratio <= tbl_two.size():
+		plan = IndexJoin(Scan(tbl_one), tbl_two, index, param_one_index, outer_flag)
 
 	else:
-		if("inner" in tbl_names):
-			tables = tbl_names.split(" inner join ")
+		plan = Join(Scan(tbl_one), Scan(tbl_two), param_one_index, param_two_index, stmt.where.op, outer_flag)
 
-		else:
-			tables = tbl_names.split(" left outer join ")
-			outer_flag = True
+	# the columns of the joined rows are found by table name or alias
+	sides = [(table_one, table_one_id, headers_one, 0), (table_two, table_two_id, headers_two, len(headers_one))]
 
-	split = tables[0].split(" ")
-	table_one = split[0]
-	table_one_id = split[1]
+	if stmt.order is not None:
+		plan = Sort(plan, join_column(stmt.order[0], sides), stmt.order[1])
 
-	split = tables[1].split(" ")
-	table_two = split[0]
-	table_two_id = split[1]
+	if stmt.columns is not None:
+		plan = Project(plan, [join_column(column, sides) for column in stmt.columns])
+
+	return plan
+
+
+# Join Column Function (Helper of Plan Join)
+# index of a column of the joined rows, qualified by a table name or alias or found in either table
+def join_column(column, sides):
+	qualifier, name = column.split(".") if "." in column else (None, column)
+
+	for tbl_name, alias, headers, offset in sides:
+		if qualifier in (None, tbl_name, alias) and name in headers:
+			return offset + headers.index(name)
+
+	raise DatabaseError("!Failed to query tables because requested values are invalid.")
+
+
+# Join Rows Function (Helper of Join)
+# picks the join algorithm for two input operators and streams the joined rows, unmatched rows of a
+# left outer join are padded with a missing value per column of the second input
+def join_rows(input_one, input_two, param_one_index, param_two_index, castval, operator, outer_flag, width_two):
+	path_one = input_one.path
+	path_two = input_two.path
+	size_one = input_one.size()
+	size_two = input_two.size()
+	padding = [None] * width_two
+	inputs = list()
+
+	try:
+		# not equal has no useful order or hash, so it keeps the nested loop
+		if operator == "!=":
+			joined = nested_loop_join(list(iter(input_one)), list(iter(input_two)),
+									  param_one_index, param_two_index, castval, operator,
+									  outer_flag)
+
+		# equality joins read the smaller table, or both when they fit, and hash or merge them. the keys of the
+		# table read first go down into the scan of the other, so its rows that can not match are dropped as
+		# they are read. the unmatched rows of the first table in an outer join are kept
+		elif operator == "=" and min(size_one, size_two) <= join_memory_budget:
+			cast_func = get_key_cast(castval)
+			build_two = size_two <= size_one
+
+			if build_two:
+				rows_two = list(iter(input_two))
+				keys = set([cast_func(row[param_two_index]) for row in rows_two])
+				keys.discard(None)
+				if not outer_flag:
+					input_one = reduce_probe(input_one, param_one_index, keys, castval)
+
+			else:
+				rows_one = list(iter(input_one))
+				keys = set([cast_func(row[param_one_index]) for row in rows_one])
+				keys.discard(None)
+				input_two = reduce_probe(input_two, param_two_index, keys, castval)
+
+			# both tables fit so the other is read too, merged when both are already sorted
+			if max(size_one, size_two) <= join_memory_budget:
+				if build_two:
+					rows_one = list(iter(input_one))
+
+				else:
+					rows_two = list(iter(input_two))
+
+				if (
+						is_sorted(rows_one, param_one_index, cast_func) and
+						is_sorted(rows_two, param_two_index, cast_func)
+					):
+					inputs.append(SortedInput(rows_one, param_one_index, castval,
+											  join_memory_budget, path_one))
+					inputs.append(SortedInput(rows_two, param_two_index, castval,
+											  join_memory_budget, path_two))
+					joined = merge_join(inputs[0], inputs[1], operator, outer_flag)
+
+				else:
+					joined = hash_join(rows_one, rows_two, param_one_index, param_two_index,
+									   castval, outer_flag)
+
+			# if only the smaller table fits, build on it and stream the larger one past it
+			elif build_two:
+				joined = hash_join(iter(input_one), rows_two, param_one_index, param_two_index,
+								   castval, outer_flag, build_two)
 
-	# make sure tables exist
-	if os.path.isfile(table_one) and os.path.isfile(table_two):
-		# open the first file
-		with open(table_one, "r") as f:
-			# read the lines and parse the elements
-			lines_one = f.readlines()
-
-		# parse header
-		headers_one = lines_one[0].split("|")
-		headers_one[-1] = headers_one[-1].rstrip()
-		dtypes_one = list()
-
-		# strip and store the data types
-		for i in range(len(headers_one)):
-			parsed = headers_one[i].split(" ")
-			headers_one[i] = parsed[0]
-			dtypes_one.append(parsed[1])
-
-		# open the second file
-		with open(table_two, "r") as f:
-			# read the lines and parse the elements
-			lines_two = f.readlines()
-
-		# parse header
-		headers_two = lines_two[0].split("|")
-		headers_two[-1] = headers_two[-1].rstrip()
-		dtypes_two = list()
-
-		# strip and store the data types
-		for i in range(len(headers_two)):
-			parsed = headers_two[i].split(" ")
-			headers_two[i] = parsed[0]
-			dtypes_two.append(parsed[1])
-
-		# parse the parameter
-		parameter = re_match.group(3).split(" ")
-		param_one = parameter[0].split(".")
-		param_two = parameter[2].split(".")
-		operator = parameter[1]
-
-		# check the values
-		if (
-				set(param_one).intersection(headers_one) and
-				set(param_two).intersection(headers_two)
-			):
-			# assign the indices of desired parameters
-			param_one_index = headers_one.index(param_one[1])
-			param_two_index = headers_two.index(param_two[1])
-			join_file_one = list()
-			join_file_one.append(lines_one[0].rstrip())
-			join_file_two = list()
-			join_file_two.append(lines_two[0].rstrip())
-			delimiter = "|"
-
-			# check that comparison requests are of same datatype
-			if (dtypes_one[param_one_index] == dtypes_two[param_two_index]):
-				castval = dtypes_one[param_one_index]
-
-				# until end of the first file
-				for line in lines_one[1:]:
-					# split and strip line
-					value_one = line.split("|")
-					value_one[-1] = value_one[-1].rstrip()
-					printed = False
-
-					# loop through the second file, checking for matching parameters
-					for cmpline in lines_two[1:]:
-						# split and strip cmpline
-						value_two = cmpline.split("|")
-						value_two[-1] = value_two[-1].rstrip()
-
-						# check the parameter
-						parameter = ["filler", operator, value_two[param_two_index]]
-						if evaluate(parameter, value_one[param_one_index], castval):
-							join_file_one.append(delimiter.join(value_one))
-							printed = True
-							join_file_two.append(delimiter.join(value_two))
-
-					if(outer_flag and not printed):
-						join_file_one.append(delimiter.join(value_one))
-						join_file_two.append(""+delimiter+"")
-
-				for i in range(len(join_file_one)):
-					print(join_file_one[i]+"|"+join_file_two[i])
-
-			# report failure
 			else:
-				print("!Failed to query tables because requested join parameters are not of the same type.")
+				joined = hash_join(rows_one, iter(input_two), param_one_index, param_two_index,
+								   castval, outer_flag, build_two)
 
-		# report failure
+		# range joins and joins too big for a hash table sort both sides and merge them
 		else:
-			print("!Failed to query tables because requested values are invalid.")
+			inputs.append(SortedInput(iter(input_one), param_one_index, castval,
+									  join_memory_budget // 2, path_one))
+			inputs.append(SortedInput(iter(input_two), param_two_index, castval,
+									  join_memory_budget // 2, path_two))
+			joined = merge_join(inputs[0], inputs[1], operator, outer_flag)
 
-	# report failure
-	else:
-		print("!Failed to query tables because at least one does not exist.")
+		for value_one, value_two in joined:
+			yield value_one + (padding if value_two is None else value_two)
 
+	finally:
+		# remove any runs spilled to disk
+		for sorted_input in inputs:
+			sorted_input.close()
 
-# Select With Parameters (Helper of Select)
-def sel_p(re_match):
-	# make sure the table exists
-	tbl_name = re_match.group(2)
-	if os.path.isfile(tbl_name):
-		# open the file
-		f = open(tbl_name, "r")
-
-		# read the table header and parse the elements
-		line = f.readline()
-		headers = line.split("|")
-		headers[-1] = headers[-1].rstrip()
-		pheaders = headers[:]
-		dtypes = list()
-
-		# strip and store the data types
-		for i in range(len(headers)):
-			parsed = headers[i].split(" ")
-			headers[i] = parsed[0]
-			dtypes.append(parsed[1])
-
-		# parse the requested values
-		values = re_match.group(1).split(", ")
-		values[-1] = values[-1].rstrip()
-
-		# parse the parameter
-		parameter = re_match.group(3).split(" ")
-
-		# check the values
-		if (
-				set(values).issubset(headers) and
-				set(parameter).intersection(headers)
-			):
-			# assign the indices of desired table columns to list
-			indices = list()
-			param_index = headers.index(parameter[0])
-			castval = dtypes[param_index]
-			delimiter = ""
-
-			for i in values:
-				if i in headers:
-					indices.append(headers.index(i))
-
-			# print requested columns
-			# print headers
-			for i in indices:
-				print(delimiter + pheaders[i], end='')
-				delimiter = "|"
-			print()
-
-			# until end of file
+
+# Parse Header Function (Helper of Update, Delete and Select)
+# returns the raw header line along with the column names and their data types
+def parse_header(line):
+	header = line.rstrip()
+	headers = list()
+	dtypes = list()
+
+	# strip and store the data types
+	for item in header.split("|"):
+		parsed = item.split(" ")
+		headers.append(parsed[0])
+		dtypes.append(parsed[1])
+
+	return header, headers, dtypes
+
+
+# Read Header Function (Helper of Text Table)
+def read_header(path):
+	with open(path, "r") as f:
+		return parse_header(f.readline())
+
+
+# Read Rows Function (Helper of Text Table)
+# streams the rows of an open text table file split into their values, skipping the header, and closes it.
+# only the given columns are kept when asked for
+def read_rows(f, columns=None):
+	with f:
+		f.readline()
+
+		if columns is None:
+			for line in f:
+				yield line.rstrip().split("|")
+
+		else:
+			for line in f:
+				rvalues = line.rstrip().split("|")
+				yield [rvalues[i] for i in columns]
+
+
+# Select Rows Function (Helper of Select)
+# streams the rows that pass the filter a batch at a time, the filter is given the values at index. rows
+# are cut to the first width values when the scan added the column the filter reads
+def select_rows(rows, index, width, key_filter):
+	rows = iter(rows)
+
+	while True:
+		batch = list(islice(rows, batch_size))
+		if not batch:
+			break
+
+		# check the parameter
+		for i in key_filter([rvalues[index] for rvalues in batch]):
+			rvalues = batch[i]
+			yield rvalues if len(rvalues) == width else rvalues[:width]
+
+
+# Reduce Probe Function (Helper of Join Rows)
+# a semi-join reduction, the keys read from one side of an equality join go down into the scan of the other
+# side so its storage engine drops the rows holding none of them before it decodes them. a bloom index on
+# the column also passes over the blocks holding none of the keys when they are few enough to look up.
+# any operator other than a plain scan is left as it is
+def reduce_probe(probe, index, keys, cast):
+	if not isinstance(probe, Scan) or probe.where is not None:
+		return probe
+
+	table = probe.table
+	param_index = index if probe.indices is None else probe.indices[index]
+	key_filter = compile_semi_filter(keys, cast)
+
+	if len(keys) <= bloom_probe_keys:
+		attach_bloom(key_filter, open_indexes(table.path, table.snapshot), table.headers[param_index], list(keys))
+
+	return Scan(table, probe.indices, (param_index, key_filter))
+
+
+# Is Sorted Function (Helper of Join Rows)
+# rows with a missing key are left to the hash join
+def is_sorted(rows, index, cast_func):
+	keys = [cast_func(row[index]) for row in rows]
+	return None not in keys and all(keys[i] <= keys[i + 1] for i in range(len(keys) - 1))
+
+
+# Hash Join (Helper of Join Rows)
+# yields (row_one, row_two) pairs where the join columns are equal, row_two is None for
+# unmatched rows of a left outer join. the hash table is built on the smaller input unless
+# build_two says which side to build on, the other side is only iterated once. a missing key is left
+# out of the hash table so nothing matches it
+def hash_join(rows_one, rows_two, index_one, index_two, cast, outer_flag, build_two=None):
+	cast_func = get_key_cast(cast)
+
+	if build_two is None:
+		build_two = len(rows_two) <= len(rows_one)
+
+	# build the hash table on the second table
+	if build_two:
+		table = dict()
+		for row in rows_two:
+			key = cast_func(row[index_two])
+			if key is not None:
+				table.setdefault(key, []).append(row)
+
+		# probe with the first table so the output keeps its order
+		for row in rows_one:
+			matches = table.get(cast_func(row[index_one]))
+
+			if matches:
+				for match in matches:
+					yield row, match
+
+			elif outer_flag:
+				yield row, None
+
+	else:
+		table = dict()
+		for position, row in enumerate(rows_one):
+			key = cast_func(row[index_one])
+			if key is not None:
+				table.setdefault(key, []).append(position)
+
+		# probe with the second table and remember which rows of the first were matched
+		matched = [False] * len(rows_one)
+		for row in rows_two:
+			for position in table.get(cast_func(row[index_two]), ()):
+				matched[position] = True
+				yield rows_one[position], row
+
+		# pad whatever the probe never reached
+		if outer_flag:
+			for position, row in enumerate(rows_one):
+				if not matched[position]:
+					yield row, None
+
+
+# Sorted Input Class (Helper of Merge Join and Sort)
+# holds one input sorted on its key column, descending when reverse is set. rows stay in memory while
+# they fit in the budget, past that they are written out as sorted runs in the database directory and
+# merged into one file. missing keys sort after every other key, stop is where they begin in an
+# ascending input. a run holds a row per line as json, which keeps the missing values of a padded row
+class SortedInput:
+	def __init__(self, rows, index, cast, budget, path, reverse=False):
+		self.index = index
+		self.cast_func = get_key_cast(cast)
+		self.reverse = reverse
+		self.rows = list()
+		self.path = None
+		self.end = 0
+		self.stop = None
+		runs = list()
+		size = 0
+
+		try:
+			# collect keyed rows until the budget is used up, then spill them as a sorted run
+			for row in rows:
+				self.rows.append((self.cast_func(row[index]), row))
+				size += len(row) + sum([len(value) for value in row if value is not None])
+
+				if size > budget:
+					runs.append(self.spill(path))
+					size = 0
+
+			# everything fit, sort in memory
+			if not runs:
+				self.rows.sort(key=sort_key, reverse=reverse)
+				self.end = len(self.rows)
+				self.stop = self.end - [key for key, row in self.rows].count(None)
+				return
+
+			# spill the remainder and merge all runs into one sorted file
+			runs.append(self.spill(path))
+			readers = [self.read_run(run) for run in runs]
+			fd, self.path = tempfile.mkstemp(prefix="." + os.path.basename(path) + "_merge_",
+											 dir=os.path.dirname(path))
+
+			with os.fdopen(fd, "wb") as f:
+				for key, line in heapq.merge(*readers, key=sort_key, reverse=reverse):
+					if key is None and self.stop is None:
+						self.stop = f.tell()
+					f.write(line)
+
+			self.end = os.path.getsize(self.path)
+			if self.stop is None:
+				self.stop = self.end
+
+		finally:
+			for run in runs:
+				os.remove(run)
+
+	# write the collected rows out as one sorted run and return its path
+	def spill(self, tbl_path):
+		self.rows.sort(key=sort_key, reverse=self.reverse)
+		fd, path = tempfile.mkstemp(prefix="." + os.path.basename(tbl_path) + "_run_",
+									dir=os.path.dirname(tbl_path))
+
+		with os.fdopen(fd, "wb") as f:
+			f.write("".join(json.dumps(row) + "\n" for key, row in self.rows).encode())
+
+		self.rows = list()
+		return path
+
+	# stream the keyed lines of a sorted run
+	def read_run(self, path):
+		with open(path, "rb") as f:
 			for line in f:
-				# split and strip line
-				rvalues = line.split("|")
-				rvalues[-1] = rvalues[-1].rstrip()
-
-				# check the parameter
-				if evaluate(parameter, rvalues[param_index], castval):
-					# reset delimiter
-					delimiter = ""
-
-					# print only columns given by indices and parameter
-					for i in indices:
-						print(delimiter + rvalues[i], end='')
-						delimiter = "|"
-					print()
-
-		# report failure
+				yield self.cast_func(json.loads(line)[self.index]), line
+
+	# yield (position, key, row) from position start up to stop, positions are list indices in
+	# memory and byte offsets in the merged file
+	def scan(self, start=0, stop=None):
+		if stop is None:
+			stop = self.end
+
+		if self.path is None:
+			for position in range(start, stop):
+				key, row = self.rows[position]
+				yield position, key, row
+
 		else:
-			print("!Failed to query table", tbl_name,
-				"because requested values are invalid.")
+			with open(self.path, "rb") as f:
+				f.seek(start)
+				position = start
+
+				while position < stop:
+					line = f.readline()
+					row = json.loads(line)
+					yield position, self.cast_func(row[self.index]), row
+					position += len(line)
+
+	# remove the merged file
+	def close(self):
+		if self.path is not None:
+			os.remove(self.path)
+			self.path = None
+
+
+# Sort Key Function (Helper of Sorted Input)
+# orders (key, row) pairs by key with the missing keys after the others
+def sort_key(item):
+	return (item[0] is None, item[0])
+
+
+# Merge Join (Helper of Join Rows)
+# joins two sorted inputs in a single pass over each. equality holds one group of equal keys from the
+# second input, the range operators move a cursor through the second input and emit the part of it on
+# the matching side of the cursor. rows with a missing key come last in both inputs and match nothing
+def merge_join(input_one, input_two, operator, outer_flag):
+	walk = input_two.scan(0, input_two.stop)
+	pending = next(walk, None)
+
+	if operator == "=":
+		group = list()
+		group_key = None
+		started = False
+
+		for position, key, row in input_one.scan():
+			if key is None:
+				if outer_flag:
+					yield row, None
+				continue
+
+			# gather the rows of the second input that share this key
+			if not started or key != group_key:
+				started = True
+				group_key = key
+				group = list()
+
+				while pending is not None and pending[1] < key:
+					pending = next(walk, None)
+
+				while pending is not None and pending[1] == key:
+					group.append(pending[2])
+					pending = next(walk, None)
+
+			for match in group:
+				yield row, match
+
+			if outer_flag and not group:
+				yield row, None
+
+	else:
+		# a < b and a <= b match the rest of the second input, a > b and a >= b match what came before
+		suffix = operator in ("<", "<=")
+		skip_equal = operator in ("<", ">=")
+
+		for position, key, row in input_one.scan():
+			if key is None:
+				if outer_flag:
+					yield row, None
+				continue
+
+			# move the cursor past the keys on the wrong side of this one
+			while pending is not None and (pending[1] <= key if skip_equal else pending[1] < key):
+				pending = next(walk, None)
+
+			cursor = input_two.stop if pending is None else pending[0]
+			printed = False
+
+			if suffix:
+				segment = input_two.scan(cursor, input_two.stop)
+
+			else:
+				segment = input_two.scan(0, cursor)
+
+			for cmp_position, cmp_key, cmprow in segment:
+				printed = True
+				yield row, cmprow
+
+			if outer_flag and not printed:
+				yield row, None
+
+
+# Nested Loop Join (Helper of Join Rows)
+# compares every row of the first table against every row of the second, used for not equal joins
+def nested_loop_join(rows_one, rows_two, index_one, index_two, cast, operator, outer_flag):
+	# look up the operator and cast the keys of the second table once
+	cast_func = get_key_cast(cast)
+	op = ops[operator]
+	keyed_two = [(cast_func(cmprow[index_two]), cmprow) for cmprow in rows_two]
+	keyed_two = [(cmp_key, cmprow) for cmp_key, cmprow in keyed_two if cmp_key is not None]
+
+	for row in rows_one:
+		key = cast_func(row[index_one])
+		printed = False
+
+		# loop through the second table, checking for matching parameters
+		for cmp_key, cmprow in keyed_two:
+			if key is not None and op(key, cmp_key):
+				printed = True
+				yield row, cmprow
+
+		if outer_flag and not printed:
+			yield row, None
+
+
+# Compile Filter Function (Helper of Select, Update and Delete)
+# turns a parsed where clause (column, operator, value) into a function of a batch of values of its
+# column that returns the positions of the values that pass. the operator and cast are looked up and the
+# literal is cast once per statement, an empty int or float value is missing and passes no comparison. with
+# numpy an int or float batch is cast and compared as one array and the rows are picked by its boolean mask,
+# otherwise each value is cast and compared in turn
+def compile_filter(exp, cast):
+	cast_func = get_cast(cast)
+	op = ops[exp[1]]
+	checkval = cast_literal(exp, cast_func)
+
+	# strings are compared as stored
+	if cast_func is str:
+		def key_filter(values):
+			return [i for i, value in enumerate(values) if op(value, checkval)]
 
-		# close the file
-		f.close()
+	elif numpy is not None:
+		dtype = numpy.int64 if cast_func is int else numpy.float64
+
+		def key_filter(values):
+			# empty values are left out of the array, the mask then picks from the positions of the others
+			present = None
+			if "" in values:
+				present = numpy.array([i for i, value in enumerate(values) if value != ""], dtype=numpy.intp)
+				values = [values[i] for i in present]
+
+			try:
+				keys = numpy.array(values, dtype=dtype)
+
+			# values past 64 bits, or any numpy can not take, send the batch through one value at a time
+			except (ValueError, OverflowError):
+				try:
+					passed = [i for i, value in enumerate(values) if op(cast_func(value), checkval)]
+
+				except ValueError:
+					raise stored_value_error(values, cast_func, exp)
+
+				return passed if present is None else present[passed].tolist()
+
+			mask = op(keys, checkval)
+			return numpy.flatnonzero(mask).tolist() if present is None else present[mask].tolist()
 
-	# report failure
 	else:
-		print("!Failed to query table", tbl_name,
-		  "because it does not exist.")
+		def key_filter(values):
+			try:
+				return [i for i, value in enumerate(values) if value != "" and op(cast_func(value), checkval)]
 
+			except ValueError:
+				raise stored_value_error(values, cast_func, exp)
 
-# Select With Parameter Evaluation Function (Helper of Select and Update)
-def evaluate(exp, data, cast):
-	global ops
-	global casts
+	# the comparison goes along with the filter so a storage engine can skip blocks that can not pass it
+	key_filter.op = exp[1]
+	key_filter.value = checkval
+	return key_filter
 
-	# extract desired pieces of expression
-	checkval = exp[2]
-	checkop = exp[1]
 
-	# cast and use operator
-	cast_func = casts[cast]
-	a = cast_func(data)
-	b = cast_func(checkval)
-	op = ops[checkop]
+# Cast Literal Function (Helper of Compile Filter, Index Scan, Find Rows and Find Locators)
+# the value a where clause compares its column to, cast once to the column's type. a value the column can
+# not hold fails the statement before any row is read
+def cast_literal(exp, cast_func):
+	value = exp.value.strip("'")
+	try:
+		return cast_func(value)
 
-	r = op(a,b)
-	return r
+	except ValueError:
+		raise DataError("Value " + repr(value) + " can not be compared to column " + exp.column + ".")
 
 
-# Alter Table - Currently Unused
-def alter_table(re_match):
-	pass
+# Stored Value Error Function (Helper of Compile Filter)
+# the DataError for the first value of a batch its column's type can not take, a table file changed outside
+# the program can hold one
+def stored_value_error(values, cast_func, exp):
+	for value in values:
+		try:
+			cast_func(value)
 
+		except ValueError:
+			return DataError("Value " + repr(value) + " in column " + exp.column + " is not a valid " +
+							 cast_func.__name__ + ".")
 
-# Main Program ########################################################################################################
-# dictionary of commands and the corresponding function
-commands = {create_db_p : create_database,
-			drop_db_p : drop_database,
-			use_p : use_database,
-			create_tbl_p : create_table,
-			drop_tbl_p : drop_table,
-			insert_p : insert_to_table,
-			begin_trans_p : begin_trans,
-			commit_p : commit,
-			delete_p : delete_from_table,
-			update_p : update_table,
-			select_p : select_from_table,
-			alter_p : alter_table}
 
-# run program until user exits
-while True:
+# Compile Semi Filter Function (Helper of Reduce Probe)
+# a key filter passing the values whose cast is one of a set of keys. with numpy an int or float batch is
+# looked up as one array, an empty value or one past 64 bits sends the batch through one value at a time
+def compile_semi_filter(keys, cast):
+	cast_func = get_cast(cast)
 
-	# take in user input and set real_command flag
-	input = sys.stdin.readline()
+	# strings are looked up as stored
+	if cast_func is str:
+		def key_filter(values):
+			return [i for i, value in enumerate(values) if value in keys]
 
-	# real command flag
-	real_command = False
+		return key_filter
 
-	# loop through possible commands and call the corresponding function
-	for cmd in commands.items():
-		m = cmd[0].fullmatch(input)
-		if m is not None:
-			cmd[1](m)
-			real_command = True
-			break
+	def key_filter(values):
+		return [i for i, value in enumerate(values) if value != "" and cast_func(value) in keys]
 
-	# check for exit, whitespace, or invalid command
-	if not(real_command):
-		m = exit_p.fullmatch(input)
-		if m is not None:
-			print("All done.")
-			break
+	if numpy is None:
+		return key_filter
 
-		# check for whitespace and ignore it
-		m = whitespace_p.fullmatch(input)
-		if m is not None:
-			continue
+	dtype = numpy.int64 if cast_func is int else numpy.float64
+	try:
+		key_array = numpy.array(sorted(keys), dtype=dtype)
+
+	except OverflowError:
+		return key_filter
+
+	def array_filter(values):
+		try:
+			batch = numpy.array(values, dtype=dtype)
+
+		except (ValueError, OverflowError):
+			return key_filter(values)
 
-		# not a real command
-		print("!Failed to execute command. Check spelling and syntax.")
+		return numpy.flatnonzero(numpy.isin(batch, key_array)).tolist()
 
+	return array_filter
+
+
+# Output Writer Class
+# collects everything printed while a statement runs and hands it to the real stream in one write at a
+# statement boundary, once at least flush_size characters have built up
+class OutputWriter:
+	def __init__(self, stream, flush_size):
+		self.stream = stream
+		self.flush_size = flush_size
+		self.pieces = list()
+		self.size = 0
+
+	# buffer text, this is what print calls
+	def write(self, text):
+		self.pieces.append(text)
+		self.size += len(text)
+		return len(text)
+
+	# called between statements
+	def end_statement(self):
+		if self.size >= self.flush_size:
+			self.flush()
+
+	# write out everything buffered
+	def flush(self):
+		if self.pieces:
+			self.stream.write("".join(self.pieces))
+			self.pieces = list()
+			self.size = 0
+
+		self.stream.flush()
+
+
+# Alter Table - Currently Unused
+def alter_table(conn, stmt):
+	return Result()
+
+
+# Main Program ########################################################################################################
+# dictionary of first keywords and the corresponding parse function
+statements = {	"CREATE" : parse_create,
+				"DROP" : parse_drop,
+				"USE" : parse_use,
+				"ALTER" : parse_alter,
+				"INSERT" : parse_insert,
+				"COPY" : parse_copy,
+				"BEGIN" : parse_begin,
+				"COMMIT" : parse_commit,
+				"UPDATE" : parse_update,
+				"DELETE" : parse_delete,
+				"SELECT" : parse_select	}
+
+# dictionary of statement nodes and the corresponding function
+commands = {CreateDatabase : create_database,
+			DropDatabase : drop_database,
+			UseDatabase : use_database,
+			CreateTable : create_table,
+			DropTable : drop_table,
+			CreateIndex : create_index,
+			DropIndex : drop_index,
+			Insert : insert_to_table,
+			Copy : copy_to_table,
+			BeginTransaction : begin_trans,
+			Commit : commit,
+			Delete : delete_from_table,
+			Update : update_table,
+			Select : select_from_table,
+			AlterTable : alter_table}
+
+# syntax errors reported for statements that do not parse
+syntax_errors = {	"UPDATE" : "Failed! to update. Select command syntax invalid.",
+					"DELETE" : "Failed! to delete. Select command syntax invalid.",
+					"SELECT" : "Failed! to query. Select command syntax invalid."	}
+
+# bytes read at a time when input is not interactive
+read_chunk_size = 1024 * 1024
+
+# characters of output buffered before it is written out at a statement boundary
+output_flush_size = 1024 * 1024
+
+
+# Print Result Function
+# writes a result the way the program always has, a header line and | separated rows for queries
+def print_result(result, out):
+	# commands that do not return rows
+	if result.columns is None:
+		if result.message is not None:
+			out.write(result.message + "\n")
+
+		return
+
+	# print the headers and then the rows, missing values are left empty
+	write = out.write
+	write("|".join([name + " " + dtype for name, dtype in result.columns]) + "\n")
+
+	for row in result.rows:
+		try:
+			write("|".join(row) + "\n")
+
+		except TypeError:
+			write("|".join(["" if value is None else value for value in row]) + "\n")
+
+
+# run program until user exits
+if __name__ == "__main__":
+	# parse the command line
+	arg_parser = argparse.ArgumentParser(description="Database program that simulates some SQL commands.")
+	arg_parser.add_argument("-f", dest="script", help="run the statements in a script file and exit")
+	args = arg_parser.parse_args()
+
+	# batch mode reads the script in large chunks
+	if args.script is not None:
+		source = open(args.script, "r")
+		chunk_size = read_chunk_size
+		flush_size = output_flush_size
+		partial = False
+
+	# read a line at a time and answer every statement when a user is typing
+	elif sys.stdin.isatty():
+		source = sys.stdin
+		chunk_size = None
+		flush_size = 0
+		partial = False
+
+	# piped input is read as it arrives and every statement is answered, another program may be waiting on it
+	else:
+		source = sys.stdin
+		chunk_size = read_chunk_size
+		flush_size = 0
+		partial = True
+
+	# everything printed goes through one buffered writer
+	out = OutputWriter(sys.stdout, flush_size)
+	conn = connect(os.getcwd())
+
+	try:
+		for input in read_statements(source, chunk_size, partial):
+			# check for exit
+			m = exit_p.fullmatch(input)
+			if m is not None:
+				out.write("All done.\n")
+				break
+
+			# parse the command, run it and print what it returned
+			try:
+				print_result(conn.execute(parse(input)), out)
+
+			except ParseError:
+				m = keyword_p.match(input)
+				keyword = m.group(1).upper() if m is not None else None
+				out.write(syntax_errors.get(keyword, "!Failed to execute command. Check spelling and syntax.") + "\n")
+
+			except DatabaseError as e:
+				out.write(str(e) + "\n")
+
+			# write out at the statement boundary
+			out.end_statement()
+
+	finally:
+		# write out whatever is left
+		out.flush()
+		conn.close()
+
+		if source is not sys.stdin:
+			source.close()